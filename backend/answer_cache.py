@@ -0,0 +1,183 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "4096"))           # entries across all bots
+ANSWER_CACHE_PER_BOT = int(os.getenv("ANSWER_CACHE_PER_BOT", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))            # seconds
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+# Per-bot generation counters shared by every API process and ingest worker;
+# kept in the ingest job database since all of them already open it
+ANSWER_CACHE_GENERATIONS_PATH = os.getenv(
+    "ANSWER_CACHE_GENERATIONS_PATH", os.getenv("INGEST_QUEUE_PATH", "./ingest_jobs.sqlite3")
+)
+
+# Numbers and codes ("1234", "AB-12", "v2", "XL") that embeddings barely tell apart
+_LITERAL_TOKEN = re.compile(r"[\w\-]*\d[\w\-]*|\b[A-Z]{2,}\b")
+
+
+def literal_tokens(question: str) -> frozenset:
+    """
+    Normalized numbers and codes in a question. Two questions only share a
+    cached answer when these match exactly, so "price of SKU-1234" never
+    gets the answer for "price of SKU-1235".
+    """
+    return frozenset(
+        token.lower().replace("-", "").replace("_", "")
+        for token in _LITERAL_TOKEN.findall(question)
+    )
+
+
+class SemanticAnswerCache:
+    """
+    Per-bot cache of answers keyed by question embedding. A new question
+    whose embedding is at least `threshold` cosine-similar to a cached one
+    and carries the same numbers and codes gets the cached answer without
+    retrieval or an LLM call. Entries expire after `ttl` seconds; the least
+    recently used are evicted past max_size overall or max_per_bot for one bot.
+
+    invalidate() bumps the bot's generation in a SQLite table every process
+    reads, and each entry records the generation it was answered under, so a
+    change made by one process retires the answers cached by all of them.
+    Callers take generation() before retrieval and pass it to get() and put():
+    an answer built from context that was invalidated mid-flight is dropped.
+    """
+
+    def __init__(
+        self,
+        max_size: int = ANSWER_CACHE_SIZE,
+        max_per_bot: int = ANSWER_CACHE_PER_BOT,
+        ttl: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        generations_path: str = ANSWER_CACHE_GENERATIONS_PATH
+    ):
+        self.max_size = max_size
+        self.max_per_bot = max_per_bot
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # (bot_id, entry_id) -> (expires_at, unit vector, literal tokens, generation, answer); order is recency
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._by_bot: Dict[str, Dict[int, tuple]] = {}
+        self._stats = {
+            "hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0,
+            "invalidations": 0, "stale_drops": 0,
+        }
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(generations_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answer_cache_generations (bot_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def generation(self, bot_id: str) -> int:
+        """The bot's current generation; 0 until it is first invalidated."""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT generation FROM answer_cache_generations WHERE bot_id = ?", (bot_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, bot_id: str, question: str, query_vector: List[float], generation: int) -> Optional[str]:
+        query = self._unit(query_vector)
+        literals = literal_tokens(question)
+        now = time.time()
+        with self._lock:
+            entries = self._by_bot.get(bot_id)
+            if entries:
+                for entry_id, entry in list(entries.items()):
+                    if entry[3] < generation:
+                        self._remove_locked(bot_id, entry_id)
+                        self._stats["stale_drops"] += 1
+                    elif entry[0] <= now:
+                        self._remove_locked(bot_id, entry_id)
+                        self._stats["expirations"] += 1
+                entries = self._by_bot.get(bot_id)
+            candidates = [i for i, entry in entries.items() if entry[2] == literals] if entries else []
+            if not candidates:
+                self._stats["misses"] += 1
+                return None
+
+            similarities = np.stack([entries[i][1] for i in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end((bot_id, candidates[best]))
+            self._stats["hits"] += 1
+            return entries[candidates[best]][4]
+
+    def put(self, bot_id: str, question: str, query_vector: List[float], answer: str, generation: int):
+        """
+        Stores an answer built under `generation` (taken before retrieval).
+        Skipped if the bot was invalidated since, as the answer may be stale.
+        """
+        if generation < self.generation(bot_id):
+            with self._lock:
+                self._stats["stale_drops"] += 1
+            return
+        entry = (time.time() + self.ttl, self._unit(query_vector), literal_tokens(question), generation, answer)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[(bot_id, entry_id)] = entry
+            self._by_bot.setdefault(bot_id, {})[entry_id] = entry
+            self._stats["stores"] += 1
+
+            if len(self._by_bot[bot_id]) > self.max_per_bot:
+                oldest = next(key for key in self._entries if key[0] == bot_id)
+                self._remove_locked(*oldest)
+                self._stats["evictions"] += 1
+            while len(self._entries) > self.max_size:
+                self._remove_locked(*next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _remove_locked(self, bot_id: str, entry_id: int):
+        self._entries.pop((bot_id, entry_id), None)
+        entries = self._by_bot.get(bot_id)
+        if entries is not None:
+            entries.pop(entry_id, None)
+            if not entries:
+                del self._by_bot[bot_id]
+
+    def invalidate(self, bot_id: str):
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO answer_cache_generations (bot_id, generation) VALUES (?, 1) "
+                "ON CONFLICT(bot_id) DO UPDATE SET generation = generation + 1",
+                (bot_id,)
+            )
+            self._conn.commit()
+        with self._lock:
+            entries = self._by_bot.pop(bot_id, None)
+            if entries:
+                for entry_id in entries:
+                    self._entries.pop((bot_id, entry_id), None)
+                self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "bots": len(self._by_bot),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,153 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Optional
+
+import jwt
+from supabase import create_client, Client, ClientOptions
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Legacy HS256 projects sign access tokens with this secret. Projects using
+# asymmetric signing keys are verified against the JWKS endpoint instead.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))      # seconds a verified token is trusted
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "2048"))
+AUTH_CLIENT_POOL_SIZE = int(os.getenv("AUTH_CLIENT_POOL_SIZE", "256"))
+
+# Accepted algorithms are fixed per key source, never taken from the token
+JWKS_ALGORITHMS = ["ES256", "RS256"]
+SECRET_ALGORITHMS = ["HS256"]
+
+_jwks_client = (
+    jwt.PyJWKClient(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json", cache_keys=True)
+    if SUPABASE_URL else None
+)
+
+_lock = threading.Lock()
+_users: "OrderedDict[str, tuple]" = OrderedDict()     # token -> (expires_at, user)
+_clients: "OrderedDict[str, tuple]" = OrderedDict()   # token -> (expires_at, client)
+_stats = {"hits": 0, "misses": 0, "local_verifications": 0, "remote_verifications": 0}
+
+
+def _cache_get(cache: OrderedDict, token: str):
+    entry = cache.get(token)
+    if entry is None:
+        return None
+    if entry[0] <= time.time():
+        del cache[token]
+        return None
+    cache.move_to_end(token)
+    return entry[1]
+
+
+def _cache_put(cache: OrderedDict, token: str, expires_at: float, value, max_size: int):
+    cache[token] = (expires_at, value)
+    cache.move_to_end(token)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def _decode_locally(token: str) -> Optional[dict]:
+    """
+    Verifies the token signature and expiry without a network round trip.
+    Returns the claims, or None when no verification key is configured or
+    the JWKS can't be fetched. Raises jwt.InvalidTokenError for bad tokens.
+    """
+    if jwt.get_unverified_header(token).get("alg") in SECRET_ALGORITHMS:
+        if not SUPABASE_JWT_SECRET:
+            return None
+        return jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=SECRET_ALGORITHMS, audience="authenticated")
+    if _jwks_client is None:
+        return None
+    try:
+        # Signing keys are fetched once and cached by PyJWKClient
+        key = _jwks_client.get_signing_key_from_jwt(token).key
+    except (jwt.PyJWKClientError, jwt.PyJWKSetError) as e:
+        # JWKS unreachable or unparseable: let Supabase Auth decide instead
+        logger.warning(f"JWKS lookup failed, verifying token remotely: {e}")
+        return None
+    return jwt.decode(token, key, algorithms=JWKS_ALGORITHMS, audience="authenticated")
+
+
+def _user_from_claims(claims: dict):
+    """Mirrors the shape of supabase's UserResponse that handlers rely on (user.user.id)."""
+    return SimpleNamespace(user=SimpleNamespace(
+        id=claims["sub"],
+        email=claims.get("email"),
+        phone=claims.get("phone"),
+        role=claims.get("role"),
+        aud=claims.get("aud"),
+        app_metadata=claims.get("app_metadata", {}),
+        user_metadata=claims.get("user_metadata", {}),
+    ))
+
+
+def get_cached_user(token: str):
+    """Returns the user for an already-verified token, or None. Never blocks."""
+    with _lock:
+        user = _cache_get(_users, token)
+        _stats["hits" if user is not None else "misses"] += 1
+        return user
+
+
+def verify_token(token: str, supabase_client: Client):
+    """
+    Verifies an access token and caches the user for up to AUTH_CACHE_TTL
+    (never past the token's own expiry). Falls back to Supabase Auth when the
+    token can't be checked locally. Blocking: run it on the DB thread pool.
+    """
+    claims = _decode_locally(token)
+    if claims is not None:
+        user = _user_from_claims(claims)
+        expires_at = min(time.time() + AUTH_CACHE_TTL, claims.get("exp", 0))
+        stat = "local_verifications"
+    else:
+        user = supabase_client.auth.get_user(token)
+        if not user:
+            return None
+        expires_at = time.time() + AUTH_CACHE_TTL
+        stat = "remote_verifications"
+
+    with _lock:
+        _stats[stat] += 1
+        _cache_put(_users, token, expires_at, user, AUTH_CACHE_SIZE)
+    return user
+
+
+def get_token_client(token: str) -> Client:
+    """
+    Returns a pooled Supabase client that sends the user's token, so RLS
+    applies. Clients are reused for the token's lifetime instead of being
+    rebuilt on every request.
+    """
+    with _lock:
+        client = _cache_get(_clients, token)
+        if client is not None:
+            return client
+
+    client = create_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=ClientOptions(headers={"Authorization": f"Bearer {token}"})
+    )
+    try:
+        expires_at = jwt.decode(token, options={"verify_signature": False}).get("exp", 0)
+    except jwt.InvalidTokenError:
+        expires_at = 0
+    expires_at = expires_at or time.time() + AUTH_CACHE_TTL
+
+    with _lock:
+        _cache_put(_clients, token, expires_at, client, AUTH_CLIENT_POOL_SIZE)
+    return client
+
+
+def get_auth_stats():
+    with _lock:
+        return {**_stats, "cached_users": len(_users), "pooled_clients": len(_clients)}
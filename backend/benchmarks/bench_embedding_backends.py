@@ -0,0 +1,116 @@
+"""
+Compares the embedding backends (torch, onnx, onnx-int8).
+
+Usage (from the backend folder):
+    python benchmarks/bench_embedding_backends.py [--docs 2000] [--queries 200] [backends...]
+
+Each backend runs in its own subprocess so peak RSS is measured in isolation.
+Prints model load time, document throughput, single-query latency, peak RSS,
+and how closely each backend's vectors agree with torch's (cosine similarity
+on the same texts; ~1.0 means stored vectors stay compatible).
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running from the backend root or from inside benchmarks/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORDS = ("invoice shipping refund warranty order account password delivery product SKU "
+         "AB-1234 price discount subscription cancel support hours store location return policy").split()
+
+
+def make_texts(count: int, words: int, seed: int):
+    import random
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def run_worker(backend: str, docs: int, queries: int, out_path: str):
+    os.environ["EMBEDDING_BACKEND"] = backend
+    import numpy as np
+    import rag
+
+    started = time.perf_counter()
+    model = rag.get_embeddings()
+    load_seconds = time.perf_counter() - started
+
+    documents = make_texts(docs, 150, seed=1)
+    started = time.perf_counter()
+    vectors = model.embed_documents(documents)
+    doc_seconds = time.perf_counter() - started
+
+    latencies = []
+    for text in make_texts(queries, 12, seed=2):
+        started = time.perf_counter()
+        model.embed_query(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    np.save(out_path + ".npy", np.asarray(vectors[:500], dtype=np.float32))
+    with open(out_path, "w") as f:
+        json.dump({
+            "backend": backend,
+            "load_s": round(load_seconds, 2),
+            "docs_per_s": round(docs / doc_seconds, 1),
+            "query_p50_ms": round(statistics.median(latencies), 2),
+            "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+            # ru_maxrss is KiB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }, f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("backends", nargs="*", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.docs, args.queries, args.out)
+        return
+
+    import numpy as np
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out_path = os.path.join(tmp, backend)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", backend, "--out", out_path,
+                 "--docs", str(args.docs), "--queries", str(args.queries)],
+                cwd=tmp, env={**os.environ, "EMBEDDING_CACHE_PATH": os.path.join(tmp, "cache.sqlite3")}
+            )
+            if proc.returncode != 0:
+                print(f"{backend}: failed (exit {proc.returncode})")
+                continue
+            with open(out_path) as f:
+                results[backend] = json.load(f)
+            results[backend]["vectors"] = np.load(out_path + ".npy")
+
+    reference = results.get("torch", {}).get("vectors")
+    print(f"{'backend':<10} {'load s':>7} {'docs/s':>9} {'q p50 ms':>9} {'q p95 ms':>9} {'RSS MB':>8} {'cos vs torch':>13}")
+    for backend, r in results.items():
+        agreement = "-"
+        if reference is not None:
+            cosines = np.sum(r["vectors"] * reference, axis=1) / (
+                np.linalg.norm(r["vectors"], axis=1) * np.linalg.norm(reference, axis=1)
+            )
+            agreement = f"{cosines.mean():.4f}/{cosines.min():.4f}"
+        print(f"{backend:<10} {r['load_s']:>7} {r['docs_per_s']:>9} {r['query_p50_ms']:>9} "
+              f"{r['query_p95_ms']:>9} {r['peak_rss_mb']:>8} {agreement:>13}")
+    print("(cos vs torch = mean/min over 500 documents)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compares the vector store backends (chroma, numpy).
+
+Usage (from the backend folder):
+    python benchmarks/bench_vector_backends.py [--bots 20] [--chunks 500 2000 5000] [--queries 300] [backends...]
+
+For each backend and bot size, one subprocess ingests --bots bots of random
+384-d unit vectors (64-chunk upserts inside one batch() per bot, as
+rag.sync_source_chunks does per source) and a second, fresh subprocess
+queries them, so "open ms" is the cold first query of a bot straight off disk. Prints ingest rate, open ms, top-3 query p50/p95,
+recall@3 against exact search, peak RSS of the query process and disk size.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running from the backend root or from inside benchmarks/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DIMENSIONS = 384
+TOP_K = 3
+BATCH = 64
+
+
+def disk_usage_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+
+def bot_vectors(bot: int, chunks: int):
+    import numpy as np
+    vectors = np.random.default_rng(bot).standard_normal((chunks, DIMENSIONS), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_ingest(store, args) -> dict:
+    started = time.perf_counter()
+    for bot in range(args.bots):
+        vectors = bot_vectors(bot, args.chunk_count)
+        with store.batch(f"bot-{bot}"):
+            for start in range(0, args.chunk_count, BATCH):
+                rows = range(start, min(start + BATCH, args.chunk_count))
+                store.upsert(
+                    f"bot-{bot}",
+                    [f"bench:{n:08x}" for n in rows],
+                    vectors[start:start + BATCH].tolist(),
+                    [f"chunk {n}" for n in rows],
+                    [{"source_id": "bench"} for _ in rows],
+                )
+    seconds = time.perf_counter() - started
+    return {"chunks_per_s": round(args.bots * args.chunk_count / seconds, 1)}
+
+
+def run_query(store, args) -> dict:
+    import numpy as np
+
+    open_ms = []
+    for bot in range(args.bots):
+        started = time.perf_counter()
+        store.search(f"bot-{bot}", bot_vectors(10_000 + bot, 1)[0].tolist(), TOP_K)
+        open_ms.append((time.perf_counter() - started) * 1000)
+
+    picker = random.Random(1)
+    rng = np.random.default_rng(2)
+    latencies, recalls = [], []
+    for _ in range(args.queries):
+        bot = picker.randrange(args.bots)
+        query = rng.standard_normal(DIMENSIONS, dtype=np.float32)
+        started = time.perf_counter()
+        docs = store.search(f"bot-{bot}", query.tolist(), TOP_K)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        exact = np.argsort(-(bot_vectors(bot, args.chunk_count) @ query))[:TOP_K]
+        found = {int(doc.id.split(":")[1], 16) for doc in docs}
+        recalls.append(len(found & set(exact.tolist())) / TOP_K)
+    latencies.sort()
+
+    return {
+        "open_ms": round(statistics.median(open_ms), 2),
+        "query_p50_ms": round(statistics.median(latencies), 3),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "recall": round(statistics.mean(recalls), 3),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_worker(args):
+    import vector_store
+    store = vector_store.create_vector_store(args.worker)
+    result = run_ingest(store, args) if args.phase == "ingest" else run_query(store, args)
+    with open(args.out, "w") as f:
+        json.dump(result, f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("backends", nargs="*", default=["chroma", "numpy"])
+    parser.add_argument("--bots", type=int, default=20)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[500, 2000, 5000], help="chunks per bot")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--phase", help=argparse.SUPPRESS)
+    parser.add_argument("--chunk-count", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f"{args.bots} bots, {args.queries} queries, top {TOP_K}")
+    print(f"{'backend':<8} {'chunks':>7} {'ingest/s':>9} {'open ms':>8} {'q p50 ms':>9} {'q p95 ms':>9} "
+          f"{'recall':>7} {'RSS MB':>8} {'disk MB':>8}")
+    for chunks in args.chunks:
+        for backend in args.backends:
+            result = {}
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {**os.environ, "VECTOR_STORAGE_PATH": os.path.join(tmp, "chroma_db"),
+                       "NUMPY_VECTOR_PATH": os.path.join(tmp, "vectors_npy")}
+                for phase in ("ingest", "query"):
+                    out_path = os.path.join(tmp, f"{phase}.json")
+                    proc = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--worker", backend, "--phase", phase,
+                         "--out", out_path, "--bots", str(args.bots), "--chunk-count", str(chunks),
+                         "--queries", str(args.queries)],
+                        cwd=tmp, env=env
+                    )
+                    if proc.returncode != 0:
+                        print(f"{backend}: {phase} failed (exit {proc.returncode})")
+                        break
+                    with open(out_path) as f:
+                        result.update(json.load(f))
+                else:
+                    result["disk_mb"] = round(disk_usage_mb(env["VECTOR_STORAGE_PATH"]) + disk_usage_mb(env["NUMPY_VECTOR_PATH"]), 1)
+            if "disk_mb" not in result:
+                continue
+            print(f"{backend:<8} {chunks:>7} {result['chunks_per_s']:>9} {result['open_ms']:>8} "
+                  f"{result['query_p50_ms']:>9} {result['query_p95_ms']:>9} {result['recall']:>7} "
+                  f"{result['peak_rss_mb']:>8} {result['disk_mb']:>8}")
+
+
+if __name__ == "__main__":
+    main()
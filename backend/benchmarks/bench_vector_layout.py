@@ -0,0 +1,123 @@
+"""
+Compares the per-bot and sharded Chroma layouts with many bots.
+
+Usage (from the backend folder):
+    python benchmarks/bench_vector_layout.py [--bots 10000] [--chunks 20] [--queries 500] [--shards 64] [layouts...]
+
+Each layout runs in its own subprocess against a fresh Chroma directory, using
+random 384-d vectors (the MiniLM size) so only the storage layout is measured,
+not the embedding model. Prints ingest time, collection count, per-bot query
+latency (random bots, top 3, filtered by bot_id in the sharded layout), peak
+RSS and on-disk size.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running from the backend root or from inside benchmarks/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DIMENSIONS = 384
+
+
+def disk_usage_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+
+def run_worker(layout: str, args, out_path: str):
+    os.environ["VECTOR_LAYOUT"] = layout
+    os.environ["VECTOR_SHARDS"] = str(args.shards)
+    import numpy as np
+    import vector_store
+
+    store = vector_store.ChromaVectorStore(layout)
+
+    rng = np.random.default_rng(0)
+    bot_ids = [f"bot-{i:05d}" for i in range(args.bots)]
+
+    started = time.perf_counter()
+    for bot_id in bot_ids:
+        vectors = rng.standard_normal((args.chunks, DIMENSIONS), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        store.upsert(
+            bot_id,
+            [f"bench:{n:08x}" for n in range(args.chunks)],
+            vectors.tolist(),
+            [f"chunk {n} of {bot_id}" for n in range(args.chunks)],
+            [{"source_id": "bench"} for _ in range(args.chunks)],
+        )
+    ingest_seconds = time.perf_counter() - started
+
+    picker = random.Random(1)
+    latencies = []
+    for _ in range(args.queries):
+        bot_id = picker.choice(bot_ids)
+        query = rng.standard_normal(DIMENSIONS, dtype=np.float32)
+        started = time.perf_counter()
+        docs = store.search(bot_id, query.tolist(), 3)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert all(doc.metadata["bot_id"] == bot_id for doc in docs)
+    latencies.sort()
+
+    with open(out_path, "w") as f:
+        json.dump({
+            "layout": layout,
+            "collections": len(vector_store.get_chroma_client().list_collections()),
+            "ingest_s": round(ingest_seconds, 1),
+            "query_p50_ms": round(statistics.median(latencies), 2),
+            "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+            # ru_maxrss is KiB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "disk_mb": round(disk_usage_mb(vector_store.VECTOR_STORAGE_PATH), 1),
+        }, f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("layouts", nargs="*", default=["per_bot", "sharded"])
+    parser.add_argument("--bots", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=20, help="chunks per bot")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args, args.out)
+        return
+
+    print(f"{args.bots} bots x {args.chunks} chunks, {args.queries} queries")
+    print(f"{'layout':<8} {'colls':>6} {'ingest s':>9} {'q p50 ms':>9} {'q p95 ms':>9} {'RSS MB':>8} {'disk MB':>8}")
+    for layout in args.layouts:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = os.path.join(tmp, "result.json")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", layout, "--out", out_path,
+                 "--bots", str(args.bots), "--chunks", str(args.chunks),
+                 "--queries", str(args.queries), "--shards", str(args.shards)],
+                cwd=tmp,
+                env={**os.environ, "VECTOR_STORAGE_PATH": os.path.join(tmp, "chroma_db")}
+            )
+            if proc.returncode != 0:
+                print(f"{layout}: failed (exit {proc.returncode})")
+                continue
+            with open(out_path) as f:
+                r = json.load(f)
+        print(f"{layout:<8} {r['collections']:>6} {r['ingest_s']:>9} {r['query_p50_ms']:>9} "
+              f"{r['query_p95_ms']:>9} {r['peak_rss_mb']:>8} {r['disk_mb']:>8}")
+
+
+if __name__ == "__main__":
+    main()
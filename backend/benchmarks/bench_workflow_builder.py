@@ -0,0 +1,77 @@
+"""
+Benchmarks workflow graph construction for large agent-builder graphs.
+
+Usage (from the backend folder):
+    python benchmarks/bench_workflow_builder.py [sizes...]
+
+Prints, for each graph size, the time spent classifying edges with the old
+per-edge list scan vs. the id index, and the full build + compile time.
+Per-edge cost should stay flat as the graph grows.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+# Allow running from the backend root or from inside benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workflow_engine import _build_workflow_graph, index_workflow_nodes
+
+NODE_CYCLE = ['agent', 'search', 'doc_writer', 'default']
+
+
+def make_graph(size: int):
+    """input -> (agent -> search -> doc_writer -> passthrough) x N, as the builder emits it."""
+    nodes = [{"id": "n0", "type": "input", "data": {"backendType": "input", "userPrompt": "hi"}}]
+    edges = []
+    for i in range(1, size):
+        backend_type = NODE_CYCLE[(i - 1) % len(NODE_CYCLE)]
+        nodes.append({
+            "id": f"n{i}",
+            "type": "custom",
+            "position": {"x": i * 10, "y": 0},
+            "data": {"backendType": backend_type, "label": f"Node {i}"},
+        })
+        edges.append({"id": f"e{i}", "source": f"n{i - 1}", "target": f"n{i}"})
+    return nodes, edges
+
+
+def classify_with_scan(nodes, edges):
+    for edge in edges:
+        src = next((n for n in nodes if n['id'] == edge['source']), None)
+        tgt = next((n for n in nodes if n['id'] == edge['target']), None)
+        src.get('data', {}).get('backendType'), tgt.get('data', {}).get('backendType')
+
+
+def classify_with_index(nodes, edges):
+    _, type_by_id, _ = index_workflow_nodes(nodes)
+    for edge in edges:
+        type_by_id[edge['source']], type_by_id[edge['target']]
+
+
+def timed(fn, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    print(f"{'nodes':>6} {'edges':>6} {'scan ms':>10} {'index ms':>10} {'build ms':>10} {'build us/edge':>14}")
+    for size in sizes:
+        nodes, edges = make_graph(size)
+        scan = timed(classify_with_scan, nodes, edges)
+        indexed = timed(classify_with_index, nodes, edges)
+        # The builder logs every node it creates; keep the table readable.
+        with contextlib.redirect_stdout(io.StringIO()):
+            build = timed(_build_workflow_graph, nodes, edges, repeat=3)
+        print(f"{size:>6} {len(edges):>6} {scan * 1e3:>10.2f} {indexed * 1e3:>10.3f} "
+              f"{build * 1e3:>10.1f} {build * 1e6 / max(len(edges), 1):>14.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [25, 50, 100, 200, 400, 800])
@@ -0,0 +1,189 @@
+import os
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any
+
+import httpx
+
+import db
+from rag import aget_answer, astream_answer
+from workflow_engine import build_and_run_workflow, stream_workflow
+
+# One connection pool for every outbound call (Telegram, WhatsApp Cloud API, ...)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class ChatServiceError(Exception):
+    """Raised when a chat can't be routed at all (unknown bot, config/DB errors)."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class ChatResult:
+    answer: str
+    bot_id: str
+    channel: str
+    route: str                      # "workflow" or "rag"
+    workflow_id: Optional[str] = None
+    latency_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ChatService:
+    """
+    The single entry point for answering a message for a bot. /chat, the public
+    share link, Telegram, WhatsApp and the voice proxy all call handle()
+    directly instead of POSTing back to our own /chat endpoint.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def resolve_bot(self, bot_id: str) -> Dict[str, Any]:
+        try:
+            bot_response = await db.execute(self.client.table("bots").select("id, workflow_id").eq("id", bot_id).single())
+        except Exception as e:
+            raise ChatServiceError(500, f"Database error: {str(e)}")
+        if not bot_response.data:
+            raise ChatServiceError(404, "Bot not found")
+        return bot_response.data
+
+    async def handle(self, bot_id: str, question: str, channel: str = "api", bot: Optional[Dict[str, Any]] = None) -> ChatResult:
+        """
+        Routes the question through the bot's linked workflow or standard RAG,
+        logs both messages and returns a ChatResult. `bot` can be passed when
+        the caller has already fetched the bot row (needs "workflow_id").
+        """
+        started = time.perf_counter()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ChatServiceError(500, "GEMINI_API_KEY not found")
+
+        if bot is None:
+            bot = await self.resolve_bot(bot_id)
+        workflow_id = bot.get("workflow_id")
+
+        # CHOOSE THE BRAIN
+        if workflow_id:
+            print(f"[{channel}] Bot {bot_id} routing to Workflow {workflow_id}")
+            route = "workflow"
+            answer = await self._run_workflow(workflow_id, question)
+        else:
+            print(f"[{channel}] Bot {bot_id} routing to Standard RAG")
+            route = "rag"
+            answer = await aget_answer(bot_id, question, api_key)
+
+        await self.log_messages(bot_id, question, answer)
+
+        return ChatResult(
+            answer=answer,
+            bot_id=bot_id,
+            channel=channel,
+            route=route,
+            workflow_id=workflow_id,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1)
+        )
+
+    async def open_stream(self, bot_id: str, question: str, channel: str = "api", bot: Optional[Dict[str, Any]] = None):
+        """
+        Streaming variant of handle(). Validates and resolves the bot up front
+        (so errors surface before any bytes are sent), then returns an async
+        generator of events:
+          {"type": "node", "node": id}          workflow progress (workflow bots only)
+          {"type": "token", "content": text}    answer tokens as they are generated
+          {"type": "done", "answer": text}      the complete answer, always last
+        """
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ChatServiceError(500, "GEMINI_API_KEY not found")
+
+        if bot is None:
+            bot = await self.resolve_bot(bot_id)
+        return self._stream(bot_id, question, channel, bot.get("workflow_id"), api_key)
+
+    async def _stream(self, bot_id: str, question: str, channel: str, workflow_id: Optional[str], api_key: str):
+        answer = ""
+        if workflow_id:
+            print(f"[{channel}] Bot {bot_id} streaming Workflow {workflow_id}")
+            # Any failure still has to end the stream with a "done" event
+            try:
+                workflow = await self._get_workflow(workflow_id)
+            except Exception as e:
+                print(f"Error loading workflow {workflow_id}: {e}")
+                workflow, answer = None, f"Error: Could not load workflow: {str(e)}"
+            if not workflow:
+                answer = answer or "Error: Linked workflow not found in database."
+            else:
+                async for event in stream_workflow(
+                    workflow['nodes'],
+                    workflow['edges'],
+                    question,
+                    user_id=workflow.get('user_id'),
+                    workflow_id=workflow_id
+                ):
+                    if event["type"] == "done":
+                        answer = event["answer"]
+                    else:
+                        yield event
+        else:
+            print(f"[{channel}] Bot {bot_id} streaming Standard RAG")
+            async for text in astream_answer(bot_id, question, api_key):
+                answer += text
+                yield {"type": "token", "content": text}
+
+        await self.log_messages(bot_id, question, answer)
+        yield {"type": "done", "answer": answer}
+
+    async def _get_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        # Fetch the nodes, edges, and bot owner (user_id) from the workflow
+        wf_response = await db.execute(self.client.table("workflows").select("nodes, edges, user_id").eq("id", workflow_id).single())
+        return wf_response.data
+
+    async def _run_workflow(self, workflow_id: str, question: str) -> str:
+        workflow = await self._get_workflow(workflow_id)
+        if not workflow:
+            return "Error: Linked workflow not found in database."
+
+        try:
+            result = await build_and_run_workflow(
+                workflow['nodes'],
+                workflow['edges'],
+                question,
+                user_id=workflow.get('user_id'),
+                workflow_id=workflow_id
+            )
+            return result.get('result', "I encountered an error running the assigned workflow.")
+        except Exception as e:
+            return f"Agent Execution Error: {str(e)}"
+
+    async def log_messages(self, bot_id: str, question: str, answer: str):
+        try:
+            await db.execute(self.client.table("messages").insert([
+                {"bot_id": bot_id, "role": "user", "content": question},
+                {"bot_id": bot_id, "role": "bot", "content": answer}
+            ]))
+        except Exception as e:
+            print(f"Error logging messages: {e}")
@@ -0,0 +1,29 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# supabase-py is synchronous. Every PostgREST / Auth round trip goes through
+# this bounded pool so a slow query only ties up a worker thread, never the
+# event loop that every concurrent chat is sharing.
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="supabase")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Runs a blocking Supabase call on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def execute(query):
+    """
+    Awaitable replacement for `query.execute()` on a supabase-py query builder:
+        response = await db.execute(client.table("bots").select("*").eq("id", bot_id))
+    """
+    return await run_blocking(query.execute)
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,25 +1,12 @@
 import sys
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-
-# configuration
-VECTOR_STORAGE_PATH = "./chroma_db"
-embeddings = HuggingFaceEmbeddings(model_name="all-miniLM-L6-v2")
+# Same model, vector store and query-embedding cache as the API
+from rag import vector_store, query_embeddings
 
 def check_bot(bot_id, query):
     print(f"--- Debugging Bot: {bot_id} ---")
     try:
-        vectorstore = Chroma(
-            persist_directory=VECTOR_STORAGE_PATH,
-            collection_name=bot_id,
-            embedding_function=embeddings
-        )
-        
-        # Check count (using len of get which is more reliable for chromadb)
-        # Note: Depending on langchain version, accessing underlying collection might vary
-        # We will try a simple get
-        existing_docs = vectorstore.get()
-        count = len(existing_docs['ids'])
+        print(f"Vector store: {vector_store.get_stats()['backend']}")
+        count = vector_store.count(bot_id)
         print(f"Total Chunks in DB: {count}")
         
         if count == 0:
@@ -28,7 +15,7 @@ def check_bot(bot_id, query):
 
         # Check search results
         print(f"\nSearching for: '{query}'")
-        docs = vectorstore.similarity_search(query, k=3)
+        docs = vector_store.search(bot_id, query_embeddings.embed_query(query), 3)
         
         for i, doc in enumerate(docs):
             print(f"\n[Result {i+1}]")
@@ -0,0 +1,421 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Any, Optional
+
+from loaders import load_and_split, split_web_page, iter_csv_chunks, is_streamable, SourceError
+from rag import store_source, unchanged_source_report
+from web_fetch import web_fetcher
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "./ingest_jobs.sqlite3")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "10"))   # seconds, doubled per attempt
+# Processes that load and split sources (PDF parsing, CSV, chunking). Embedding
+# stays in this process so the model is loaded only once.
+INGEST_LOAD_PROCESSES = int(os.getenv("INGEST_LOAD_PROCESSES", str(os.cpu_count() or 2)))
+INGEST_POLL_INTERVAL = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id TEXT PRIMARY KEY,
+    bot_id TEXT NOT NULL,
+    user_id TEXT,
+    sources TEXT NOT NULL,          -- JSON list of [location, type, name] still to process
+    status TEXT NOT NULL,           -- queued | running | succeeded | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    result TEXT,                    -- JSON: chunks ingested, per-source change reports + errors
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_claim ON ingest_jobs (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_bot ON ingest_jobs (bot_id, created_at);
+"""
+
+
+def _is_local_file(location: str) -> bool:
+    return not location.startswith(("http://", "https://"))
+
+
+def _page_splits(page) -> list:
+    if page.status != "ok":
+        raise SourceError(page.error or f"Could not fetch {page.url}")
+    return split_web_page(page.fetch_url, page.text)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class IngestQueue:
+    """
+    Persistent ingestion job queue backed by SQLite, drained by a bounded
+    pool of worker threads. Jobs survive restarts: anything left 'running'
+    by a dead worker process is re-queued on start(). Sources that fail are
+    retried with exponential backoff; sources that succeeded are not re-run.
+    Several uvicorn workers can share the same database file.
+
+    Within a job, every source is loaded and split in parallel on a process
+    pool; the job's thread embeds and stores each result as it arrives.
+    """
+
+    def __init__(self, path: str = INGEST_QUEUE_PATH, workers: int = INGEST_WORKERS, max_attempts: int = INGEST_MAX_ATTEMPTS):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._loader_pool: Optional[ProcessPoolExecutor] = None
+        self._loader_pool_lock = threading.Lock()
+        # One embedding consumer at a time: the model already uses every core
+        self._embed_lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        self._recover_orphaned_jobs()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Ingest queue started with {self.workers} workers ({self.path})")
+
+    def stop(self):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        self._threads = []
+        with self._loader_pool_lock:
+            if self._loader_pool is not None:
+                self._loader_pool.shutdown(wait=False, cancel_futures=True)
+                self._loader_pool = None
+
+    def _get_loader_pool(self) -> ProcessPoolExecutor:
+        with self._loader_pool_lock:
+            if self._loader_pool is None:
+                # spawn, not fork: forking a process that runs torch and
+                # uvicorn's threads is unsafe, and workers only need loaders.py
+                self._loader_pool = ProcessPoolExecutor(
+                    max_workers=INGEST_LOAD_PROCESSES,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._loader_pool
+
+    def _reset_loader_pool(self, broken: ProcessPoolExecutor):
+        with self._loader_pool_lock:
+            if self._loader_pool is broken:
+                self._loader_pool = None
+        broken.shutdown(wait=False)
+
+    def _recover_orphaned_jobs(self):
+        """Re-queues jobs left 'running' by worker processes on this host that no longer exist."""
+        host = socket.gethostname()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker FROM ingest_jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                worker_host, _, pid = (row["worker"] or "").rpartition(":")
+                if worker_host == host and pid.isdigit() and _pid_alive(int(pid)) and int(pid) != os.getpid():
+                    continue
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = 'queued', worker = NULL, updated_at = ? WHERE id = ?",
+                    (time.time(), row["id"])
+                )
+                logger.info(f"Re-queued interrupted ingest job {row['id']}")
+
+    # --- Producer API ---
+
+    def enqueue(self, bot_id: str, user_id: Optional[str], sources: List[Tuple[str, ...]]) -> str:
+        """
+        sources are (location, type, name) tuples. name is the original filename
+        or URL and identifies the source across re-uploads; it defaults to the
+        location for (location, type) pairs.
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ingest_jobs (id, bot_id, user_id, sources, status, max_attempts, result, created_at, updated_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, bot_id, user_id, json.dumps(sources), self.max_attempts,
+                 json.dumps({"chunks": 0, "errors": {}}), now, now, now)
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get_bot_status(self, bot_id: str, limit: int = 20) -> Dict[str, Any]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ingest_jobs WHERE bot_id = ? ORDER BY created_at DESC LIMIT ?",
+                (bot_id, limit)
+            ).fetchall()
+
+        jobs = [self._job_to_dict(row) for row in rows]
+        statuses = {job["status"] for job in jobs}
+        if "running" in statuses:
+            status = "running"
+        elif "queued" in statuses:
+            status = "queued"
+        elif jobs:
+            status = jobs[0]["status"]
+        else:
+            status = "idle"
+        return {"bot_id": bot_id, "status": status, "jobs": jobs}
+
+    def pending_files(self) -> List[str]:
+        """Local files that queued or running jobs still need."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT sources FROM ingest_jobs WHERE status IN ('queued', 'running')").fetchall()
+        return [source[0] for row in rows for source in json.loads(row["sources"]) if _is_local_file(source[0])]
+
+    @staticmethod
+    def _job_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "max_attempts": row["max_attempts"],
+            "pending_sources": [source[2] if len(source) > 2 else source[0] for source in json.loads(row["sources"])],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    # --- Workers ---
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM ingest_jobs WHERE status = 'queued' AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE ingest_jobs SET status = 'running', attempts = attempts + 1, worker = ?, updated_at = ? WHERE id = ?",
+                        (self.worker_id, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim_next()
+            except Exception as e:
+                logger.error(f"Ingest queue error: {e}")
+                job = None
+
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=INGEST_POLL_INTERVAL)
+                continue
+
+            try:
+                self._run_job(job)
+            except Exception as e:
+                # Anything outside the per-source guards (pool, fetcher, SQLite)
+                # must not kill this thread or leave the job stuck in 'running'
+                logger.error(f"Ingest job {job['id']} crashed: {e}")
+                self._fail_job(job, str(e))
+
+    def _retry_schedule(self, job: sqlite3.Row, failed_count: int, now: float) -> Tuple[str, float, str]:
+        """(status, next_attempt_at, error) after an attempt that left failed_count sources failed."""
+        attempt = job["attempts"] + 1
+        if attempt < job["max_attempts"]:
+            return "queued", now + INGEST_RETRY_BACKOFF * (2 ** (attempt - 1)), f"{failed_count} source(s) failed, retrying"
+        return "failed", now, f"{failed_count} source(s) failed after {attempt} attempts"
+
+    def _fail_job(self, job: sqlite3.Row, message: str):
+        """Requeues (with backoff) or fails a job whose attempt raised before finishing."""
+        sources = json.loads(job["sources"])
+        now = time.time()
+        status, next_attempt_at, _ = self._retry_schedule(job, len(sources), now)
+        if status == "failed":
+            for source in sources:
+                self._cleanup(source[0])
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = ?, error = ?, worker = NULL, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+                    (status, f"Ingest attempt crashed: {message}", now, next_attempt_at, job["id"])
+                )
+        except sqlite3.Error as e:
+            # Left 'running'; _recover_orphaned_jobs picks it up on the next start
+            logger.error(f"Could not update ingest job {job['id']}: {e}")
+
+    def _submit_loads(self, files: List[Tuple[str, str, str]]) -> Tuple[ProcessPoolExecutor, dict]:
+        for retry in (False, True):
+            pool = self._get_loader_pool()
+            try:
+                return pool, {pool.submit(load_and_split, location): (location, file_type, name) for location, file_type, name in files}
+            except BrokenProcessPool:
+                # A loader process died in an earlier job; replace the pool once
+                self._reset_loader_pool(pool)
+                if retry:
+                    raise
+
+    def _run_job(self, job: sqlite3.Row):
+        job_id, bot_id = job["id"], job["bot_id"]
+        attempt = job["attempts"] + 1
+        sources = json.loads(job["sources"])
+        result = json.loads(job["result"]) if job["result"] else {"chunks": 0, "errors": {}}
+        logger.info(f"Ingest job {job_id} for bot {bot_id}: attempt {attempt}, {len(sources)} sources")
+
+        result.setdefault("sources", {})
+        failed = []
+
+        def store(location, file_type, name, load):
+            """load() returns the source's splits (a list or a stream), or a finished change report."""
+            try:
+                loaded = load()
+                if isinstance(loaded, dict):
+                    outcome = loaded
+                else:
+                    with self._embed_lock:
+                        outcome = store_source(
+                            bot_id, name, loaded,
+                            progress_callback=lambda done, total: self._report_progress(job_id, result, location, done, total)
+                        )
+                success = True
+            except SourceError as e:
+                success, outcome = False, str(e)
+            except BrokenProcessPool as e:
+                # A loader process died (e.g. OOM on a huge PDF); start a fresh pool next time
+                self._reset_loader_pool(pool)
+                success, outcome = False, f"Loader process crashed: {e}"
+            except Exception as e:
+                logger.error(f"Error ingesting {location}: {e}")
+                success, outcome = False, str(e)
+
+            if success:
+                result["chunks"] += outcome["chunks"]
+                result["sources"][name] = outcome
+                result["errors"].pop(location, None)
+                self._cleanup(location)
+            else:
+                logger.warning(f"Error processing {file_type} ({location}): {outcome}")
+                result["errors"][location] = outcome
+                failed.append([location, file_type, name])
+            return success
+
+        files, streams, urls = [], [], []
+        for source in sources:
+            location, file_type = source[0], source[1]
+            name = source[2] if len(source) > 2 else location
+            if not _is_local_file(location):
+                urls.append((location, file_type, name))
+            elif is_streamable(location):
+                streams.append((location, file_type, name))
+            else:
+                files.append((location, file_type, name))
+
+        # Fan file loading/splitting out over the process pool first, so it
+        # runs while web pages are being fetched
+        pool, futures = self._submit_loads(files)
+
+        # Web pages are I/O-bound: fetch them all concurrently, conditionally
+        # against what this bot already stored
+        fetched = web_fetcher.fetch_many([location for location, _, _ in urls], bot_id=bot_id)
+        for location, file_type, name in urls:
+            page = fetched[location]
+            if page.status == "not_modified":
+                report = unchanged_source_report(bot_id, name)
+                if not report["chunks"]:
+                    # Validators outlived the vectors (e.g. data was deleted): fetch again
+                    page = web_fetcher.fetch_many([location])[location]
+                else:
+                    store(location, file_type, name, lambda report=report: report)
+                    continue
+            if store(location, file_type, name, lambda page=page: _page_splits(page)):
+                web_fetcher.remember(bot_id, page)
+
+        # Large CSVs are read and embedded row batch by row batch in this
+        # thread rather than materialised in a loader process
+        for location, file_type, name in streams:
+            store(location, file_type, name, lambda location=location: iter_csv_chunks(location))
+
+        for future in as_completed(futures):
+            store(*futures[future], future.result)
+
+        now = time.time()
+        if not failed:
+            status, next_attempt_at, error = "succeeded", now, None
+        else:
+            status, next_attempt_at, error = self._retry_schedule(job, len(failed), now)
+        if status == "failed":
+            for location, *_ in failed:
+                self._cleanup(location)
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, sources = ?, result = ?, error = ?, worker = NULL, "
+                "updated_at = ?, next_attempt_at = ? WHERE id = ?",
+                (status, json.dumps(failed), json.dumps(result), error, now, next_attempt_at, job_id)
+            )
+        logger.info(f"Ingest job {job_id} for bot {bot_id}: {status}")
+
+    def _report_progress(self, job_id: str, result: Dict[str, Any], location: str, done: int, total: int):
+        result["progress"] = {"source": location, "embedded": done, "total": total}
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE ingest_jobs SET result = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(result), time.time(), job_id)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record progress for ingest job {job_id}: {e}")
+
+    @staticmethod
+    def _cleanup(location: str):
+        if _is_local_file(location) and os.path.exists(location):
+            os.remove(location)
+
+
+ingest_queue = IngestQueue()
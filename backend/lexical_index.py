@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lives next to ./chroma_db and is kept in step with it by rag.embed_and_store
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./chroma_db_lexical.sqlite3")
+
+_SQL_BATCH = 500
+# Keep product codes and SKUs like "AB-1234" or "SKU_99" as single tokens
+_TOKENIZER = "unicode61 tokenchars '-_'"
+_QUERY_TOKEN = re.compile(r"[\w\-]+")
+
+
+def _table(bot_id: str) -> str:
+    return "lex_" + hashlib.sha1(bot_id.encode("utf-8")).hexdigest()[:24]
+
+
+class LexicalIndex:
+    """
+    Per-bot BM25 index over the same chunks stored in Chroma, using SQLite
+    FTS5 (one virtual table per bot). Catches exact tokens such as product
+    codes, SKUs and names that MiniLM embeddings tend to blur. Also holds the
+    per-bot retrieval settings, since they live alongside the local indexes.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS retrieval_settings (bot_id TEXT PRIMARY KEY, k INTEGER)"
+        )
+        # Bots whose table holds every stored chunk. Ingest creates the table
+        # with only the chunks it adds, so a table alone proves nothing.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lexical_backfills (bot_id TEXT PRIMARY KEY)")
+        self._conn.commit()
+        self._stats = {"searches": 0, "backfills": 0}
+
+    def has_bot(self, bot_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (_table(bot_id),)
+            ).fetchone() is not None
+
+    def _ensure_table_locked(self, bot_id: str) -> str:
+        table = _table(bot_id)
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+            f"USING fts5(content, chunk_id UNINDEXED, metadata UNINDEXED, tokenize=\"{_TOKENIZER}\")"
+        )
+        return table
+
+    def add(self, bot_id: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            table = self._ensure_table_locked(bot_id)
+            self._delete_locked(table, ids)
+            self._conn.executemany(
+                f"INSERT INTO {table} (content, chunk_id, metadata) VALUES (?, ?, ?)",
+                [(text, chunk_id, json.dumps(metadata)) for chunk_id, text, metadata in zip(ids, texts, metadatas)]
+            )
+            self._conn.commit()
+
+    def delete(self, bot_id: str, ids: List[str]):
+        if not self.has_bot(bot_id):
+            return
+        with self._lock:
+            self._delete_locked(_table(bot_id), ids)
+            self._conn.commit()
+
+    def _delete_locked(self, table: str, ids: List[str]):
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM {table} WHERE chunk_id IN ({placeholders})", batch)
+
+    def drop_bot(self, bot_id: str):
+        with self._lock:
+            self._conn.execute(f"DROP TABLE IF EXISTS {_table(bot_id)}")
+            self._conn.execute("DELETE FROM lexical_backfills WHERE bot_id = ?", (bot_id,))
+            self._conn.commit()
+
+    def search(self, bot_id: str, query: str, k: int) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Returns up to k (chunk_id, text, metadata) tuples, best BM25 score first."""
+        tokens = list(dict.fromkeys(token.lower() for token in _QUERY_TOKEN.findall(query)))
+        if not tokens or not self.has_bot(bot_id):
+            return []
+        match = " OR ".join('"' + token.replace('"', '""') + '"' for token in tokens)
+        with self._lock:
+            self._stats["searches"] += 1
+            try:
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, content, metadata FROM {_table(bot_id)} WHERE {_table(bot_id)} MATCH ? "
+                    f"ORDER BY bm25({_table(bot_id)}) LIMIT ?",
+                    (match, k)
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Lexical search failed for bot {bot_id}: {e}")
+                return []
+        return [(chunk_id, content, json.loads(metadata)) for chunk_id, content, metadata in rows]
+
+    def is_backfilled(self, bot_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM lexical_backfills WHERE bot_id = ?", (bot_id,)
+            ).fetchone() is not None
+
+    def record_backfill(self, bot_id: str):
+        """Marks the bot's table as holding every chunk in the vector store."""
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO lexical_backfills (bot_id) VALUES (?)", (bot_id,))
+            self._conn.commit()
+            self._stats["backfills"] += 1
+
+    # --- Per-bot retrieval settings ---
+
+    def get_k(self, bot_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT k FROM retrieval_settings WHERE bot_id = ?", (bot_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_k(self, bot_id: str, k: Optional[int]):
+        with self._lock:
+            if k is None:
+                self._conn.execute("DELETE FROM retrieval_settings WHERE bot_id = ?", (bot_id,))
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO retrieval_settings (bot_id, k) VALUES (?, ?)", (bot_id, k))
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            bots = self._conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%'"
+            ).fetchone()[0]
+            return {**self._stats, "bots": bots}
@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+LLM_CLIENT_CACHE_SIZE = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "32"))
+
+# Chat model instances hold their own HTTP/gRPC transport, so sharing them
+# keeps connections warm across requests. Tool-bound variants are cached too,
+# which skips re-serializing tool schemas on every agent turn.
+_clients: "OrderedDict[tuple, Any]" = OrderedDict()
+_clients_lock = threading.RLock()
+_client_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def tool_fingerprint(tools: Optional[List[Any]]) -> str:
+    """
+    Order-independent fingerprint of a tool set: name, description and
+    argument schema, i.e. everything the bound model is told about a tool.
+    """
+    if not tools:
+        return ""
+    digest = hashlib.sha1()
+    for schema in sorted(json.dumps(convert_to_openai_tool(t), sort_keys=True, default=str) for t in tools):
+        digest.update(schema.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_chat_model(
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0,
+    timeout: Optional[float] = None,
+    tools: Optional[List[Any]] = None,
+    api_key: Optional[str] = None,
+):
+    """
+    Returns a shared ChatGoogleGenerativeAI for this configuration, bound to
+    `tools` if given. Keyed by api key, model, temperature, timeout and tool set.
+    """
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    key_id = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    cache_key = (key_id, model, temperature, timeout, tool_fingerprint(tools))
+
+    with _clients_lock:
+        llm = _clients.get(cache_key)
+        if llm is not None:
+            _clients.move_to_end(cache_key)
+            _client_stats["hits"] += 1
+            return llm
+        _client_stats["misses"] += 1
+
+        if tools:
+            # Bound variants share the base client's transport
+            llm = get_chat_model(model, temperature, timeout, api_key=api_key).bind_tools(tools)
+        else:
+            llm = ChatGoogleGenerativeAI(
+                google_api_key=api_key,
+                model=model,
+                temperature=temperature,
+                timeout=timeout,
+            )
+
+        _clients[cache_key] = llm
+        while len(_clients) > LLM_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+            _client_stats["evictions"] += 1
+        return llm
+
+
+def get_llm_client_stats() -> Dict[str, Any]:
+    with _clients_lock:
+        return {**_client_stats, "size": len(_clients), "max_size": LLM_CLIENT_CACHE_SIZE}
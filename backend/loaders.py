@@ -0,0 +1,171 @@
+import os
+import io
+import csv
+import logging
+from typing import Iterator, List
+
+from langchain_community.document_loaders import CSVLoader, PyMuPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# Kept free of the embedding model and vector store on purpose: this module is
+# imported by the ingestion process pool, where only loading and splitting run.
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+MIN_CHUNK_CHARS = 10
+
+# Streaming CSV mode: rows are grouped into chunks of CSV_ROWS_PER_CHUNK with
+# the header repeated in each. Set to 0 to fall back to one Document per row.
+# Chunks stay within CHUNK_SIZE like every other loader's: MiniLM only reads
+# the first 256 tokens (~1000 chars), so anything past that is invisible to search.
+CSV_ROWS_PER_CHUNK = int(os.getenv("CSV_ROWS_PER_CHUNK", "20"))
+CSV_CHUNK_MAX_CHARS = int(os.getenv("CSV_CHUNK_MAX_CHARS", str(CHUNK_SIZE)))
+
+
+class SourceError(Exception):
+    """Raised when a source can't be loaded or contains no usable text."""
+
+
+def load_and_split(file_path: str, sql_query: str = None) -> List[Document]:
+    """
+    Reads PDF / CSV / URL and splits it into chunks ready for embedding.
+    CPU-bound (PDF parsing, splitting), so it is safe to run in a worker process.
+    Raises SourceError for unsupported or empty sources.
+    """
+    # -------- Loader Selection --------
+    if file_path.startswith("https://") or file_path.startswith("http://"):
+        from web_fetch import web_fetcher
+        result = web_fetcher.fetch_many([file_path])[file_path]
+        if result.status != "ok":
+            raise SourceError(result.error or f"Could not fetch {file_path}")
+        return split_web_page(result.fetch_url, result.text)
+
+    elif file_path.lower().endswith(".pdf"):
+        loader = PyMuPDFLoader(file_path)
+
+    elif is_streamable(file_path):
+        return list(iter_csv_chunks(file_path))
+
+    elif file_path.lower().endswith(".csv"):
+        loader = CSVLoader(
+            file_path=file_path,
+            encoding="utf-8",
+            csv_args={"delimiter": ","}
+        )
+
+    # elif file_path.startswith(("sqlite:///", "mysql", "postgresql")):
+    #     if not sql_query:
+    #         raise SourceError("SQL query is required for SQL ingestion.")
+
+    #     db = SQLDatabase.from_uri(file_path)
+    #     loader = SQLDatabaseLoader(db=db, query=sql_query)
+
+    else:
+        raise SourceError("Unsupported file type or database URI.")
+
+    # -------- Load Documents --------
+    docs = loader.load()
+
+    if not docs:
+        logger.warning("No documents found.")
+        raise SourceError("No documents found.")
+
+    return split_documents(docs)
+
+
+def is_streamable(file_path: str) -> bool:
+    """True for sources ingested with iter_csv_chunks instead of a loader."""
+    return CSV_ROWS_PER_CHUNK > 0 and file_path.lower().endswith(".csv")
+
+
+def iter_csv_chunks(
+    file_path: str,
+    rows_per_chunk: int = CSV_ROWS_PER_CHUNK,
+    max_chars: int = CSV_CHUNK_MAX_CHARS
+) -> Iterator[Document]:
+    """
+    Streams a CSV as Documents of up to rows_per_chunk rows, each starting with
+    the header row, so every chunk is self-describing. Only one chunk of rows
+    is held in memory at a time. A chunk is closed before it would pass
+    max_chars; a single row too long for that is split into several chunks,
+    each still headed by the header. Raises SourceError if the file has no
+    data rows.
+    """
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise SourceError("No documents found.")
+
+        def render(row) -> str:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerow(row)
+            return buffer.getvalue()
+
+        header_line = render(header)
+        # Room left for row text once the header is in place (never below a sliver)
+        row_budget = max(max_chars - len(header_line), MIN_CHUNK_CHARS * 10)
+        row_splitter = RecursiveCharacterTextSplitter(chunk_size=row_budget, chunk_overlap=0)
+
+        def make_doc(text: str, first_row: int, last_row: int) -> Document:
+            return Document(
+                page_content=header_line + text,
+                metadata={"source": file_path, "first_row": first_row, "last_row": last_row}
+            )
+
+        lines, size, emitted = [], 0, 0
+        first_row = last_row = 0
+        for row_number, row in enumerate(reader, start=1):
+            if not any(cell.strip() for cell in row):
+                continue
+            line = render(row)
+            if lines and (len(lines) >= rows_per_chunk or size + len(line) > row_budget):
+                yield make_doc("".join(lines), first_row, last_row)
+                emitted += 1
+                lines, size = [], 0
+
+            if len(line) > row_budget:
+                for piece in row_splitter.split_text(line):
+                    yield make_doc(piece if piece.endswith("\n") else piece + "\n", row_number, row_number)
+                    emitted += 1
+                continue
+
+            if not lines:
+                first_row = row_number
+            lines.append(line)
+            size += len(line)
+            last_row = row_number
+        if lines:
+            yield make_doc("".join(lines), first_row, last_row)
+            emitted += 1
+
+    if not emitted:
+        logger.warning("CSV has a header but no rows.")
+        raise SourceError("No readable text found.")
+
+
+def split_web_page(fetch_url: str, text: str) -> List[Document]:
+    """Splits a fetched page. "source" is the fetched URL, as WebBaseLoader recorded it."""
+    if not text.strip():
+        raise SourceError("No documents found.")
+    return split_documents([Document(page_content=text, metadata={"source": fetch_url})])
+
+
+def split_documents(docs: List[Document]) -> List[Document]:
+    # -------- Split Text --------
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+
+    splits = text_splitter.split_documents(docs)
+    splits = [doc for doc in splits if len(doc.page_content.strip()) > MIN_CHUNK_CHARS]
+
+    if not splits:
+        logger.warning("No significant text chunks found (PDF might be image-only).")
+        raise SourceError("No readable text found.")
+
+    return splits
@@ -1,30 +1,41 @@
 import os
 import pathlib
+import threading
+import startup_timing
 from dotenv import load_dotenv
 
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from google_auth_oauthlib.flow import Flow
 
 # --- CRITICAL FIX: LOAD ENV FIRST ---
 env_path = pathlib.Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
+startup_timing.mark("env")
 
-import shutil
 from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import httpx
 import uuid
 import json
-from typing import List, Dict, Any, Optional
-from workflow_engine import build_and_run_workflow
-from supabase import create_client, Client, ClientOptions
-from rag import ingest_file, get_answer, delete_bot_data
-from threading import Thread
+from typing import List, Dict, Optional
+from workflow_engine import build_and_run_workflow, invalidate_workflow_cache, get_workflow_cache_stats, validate_workflow
+from supabase import create_client, Client
+from rag import delete_bot_data, get_rag_cache_stats, embedding_cache, query_embeddings, lexical_index, answer_cache, vector_store, set_retrieval_k, shutdown_query_executor, embeddings, get_embeddings
+from mcp_pool import mcp_pool
+from llm_clients import get_llm_client_stats
+from ingest_queue import ingest_queue
+from web_fetch import web_fetcher
+from uploads import UploadSpool, UploadSizeLimitMiddleware, sweep_scratch_dir
 from livekit import api
+import db
+import auth
+from chat_service import ChatService, ChatServiceError, get_http_client, close_http_client
+startup_timing.mark("imports")
 
 app = FastAPI()
 
+# Added before CORS so CORS wraps it and browsers can read the 413
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -60,6 +71,13 @@ except Exception as e:
     supabase = None
     supabase_admin = None
 
+chat_service = ChatService(supabase_admin if supabase_admin else supabase)
+startup_timing.mark("clients")
+
+# Load the embedding model in the background right after startup instead of on
+# the first RAG request. Off by default so scale-out workers start serving fast.
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "0") == "1"
+
 class WorkflowRequest(BaseModel):
     nodes: List[Dict]
     edges: List[Dict]
@@ -78,6 +96,10 @@ class WorkflowSchema(BaseModel):
 class ShareRequest(BaseModel):
     is_public: bool = True
 
+class WorkflowGraph(BaseModel):
+    nodes: List[Dict]
+    edges: List[Dict]
+
 async def get_token(authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
@@ -87,8 +109,13 @@ async def get_token(authorization: str = Header(None)):
         raise HTTPException(status_code=401, detail="Invalid Authorization Header Format")
 
 async def verify_user(token: str = Depends(get_token)):
+    # Recently verified tokens are served from memory; otherwise the JWT is
+    # checked locally (or via Supabase Auth as a fallback) off the event loop.
+    user = auth.get_cached_user(token)
+    if user:
+        return user
     try:
-        user = supabase.auth.get_user(token)
+        user = await db.run_blocking(auth.verify_token, token, supabase)
         if not user:
              raise HTTPException(status_code=401, detail="Invalid Token")
         return user
@@ -96,44 +123,70 @@ async def verify_user(token: str = Depends(get_token)):
         raise HTTPException(status_code=401, detail="Session Expired or Invalid")
 
 def get_auth_client(token: str) -> Client:
-    return create_client(
-        SUPABASE_URL, 
-        SUPABASE_KEY, 
-        options=ClientOptions(headers={"Authorization": f"Bearer {token}"})
-    )
-
-def process_files_background(file_info: Dict[str, Any], bot_id: str, user_id: str):
-    """Background task to process files without blocking the response."""
-    try:
-        for file_location, file_type in file_info['files']:
-            try:
-                success, result = ingest_file(file_location, bot_id)
-                if not success:
-                    print(f"Error processing {file_type}: {result}")
-            finally:
-                if os.path.exists(file_location):
-                    os.remove(file_location)
-        print(f"Background processing completed for bot_id: {bot_id}")
-    except Exception as e:
-        print(f"Error in background processing: {e}")
+    return auth.get_token_client(token)
 
 @app.get("/")
 def health_check():
     return {"status": "running", "service": "BotCraft Backend"}
 
+@app.on_event("startup")
+async def startup_event():
+    # Resume ingestion jobs interrupted by the last restart and start the workers
+    ingest_queue.start()
+    # Drop uploads left behind by requests that died before enqueueing them
+    sweep_scratch_dir(ingest_queue.pending_files())
+    # Stop idle MCP servers even when no workflow comes along to notice them
+    mcp_pool.start_reaper()
+    startup_timing.mark("startup_hooks")
+    print(startup_timing.format_report())
+    if EMBEDDING_WARMUP:
+        threading.Thread(target=get_embeddings, name="embedding-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    ingest_queue.stop()
+    # Stop pooled MCP servers so their subprocesses don't outlive the worker
+    await mcp_pool.close_all()
+    await close_http_client()
+    web_fetcher.close()
+    shutdown_query_executor()
+    db.shutdown()
+
+@app.get("/metrics")
+def get_metrics():
+    """In-process cache counters for this worker."""
+    return {
+        "workflow_cache": get_workflow_cache_stats(),
+        "mcp_pool": mcp_pool.get_stats(),
+        "llm_clients": get_llm_client_stats(),
+        "rag_chains": get_rag_cache_stats(),
+        "auth": auth.get_auth_stats(),
+        "embedding_cache": embedding_cache.get_stats(),
+        "query_embeddings": query_embeddings.get_stats(),
+        "web_fetch": web_fetcher.get_stats(),
+        "lexical_index": lexical_index.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "vector_store": vector_store.get_stats(),
+        "startup": {
+            **startup_timing.report(),
+            "embedding_model_loaded": embeddings.loaded,
+            "embedding_model_load_seconds": embeddings.load_seconds
+        }
+    }
+
 # --- 1. WORKFLOW MANAGEMENT ENDPOINTS ---
 
 @app.post("/workflows")
 async def create_workflow(workflow: WorkflowSchema, user: dict = Depends(verify_user), token: str = Depends(get_token)):
     user_supabase = get_auth_client(token)
     try:
-        response = user_supabase.table("workflows").insert({
+        response = await db.execute(user_supabase.table("workflows").insert({
             "user_id": user.user.id,
             "name": workflow.name,
             "description": workflow.description,
             "nodes": workflow.nodes,
             "edges": workflow.edges
-        }).execute()
+        }))
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -142,7 +195,7 @@ async def create_workflow(workflow: WorkflowSchema, user: dict = Depends(verify_
 async def get_workflows(user: dict = Depends(verify_user), token: str = Depends(get_token)):
     user_supabase = get_auth_client(token)
     try:
-        response = user_supabase.table("workflows").select("*").eq("user_id", user.user.id).order("created_at", desc=True).execute()
+        response = await db.execute(user_supabase.table("workflows").select("*").eq("user_id", user.user.id).order("created_at", desc=True))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -151,26 +204,32 @@ async def get_workflows(user: dict = Depends(verify_user), token: str = Depends(
 async def update_workflow(workflow_id: str, workflow: WorkflowSchema, user: dict = Depends(verify_user), token: str = Depends(get_token)):
     user_supabase = get_auth_client(token)
     try:
-        response = user_supabase.table("workflows").update({
+        response = await db.execute(user_supabase.table("workflows").update({
             "name": workflow.name,
             "description": workflow.description,
             "nodes": workflow.nodes,
             "edges": workflow.edges
-        }).eq("id", workflow_id).eq("user_id", user.user.id).execute()
+        }).eq("id", workflow_id).eq("user_id", user.user.id))
         if not response.data:
             raise HTTPException(status_code=404, detail="Workflow not found")
+        invalidate_workflow_cache(workflow_id)
         return response.data[0]
     except Exception as e:
         if "404" in str(e): raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/workflows/validate")
+async def validate_workflow_graph(graph: WorkflowGraph, user: dict = Depends(verify_user)):
+    """Reports dangling edges, unreachable nodes and duplicate input nodes."""
+    return validate_workflow(graph.nodes, graph.edges)
+
 @app.patch("/bots/{bot_id}/link-workflow")
 async def link_workflow(bot_id: str, workflow_id: str = Form(...), user: dict = Depends(verify_user), token: str = Depends(get_token)):
     user_supabase = get_auth_client(token)
     # Use None if user selects "None" to reset to standard RAG
     val = None if workflow_id in ["none", ""] else workflow_id
     try:
-        response = user_supabase.table("bots").update({"workflow_id": val}).eq("id", bot_id).eq("user_id", user.user.id).execute()
+        response = await db.execute(user_supabase.table("bots").update({"workflow_id": val}).eq("id", bot_id).eq("user_id", user.user.id))
         return {"status": "success", "workflow_id": val}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -193,58 +252,58 @@ async def ingest_document(
         raise HTTPException(status_code=400,detail="Must provide at least one source (PDF, CSV, or URL)")
     
     user_supabase = get_auth_client(token)
+    files_to_process = []
+    bot_id = None
 
     try:
-        response = user_supabase.table("bots").insert({
-            "name": name,
-            "user_id": user.user.id
-        }).execute()
-        
-        new_bot = response.data[0]
-        bot_id = new_bot['id']
-        print(f"Created bot with ID: {bot_id}")
-        
-    except Exception as e:
-        print(f"Database error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to create bot record: {str(e)}")
+        # Every upload is spooled (and size-checked) before the bot exists, so
+        # a rejected upload doesn't leave an empty bot behind
+        async with UploadSpool() as spool:
+            if files:
+                for file in files:
+                    file_location = await spool.save(file, "PDF")
+                    files_to_process.append((file_location, "PDF", file.filename))
 
-    files_to_process = []
-    
-    try:
-        if files:
-            for file in files:
-                file_location = f"temp_{file.filename}"
-                with open(file_location, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                files_to_process.append((file_location, "PDF"))
-
-        if urls:
-            for url in urls:
-                files_to_process.append((url, "URL"))
-
-        if csvfiles:
-            for csvfile in csvfiles:
-                file_location = f"temp_{csvfile.filename}"
-                with open(file_location, "wb") as buffer:
-                    shutil.copyfileobj(csvfile.file, buffer)
-                files_to_process.append((file_location, "CSV"))
-
-        file_info = {"files": files_to_process}
-        background_thread = Thread(
-            target=process_files_background, 
-            args=(file_info, bot_id, user.user.id),
-            daemon=True
-        )
-        background_thread.start()
+            if urls:
+                for url in urls:
+                    files_to_process.append((url, "URL", url))
+
+            if csvfiles:
+                for csvfile in csvfiles:
+                    file_location = await spool.save(csvfile, "CSV")
+                    files_to_process.append((file_location, "CSV", csvfile.filename))
+
+            try:
+                response = await db.execute(user_supabase.table("bots").insert({
+                    "name": name,
+                    "user_id": user.user.id
+                }))
+                bot_id = response.data[0]['id']
+                print(f"Created bot with ID: {bot_id}")
+            except Exception as e:
+                print(f"Database error: {e}")
+                raise HTTPException(status_code=500, detail=f"Failed to create bot record: {str(e)}")
+
+            job_id = ingest_queue.enqueue(bot_id, user.user.id, files_to_process)
+            spool.commit()
 
         return {
             "status": "success",
             "chunks": 0,
             "bot_id": bot_id,
+            "job_id": job_id,
             "message": "Bot created! Your knowledge sources are being processed in the background."
         }
 
     except Exception as e:
+        if bot_id is not None:
+            # Created but never queued: remove it rather than leave an empty bot
+            try:
+                await db.execute(user_supabase.table("bots").delete().eq("id", bot_id).eq("user_id", user.user.id))
+            except Exception as cleanup_error:
+                print(f"⚠️ Could not remove bot {bot_id}: {cleanup_error}")
+        if isinstance(e, HTTPException):
+            raise
         print(f"Error saving files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -256,6 +315,7 @@ async def update_bot(
     urls: List[str] = Form(None),
     csvfiles: List[UploadFile] = File(None),
     clear_history: bool = Form(False),
+    retrieval_k: Optional[int] = Form(None),
     user: dict = Depends(verify_user),
     token: str = Depends(get_token)
 ):
@@ -267,47 +327,53 @@ async def update_bot(
             update_data["name"] = name
             
         if update_data:
-            response = user_supabase.table("bots").update(update_data).eq("id", bot_id).eq("user_id", user.user.id).execute()
+            response = await db.execute(user_supabase.table("bots").update(update_data).eq("id", bot_id).eq("user_id", user.user.id))
+            if not response.data:
+                 raise HTTPException(status_code=404, detail="Bot not found or unauthorized")
+        elif retrieval_k is not None:
+            response = await db.execute(user_supabase.table("bots").select("id").eq("id", bot_id).eq("user_id", user.user.id))
             if not response.data:
                  raise HTTPException(status_code=404, detail="Bot not found or unauthorized")
     except Exception as e:
          if "404" in str(e): raise e
          raise HTTPException(status_code=500, detail=f"Database update failed: {str(e)}")
 
+    if retrieval_k is not None:
+        # Chunks retrieved per answer; 0 restores the server default
+        try:
+            set_retrieval_k(bot_id, retrieval_k or None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     if files or urls or csvfiles or clear_history:
         if clear_history:
             print(f"Clearing knowledge base for bot {bot_id}")
             delete_bot_data(bot_id)
+            web_fetcher.forget_bot(bot_id)
 
         files_to_process = []
         try:
-            if files:
-                for file in files:
-                    file_location = f"temp_{file.filename}"
-                    with open(file_location, "wb") as buffer:
-                        shutil.copyfileobj(file.file, buffer)
-                    files_to_process.append((file_location, "PDF"))
-
-            if urls:
-                for url in urls:
-                    files_to_process.append((url, "URL"))
-
-            if csvfiles:
-                for csvfile in csvfiles:
-                    file_location = f"temp_{csvfile.filename}"
-                    with open(file_location, "wb") as buffer:
-                        shutil.copyfileobj(csvfile.file, buffer)
-                    files_to_process.append((file_location, "CSV"))
+            async with UploadSpool() as spool:
+                if files:
+                    for file in files:
+                        file_location = await spool.save(file, "PDF")
+                        files_to_process.append((file_location, "PDF", file.filename))
+
+                if urls:
+                    for url in urls:
+                        files_to_process.append((url, "URL", url))
+
+                if csvfiles:
+                    for csvfile in csvfiles:
+                        file_location = await spool.save(csvfile, "CSV")
+                        files_to_process.append((file_location, "CSV", csvfile.filename))
             
-            if files_to_process:
-                file_info = {"files": files_to_process}
-                background_thread = Thread(
-                    target=process_files_background, 
-                    args=(file_info, bot_id, user.user.id),
-                    daemon=True
-                )
-                background_thread.start()
-                
+                if files_to_process:
+                    ingest_queue.enqueue(bot_id, user.user.id, files_to_process)
+                    spool.commit()
+
+        except HTTPException:
+            raise
         except Exception as e:
              raise HTTPException(status_code=500, detail=f"File processing failed: {str(e)}")
 
@@ -317,7 +383,7 @@ async def update_bot(
 async def get_user_bots(user: dict = Depends(verify_user), token: str = Depends(get_token)):
     try:
         user_supabase = get_auth_client(token)
-        response = user_supabase.table("bots").select("*").eq("user_id", user.user.id).order("created_at", desc=True).execute()
+        response = await db.execute(user_supabase.table("bots").select("*").eq("user_id", user.user.id).order("created_at", desc=True))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -326,23 +392,36 @@ async def get_user_bots(user: dict = Depends(verify_user), token: str = Depends(
 async def get_bot_details(bot_id: str, user: dict = Depends(verify_user), token: str = Depends(get_token)):
     try:
         user_supabase = get_auth_client(token)
-        response = user_supabase.table("bots").select("*").eq("id", bot_id).eq("user_id", user.user.id).single().execute()
+        response = await db.execute(user_supabase.table("bots").select("*").eq("id", bot_id).eq("user_id", user.user.id).single())
         if not response.data:
             raise HTTPException(status_code=404, detail="Bot not found")
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/bots/{bot_id}/ingest-status")
+async def get_ingest_status(bot_id: str, user: dict = Depends(verify_user), token: str = Depends(get_token)):
+    """Status of the bot's knowledge-source ingestion jobs (most recent first)."""
+    user_supabase = get_auth_client(token)
+    try:
+        bot_check = await db.execute(user_supabase.table("bots").select("id").eq("id", bot_id).eq("user_id", user.user.id))
+        if not bot_check.data:
+            raise HTTPException(status_code=404, detail="Bot not found")
+        return ingest_queue.get_bot_status(bot_id)
+    except Exception as e:
+        if "404" in str(e): raise e
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/stats")
 async def get_stats(user: dict = Depends(verify_user), token: str = Depends(get_token)):
     try:
         user_supabase = get_auth_client(token)
-        bots_response = user_supabase.table("bots").select("id").eq("user_id", user.user.id).execute()
+        bots_response = await db.execute(user_supabase.table("bots").select("id").eq("user_id", user.user.id))
         bot_ids = [b['id'] for b in bots_response.data]
         
         total_messages = 0
         if bot_ids:
-             messages_response = user_supabase.table("messages").select("id", count="exact").in_("bot_id", bot_ids).execute()
+             messages_response = await db.execute(user_supabase.table("messages").select("id", count="exact").in_("bot_id", bot_ids))
              total_messages = messages_response.count
              
         return {
@@ -360,7 +439,7 @@ async def delete_bot(bot_id: str, user: dict = Depends(verify_user), token: str
     
     try:
         client = supabase_admin if supabase_admin else user_supabase
-        response = client.table("bots").delete().eq("id", bot_id).eq("user_id", user.user.id).execute()
+        response = await db.execute(client.table("bots").delete().eq("id", bot_id).eq("user_id", user.user.id))
         
         if not response.data:
              raise HTTPException(status_code=404, detail="Bot not found")
@@ -370,6 +449,8 @@ async def delete_bot(bot_id: str, user: dict = Depends(verify_user), token: str
         raise HTTPException(status_code=500, detail=f"Failed to delete bot: {str(e)}")
 
     delete_bot_data(bot_id)
+    web_fetcher.forget_bot(bot_id)
+    set_retrieval_k(bot_id, None)
     return {"status": "success", "bot_id": bot_id}
 
 
@@ -378,57 +459,32 @@ async def delete_bot(bot_id: str, user: dict = Depends(verify_user), token: str
 @app.post("/chat")
 async def chat(request: ChatRequest):
     print(f"Received chat request for bot_id: {request.bot_id}")
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not found")
-    
-    # 1. Fetch the bot to check for linked workflow
-    client = supabase_admin if supabase_admin else supabase
     try:
-        bot_response = client.table("bots").select("workflow_id").eq("id", request.bot_id).single().execute()
-        if not bot_response.data:
-            raise HTTPException(status_code=404, detail="Bot not found")
-            
-        workflow_id = bot_response.data.get("workflow_id")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-
-    answer = ""
-
-    # 2. CHOOSE THE BRAIN
-    if workflow_id:
-        print(f"Bot {request.bot_id} routing to Workflow {workflow_id}")
-        # Fetch the nodes, edges, and bot owner (user_id) from the workflow
-        wf_response = client.table("workflows").select("nodes, edges, user_id").eq("id", workflow_id).single().execute()
-        if wf_response.data:
-            nodes = wf_response.data['nodes']
-            edges = wf_response.data['edges']
-            workflow_user_id = wf_response.data.get('user_id')
-            
-            # Execute the LangGraph Agent Workflow
-            try:
-                result = await build_and_run_workflow(nodes, edges, request.question, user_id=workflow_user_id)
-                answer = result.get('result', "I encountered an error running the assigned workflow.")
-            except Exception as e:
-                answer = f"Agent Execution Error: {str(e)}"
-        else:
-            answer = "Error: Linked workflow not found in database."
-    else:
-        print(f"Bot {request.bot_id} routing to Standard RAG")
-        # Standard RAG Fallback
-        answer = get_answer(request.bot_id, request.question, api_key)
-    
-    # 3. Log the message
-    try:
-        client.table("messages").insert([
-            {"bot_id": request.bot_id, "role": "user", "content": request.question},
-            {"bot_id": request.bot_id, "role": "bot", "content": answer}
-        ]).execute()
-    except Exception as e:
-        print(f"Error logging messages: {e}")
+        result = await chat_service.handle(request.bot_id, request.question, channel="api")
+    except ChatServiceError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {"answer": result.answer}
+
+def _sse_response(events) -> StreamingResponse:
+    """Wraps a ChatService event stream as Server-Sent Events."""
+    async def event_source():
+        async for event in events:
+            yield f"data: {json.dumps(event)}\n\n"
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    return {"answer": answer}
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Same as /chat, but streams tokens (and workflow node progress) as SSE."""
+    try:
+        events = await chat_service.open_stream(request.bot_id, request.question, channel="api")
+    except ChatServiceError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _sse_response(events)
 
 
 # --- 4. TELEGRAM ENDPOINTS ---
@@ -438,7 +494,7 @@ async def connect_telegram(bot_id:str, token: str = Form(...), user: dict = Depe
     user_supabase = get_auth_client(user_token)
 
     try:
-        user_supabase.table("bots").update({"telegram_bot_token":token}).eq("id",bot_id).execute()
+        await db.execute(user_supabase.table("bots").update({"telegram_bot_token":token}).eq("id",bot_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update database:{str(e)}")
     
@@ -447,10 +503,9 @@ async def connect_telegram(bot_id:str, token: str = Form(...), user: dict = Depe
 
     telegram_api =f"https://api.telegram.org/bot{token}/setWebhook?url={webhook_url}"
 
-    async with httpx.AsyncClient() as client:
-        resp= await client.get(telegram_api)
-        if resp.status_code !=200:
-            raise HTTPException(status_code=500, detail=f"Telegram API error: {resp.text}")
+    resp = await get_http_client().get(telegram_api)
+    if resp.status_code !=200:
+        raise HTTPException(status_code=500, detail=f"Telegram API error: {resp.text}")
     
     return {"status":"success","detail":"Telegram bot connected"}
 
@@ -464,25 +519,25 @@ async def telegram_handler(bot_id: str, request: Request):
     if not incoming_text: return {"status": "ignored"}
 
     client = supabase_admin if supabase_admin else supabase
-    response = client.table("bots").select("telegram_bot_token").eq("id", bot_id).execute()
+    response = await db.execute(client.table("bots").select("telegram_bot_token").eq("id", bot_id))
     
     if not response.data or not response.data[0]['telegram_bot_token']:
         return {"status": "error"}
         
     bot_token = response.data[0]['telegram_bot_token']
     
-    # Trigger the primary /chat logic to route through Agent OR RAG automatically
-    api_url = f"http://localhost:8000/chat"
-    
-    async with httpx.AsyncClient() as http_client:
-        ai_resp = await http_client.post(api_url, json={"bot_id": bot_id, "question": incoming_text})
-        ai_response_text = ai_resp.json().get("answer", "Error getting answer.")
+    # Same routing as /chat (Agent OR RAG), called in-process
+    try:
+        result = await chat_service.handle(bot_id, incoming_text, channel="telegram")
+        ai_response_text = result.answer
+    except ChatServiceError as e:
+        print(f"Telegram chat error: {e.detail}")
+        ai_response_text = "Error getting answer."
     
     send_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     payload = {"chat_id": chat_id, "text": ai_response_text}
     
-    async with httpx.AsyncClient() as http_client:
-        await http_client.post(send_url, json=payload)
+    await get_http_client().post(send_url, json=payload)
         
     return {"status": "success"}
 
@@ -499,10 +554,10 @@ async def connect_whatsapp(
     """Save WhatsApp credentials (Phone Number ID + Access Token) to the bot."""
     user_supabase = get_auth_client(user_token)
     try:
-        user_supabase.table("bots").update({
+        await db.execute(user_supabase.table("bots").update({
             "whatsapp_phone_id": phone_id,
             "whatsapp_access_token": access_token
-        }).eq("id", bot_id).eq("user_id", user.user.id).execute()
+        }).eq("id", bot_id).eq("user_id", user.user.id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save WhatsApp credentials: {str(e)}")
     
@@ -558,7 +613,7 @@ async def whatsapp_handler(request: Request):
         
         # Look up which bot is connected to this phone_number_id
         client = supabase_admin if supabase_admin else supabase
-        bot_resp = client.table("bots").select("id, whatsapp_access_token").eq("whatsapp_phone_id", phone_number_id).execute()
+        bot_resp = await db.execute(client.table("bots").select("id, whatsapp_access_token").eq("whatsapp_phone_id", phone_number_id))
         
         if not bot_resp.data:
             print(f"❌ No bot found for WhatsApp phone_id: {phone_number_id}")
@@ -567,13 +622,13 @@ async def whatsapp_handler(request: Request):
         bot_id = bot_resp.data[0]["id"]
         wa_access_token = bot_resp.data[0]["whatsapp_access_token"]
         
-        # Route through the existing /chat logic
-        async with httpx.AsyncClient(timeout=120.0) as http_client:
-            ai_resp = await http_client.post(
-                "http://localhost:8000/chat",
-                json={"bot_id": bot_id, "question": incoming_text}
-            )
-            ai_response_text = ai_resp.json().get("answer", "Sorry, I couldn't process that.")
+        # Route through the shared chat logic
+        try:
+            result = await chat_service.handle(bot_id, incoming_text, channel="whatsapp")
+            ai_response_text = result.answer
+        except ChatServiceError as e:
+            print(f"❌ WhatsApp chat error: {e.detail}")
+            ai_response_text = "Sorry, I couldn't process that."
         
         # Send reply via WhatsApp Cloud API
         send_url = f"https://graph.facebook.com/v21.0/{phone_number_id}/messages"
@@ -588,12 +643,11 @@ async def whatsapp_handler(request: Request):
             "text": {"body": ai_response_text}
         }
         
-        async with httpx.AsyncClient() as http_client:
-            send_resp = await http_client.post(send_url, json=payload, headers=headers)
-            if send_resp.status_code != 200:
-                print(f"❌ WhatsApp send error: {send_resp.text}")
-            else:
-                print(f"✅ WhatsApp reply sent to {sender_phone}")
+        send_resp = await get_http_client().post(send_url, json=payload, headers=headers)
+        if send_resp.status_code != 200:
+            print(f"❌ WhatsApp send error: {send_resp.text}")
+        else:
+            print(f"✅ WhatsApp reply sent to {sender_phone}")
         
         return {"status": "success"}
         
@@ -610,12 +664,12 @@ async def get_messages(bot_id: str, user: dict = Depends(verify_user), token: st
     user_supabase = get_auth_client(token)
     try:
         # Verify user owns this bot
-        bot_check = user_supabase.table("bots").select("id").eq("id", bot_id).eq("user_id", user.user.id).execute()
+        bot_check = await db.execute(user_supabase.table("bots").select("id").eq("id", bot_id).eq("user_id", user.user.id))
         if not bot_check.data:
             raise HTTPException(status_code=404, detail="Bot not found")
         
         client = supabase_admin if supabase_admin else user_supabase
-        response = client.table("messages").select("*").eq("bot_id", bot_id).order("created_at", desc=False).execute()
+        response = await db.execute(client.table("messages").select("*").eq("bot_id", bot_id).order("created_at", desc=False))
         return response.data
     except Exception as e:
         if "404" in str(e): raise e
@@ -626,12 +680,12 @@ async def clear_messages(bot_id: str, user: dict = Depends(verify_user), token:
     """Clear chat history for a bot."""
     user_supabase = get_auth_client(token)
     try:
-        bot_check = user_supabase.table("bots").select("id").eq("id", bot_id).eq("user_id", user.user.id).execute()
+        bot_check = await db.execute(user_supabase.table("bots").select("id").eq("id", bot_id).eq("user_id", user.user.id))
         if not bot_check.data:
             raise HTTPException(status_code=404, detail="Bot not found")
         
         client = supabase_admin if supabase_admin else user_supabase
-        client.table("messages").delete().eq("bot_id", bot_id).execute()
+        await db.execute(client.table("messages").delete().eq("bot_id", bot_id))
         return {"status": "success"}
     except Exception as e:
         if "404" in str(e): raise e
@@ -643,7 +697,7 @@ async def toggle_share(bot_id: str, body: ShareRequest, user: dict = Depends(ver
     user_supabase = get_auth_client(token)
     try:
         # Get current bot
-        bot_resp = user_supabase.table("bots").select("share_id, is_public").eq("id", bot_id).eq("user_id", user.user.id).single().execute()
+        bot_resp = await db.execute(user_supabase.table("bots").select("share_id, is_public").eq("id", bot_id).eq("user_id", user.user.id).single())
         if not bot_resp.data:
             raise HTTPException(status_code=404, detail="Bot not found")
         
@@ -654,7 +708,7 @@ async def toggle_share(bot_id: str, body: ShareRequest, user: dict = Depends(ver
             share_id = str(uuid.uuid4())
             update_data["share_id"] = share_id
         
-        user_supabase.table("bots").update(update_data).eq("id", bot_id).execute()
+        await db.execute(user_supabase.table("bots").update(update_data).eq("id", bot_id))
         
         return {
             "status": "success",
@@ -670,7 +724,7 @@ async def get_public_bot(share_id: str):
     """Get public bot info by share link (no auth required)."""
     client = supabase_admin if supabase_admin else supabase
     try:
-        response = client.table("bots").select("id, name, is_public").eq("share_id", share_id).eq("is_public", True).single().execute()
+        response = await db.execute(client.table("bots").select("id, name, is_public").eq("share_id", share_id).eq("is_public", True).single())
         if not response.data:
             raise HTTPException(status_code=404, detail="Bot not found or not public")
         return {"bot_id": response.data["id"], "name": response.data["name"]}
@@ -683,43 +737,36 @@ async def public_chat(share_id: str, request: ChatRequest):
     """Chat with a shared bot (no auth required)."""
     client = supabase_admin if supabase_admin else supabase
     try:
-        bot_resp = client.table("bots").select("id, workflow_id, is_public").eq("share_id", share_id).eq("is_public", True).single().execute()
+        bot_resp = await db.execute(client.table("bots").select("id, workflow_id, is_public").eq("share_id", share_id).eq("is_public", True).single())
         if not bot_resp.data:
             raise HTTPException(status_code=404, detail="Bot not found or not public")
     except Exception as e:
         raise HTTPException(status_code=404, detail="Bot not found or not public")
     
     bot_id = bot_resp.data["id"]
-    workflow_id = bot_resp.data.get("workflow_id")
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not found")
-    
-    answer = ""
-    if workflow_id:
-        wf_response = client.table("workflows").select("nodes, edges, user_id").eq("id", workflow_id).single().execute()
-        if wf_response.data:
-            try:
-                result = await build_and_run_workflow(wf_response.data['nodes'], wf_response.data['edges'], request.question, user_id=wf_response.data.get('user_id'))
-                answer = result.get('result', "Error running workflow.")
-            except Exception as e:
-                answer = f"Agent Error: {str(e)}"
-        else:
-            answer = "Error: Linked workflow not found."
-    else:
-        answer = get_answer(bot_id, request.question, api_key)
-    
-    # Log messages
     try:
-        client.table("messages").insert([
-            {"bot_id": bot_id, "role": "user", "content": request.question},
-            {"bot_id": bot_id, "role": "bot", "content": answer}
-        ]).execute()
+        result = await chat_service.handle(bot_id, request.question, channel="public", bot=bot_resp.data)
+    except ChatServiceError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {"answer": result.answer}
+
+@app.post("/public/chat/{share_id}/stream")
+async def public_chat_stream(share_id: str, request: ChatRequest):
+    """Streaming (SSE) variant of /public/chat/{share_id}."""
+    client = supabase_admin if supabase_admin else supabase
+    try:
+        bot_resp = await db.execute(client.table("bots").select("id, workflow_id, is_public").eq("share_id", share_id).eq("is_public", True).single())
+        if not bot_resp.data:
+            raise HTTPException(status_code=404, detail="Bot not found or not public")
     except Exception as e:
-        print(f"Error logging messages: {e}")
-    
-    return {"answer": answer}
+        raise HTTPException(status_code=404, detail="Bot not found or not public")
+
+    try:
+        events = await chat_service.open_stream(bot_resp.data["id"], request.question, channel="public", bot=bot_resp.data)
+    except ChatServiceError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _sse_response(events)
 
 
 @app.post("/execute-workflow")
@@ -781,17 +828,12 @@ async def bot_chat_proxy(bot_id: str, request: Request):
 
         print(f"🎤 Voice Agent asking Bot {bot_id}: {question}")
 
-        # Re-use the existing logic by calling the internal function or creating a request
-        # We'll just call the chat endpoint logic directly if possible, or trigger a self-request
-        # For simplicity and reliability, let's use httpx to call our own /chat endpoint
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                "http://localhost:8000/chat",
-                json={"bot_id": bot_id, "question": question}
-            )
-            response_data = response.json()
-            answer = response_data.get("answer", "I'm sorry, I couldn't process that.")
+        try:
+            result = await chat_service.handle(bot_id, question, channel="voice")
+            answer = result.answer
+        except ChatServiceError as e:
+            print(f"Proxy chat error: {e.detail}")
+            answer = "I'm sorry, I couldn't process that."
 
         return {
             "id": "chatcmpl-proxy",
@@ -859,13 +901,13 @@ async def google_callback(state: str, code: str):
     client = supabase_admin if supabase_admin else supabase
     
     try:
-        client.table("user_integrations").upsert({
+        await db.execute(client.table("user_integrations").upsert({
             "user_id": user_id,
             "provider": "google", 
             "access_token": credentials.token,
             "refresh_token": credentials.refresh_token,
             "updated_at": "now()"
-        }).execute()
+        }))
         print(f"✅ Successfully saved Google tokens for user: {user_id}")
     except Exception as e:
         print(f"❌ Failed to save tokens to Supabase: {e}")
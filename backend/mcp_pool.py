@@ -0,0 +1,213 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+
+# --- CONFIG ---
+MCP_MAX_SESSIONS = int(os.getenv("MCP_MAX_SESSIONS", "8"))          # live servers per worker
+MCP_IDLE_TIMEOUT = float(os.getenv("MCP_IDLE_TIMEOUT", "600"))      # seconds before an unused server is stopped
+MCP_HEALTHCHECK_AFTER = float(os.getenv("MCP_HEALTHCHECK_AFTER", "30"))  # ping servers idle for longer than this
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "60"))
+
+
+class _MCPServer:
+    """
+    One long-lived stdio MCP server. The stdio/session context managers are
+    entered and exited inside a dedicated task, because anyio cancel scopes
+    must be closed by the same task that opened them.
+    """
+
+    def __init__(self, key: Tuple[str, tuple], command: str, args: List[str]):
+        self.key = key
+        self.command = command
+        self.args = args
+        self.session = None
+        self.tools = []
+        self.error = None
+        self.last_used = time.monotonic()
+        self.loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._ready.wait(), timeout=MCP_CONNECT_TIMEOUT)
+        if self.error:
+            raise self.error
+
+    async def _run(self):
+        try:
+            # Imported here so the app (via workflow_engine) starts without the MCP SDK
+            from mcp import ClientSession, StdioServerParameters
+            from mcp.client.stdio import stdio_client
+            from langchain_mcp_adapters.tools import load_mcp_tools
+
+            params = StdioServerParameters(command=self.command, args=self.args, env=os.environ.copy())
+            async with stdio_client(params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.tools = await load_mcp_tools(session)
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def healthy(self) -> bool:
+        if not self.alive or self.loop is not asyncio.get_running_loop():
+            return False
+        # Recently used servers are trusted; only ping ones that have sat idle.
+        if time.monotonic() - self.last_used < MCP_HEALTHCHECK_AFTER:
+            return True
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=5)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        if self.loop is not asyncio.get_running_loop():
+            # Owned by another event loop; ask it to shut the server down.
+            if not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self._closing.set)
+            return
+        self._closing.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=10)
+            except Exception:
+                self._task.cancel()
+
+
+class MCPSessionPool:
+    """
+    Process-wide pool of MCP servers keyed by (command, args). Servers stay
+    alive between agent turns with their tool schemas cached; dead servers are
+    restarted, idle ones stopped, and at most `max_sessions` run at once
+    (least recently used is stopped first).
+
+    Each key has its own asyncio lock, so a slow or hung server only holds
+    up lookups for that same server. The pool-wide lock just guards the dict
+    and is never held across an await.
+    """
+
+    def __init__(self, max_sessions: int = MCP_MAX_SESSIONS, idle_timeout: float = MCP_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._servers: "OrderedDict[Tuple[str, tuple], _MCPServer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, tuple], asyncio.Lock] = {}
+        self._key_locks_loop = None
+        self._reaper = None
+        self._stats = {"hits": 0, "misses": 0, "restarts": 0, "evictions": 0, "failures": 0}
+
+    def _get_key_lock(self, key) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._key_locks_loop is not loop:
+                self._key_locks = {}
+                self._key_locks_loop = loop
+            return self._key_locks.setdefault(key, asyncio.Lock())
+
+    async def get_tools(self, command: str, args: List[str]):
+        key = (command, tuple(args))
+        await self._close_servers(self._take_idle())
+
+        async with self._get_key_lock(key):
+            with self._lock:
+                server = self._servers.get(key)
+            if server is not None and not await server.healthy():
+                print(f"♻️  MCP server {command} {args} is unhealthy, restarting")
+                with self._lock:
+                    self._stats["restarts"] += 1
+                    self._servers.pop(key, None)
+                await server.close()
+                server = None
+
+            if server is not None:
+                with self._lock:
+                    self._stats["hits"] += 1
+                    if key in self._servers:
+                        self._servers.move_to_end(key)
+            else:
+                with self._lock:
+                    self._stats["misses"] += 1
+                print(f"🔌 Starting MCP Server: {command} {args}")
+                server = _MCPServer(key, command, list(args))
+                try:
+                    await server.start()
+                except Exception:
+                    with self._lock:
+                        self._stats["failures"] += 1
+                    await server.close()
+                    raise
+
+                evicted = []
+                with self._lock:
+                    self._servers[key] = server
+                    while len(self._servers) > self.max_sessions:
+                        _, oldest = self._servers.popitem(last=False)
+                        self._stats["evictions"] += 1
+                        evicted.append(oldest)
+                await self._close_servers(evicted)
+                print(f"✅ Loaded {len(server.tools)} MCP tools: {[t.name for t in server.tools]}")
+
+            server.last_used = time.monotonic()
+            return server.tools
+
+    def _take_idle(self) -> List[_MCPServer]:
+        now = time.monotonic()
+        idle = []
+        with self._lock:
+            for key, server in list(self._servers.items()):
+                if now - server.last_used > self.idle_timeout:
+                    print(f"💤 Stopping idle MCP server: {key[0]} {list(key[1])}")
+                    self._servers.pop(key, None)
+                    self._stats["evictions"] += 1
+                    idle.append(server)
+        return idle
+
+    @staticmethod
+    async def _close_servers(servers: List[_MCPServer]):
+        for server in servers:
+            await server.close()
+
+    async def _reap_idle(self):
+        interval = max(1.0, min(self.idle_timeout / 2, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._close_servers(self._take_idle())
+            except Exception as e:
+                print(f"⚠️  MCP idle sweep failed: {e}")
+
+    def start_reaper(self):
+        """Stops idle servers periodically, even when no workflow is running."""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_idle())
+
+    async def close_all(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        with self._lock:
+            servers = list(self._servers.values())
+            self._servers.clear()
+        await self._close_servers(servers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "live_sessions": len(self._servers), "max_sessions": self.max_sessions}
+
+
+mcp_pool = MCPSessionPool()
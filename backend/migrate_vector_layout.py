@@ -0,0 +1,99 @@
+"""
+Moves stored vectors between the per-bot and sharded Chroma layouts
+(VECTOR_BACKEND=chroma only).
+
+Usage (from the backend folder, with the API stopped):
+    python migrate_vector_layout.py --to sharded [--shards 64] [--delete-source]
+    python migrate_vector_layout.py --to per_bot [--delete-source]
+
+Vectors are copied as-is (nothing is re-embedded). Chunk ids are rewritten
+for the target layout so later re-ingests still recognise unchanged chunks,
+and each migrated bot's BM25 index is dropped so it is rebuilt from the new
+ids on the bot's next question. Afterwards start the API with the same
+VECTOR_LAYOUT / VECTOR_SHARDS values.
+"""
+import argparse
+import os
+from collections import defaultdict
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--to", choices=["per_bot", "sharded"], required=True)
+parser.add_argument("--shards", type=int, help="shard count for --to sharded (default: VECTOR_SHARDS)")
+parser.add_argument("--page-size", type=int, default=1000)
+parser.add_argument("--delete-source", action="store_true", help="remove the old collections once copied")
+args = parser.parse_args()
+
+if args.shards:
+    os.environ["VECTOR_SHARDS"] = str(args.shards)
+
+import vector_store
+from vector_store import SHARD_PREFIX, bot_collection_name, get_chroma_client
+from lexical_index import LexicalIndex
+
+
+def target_id(chunk_id: str, bot_id: str) -> str:
+    prefix = f"{bot_id}:"
+    if args.to == "sharded":
+        return chunk_id if chunk_id.startswith(prefix) else prefix + chunk_id
+    return chunk_id[len(prefix):] if chunk_id.startswith(prefix) else chunk_id
+
+
+def read_pages(collection):
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=args.page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def main():
+    client = get_chroma_client()
+    sources = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    if args.to == "sharded":
+        sources = [name for name in sources if not name.startswith(SHARD_PREFIX)]
+    else:
+        sources = [name for name in sources if name.startswith(SHARD_PREFIX)]
+    if not sources:
+        print("Nothing to migrate.")
+        return
+
+    copied = defaultdict(int)
+    for name in sources:
+        source = client.get_collection(name=name, embedding_function=None)
+        for page in read_pages(source):
+            batches = defaultdict(lambda: ([], [], [], []))
+            for chunk_id, vector, text, metadata in zip(page["ids"], page["embeddings"], page["documents"], page["metadatas"]):
+                metadata = dict(metadata or {})
+                # Per-bot collections are named after the bot; older chunks may lack the field
+                bot_id = metadata.setdefault("bot_id", name) if args.to == "sharded" else metadata.get("bot_id")
+                if not bot_id:
+                    print(f"⚠️ Skipping chunk {chunk_id} in {name}: no bot_id metadata")
+                    continue
+                ids, vectors, texts, metadatas = batches[bot_id]
+                ids.append(target_id(chunk_id, bot_id))
+                vectors.append(vector)
+                texts.append(text)
+                metadatas.append(metadata)
+
+            for bot_id, (ids, vectors, texts, metadatas) in batches.items():
+                target = client.get_or_create_collection(name=bot_collection_name(bot_id, args.to), embedding_function=None)
+                target.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+                copied[bot_id] += len(ids)
+        print(f"✅ Copied {name}")
+
+        if args.delete_source:
+            client.delete_collection(name=name)
+
+    lexical_index = LexicalIndex()
+    for bot_id in copied:
+        lexical_index.drop_bot(bot_id)
+    print(f"Migrated {sum(copied.values())} chunks for {len(copied)} bots to the {args.to} layout"
+          + (f" ({vector_store.VECTOR_SHARDS} shards)" if args.to == "sharded" else ""))
+    if not args.delete_source:
+        print("Old collections were kept; re-run with --delete-source to remove them.")
+
+
+if __name__ == "__main__":
+    main()
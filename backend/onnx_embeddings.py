@@ -0,0 +1,97 @@
+import os
+import logging
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# The sentence-transformers repo ships ready-made ONNX exports of MiniLM,
+# including int8 dynamically-quantized variants for common CPUs.
+ONNX_MODEL_REPO = os.getenv("EMBEDDING_ONNX_REPO", "sentence-transformers/all-MiniLM-L6-v2")
+ONNX_MODEL_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+# The default int8 export is quantized for x86 CPUs with AVX2; on ARM point this
+# at onnx/model_qint8_arm64.onnx, or use the fp32 "onnx" backend instead
+ONNX_INT8_MODEL_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Point at a local directory (model.onnx + tokenizer.json) to skip the hub download
+ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_DIR")
+ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))   # 0 = onnxruntime default
+MAX_SEQ_LENGTH = 256                                             # same as the sentence-transformers config
+
+
+def _resolve(filename: str) -> str:
+    if ONNX_MODEL_DIR:
+        return os.path.join(ONNX_MODEL_DIR, os.path.basename(filename))
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(ONNX_MODEL_REPO, filename)
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime, without torch. Reproduces the
+    sentence-transformers pipeline (mean pooling over the attention mask,
+    then L2 normalisation), so fp32 vectors match the torch backend and can
+    be mixed with vectors already stored in Chroma. The int8 model drifts
+    (see benchmarks/bench_embedding_backends.py), so its vectors are not
+    comparable with fp32 ones: rag tags them with their own EMBEDDING_ID and
+    a bot's chunks must be re-embedded (reembed_vectors.py) when switching.
+    The int8 model needs a CPU matching ONNX_INT8_MODEL_FILE (AVX2 by default).
+    """
+
+    def __init__(self, quantized: bool = False, batch_size: int = 64, threads: int = ONNX_THREADS, model_file: Optional[str] = None):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backend needs onnxruntime and tokenizers: pip install 'backend[onnx]'"
+            ) from e
+
+        self.quantized = quantized
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(_resolve("tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        path = _resolve(model_file or (ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE))
+        try:
+            self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            if not quantized:
+                raise
+            # No silent fp32 fallback: stored int8 vectors would stop matching
+            raise RuntimeError(
+                f"Could not load the int8 embedding model {path} ({e}). It needs a CPU matching its "
+                "quantization (AVX2 for the default file); set EMBEDDING_ONNX_INT8_FILE for this CPU "
+                "or use EMBEDDING_BACKEND=onnx and re-embed with reembed_vectors.py"
+            ) from e
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {path}")
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
@@ -1,94 +1,489 @@
 import os
+import asyncio
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import CSVLoader, WebBaseLoader,PyMuPDFLoader
-from langchain_community.document_loaders import SQLDatabaseLoader
-from langchain_community.utilities import SQLDatabase
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_classic.chains import create_retrieval_chain 
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+from llm_clients import get_chat_model
+from embedding_cache import EmbeddingCache, CachedQueryEmbeddings, LazyEmbeddings, EMBEDDING_CACHE_PATH
+from loaders import load_and_split, iter_csv_chunks, is_streamable, SourceError
 from langchain_classic.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from lexical_index import LexicalIndex
+from answer_cache import SemanticAnswerCache
+from vector_store import create_vector_store
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize embeddings once
-embeddings = HuggingFaceEmbeddings(model_name="all-miniLM-L6-v2")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Chunks diffed and stored per step while syncing a source, in embedding batches
+SYNC_WINDOW_BATCHES = 8
+EMBEDDING_MODEL_NAME = "all-miniLM-L6-v2"
+# "torch" (sentence-transformers), "onnx" (same vectors, no torch) or
+# "onnx-int8" (quantized; slightly different vectors, cached separately)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Which vectors a chunk holds. fp32 ONNX reproduces the torch vectors, so only
+# int8 is told apart. It is stored as the "embedding_model" metadata of every
+# chunk and suffixed to int8 chunk ids, so switching the backend makes each
+# source's chunks new on its next sync instead of mixing the two kinds.
+EMBEDDING_ID = f"{EMBEDDING_MODEL_NAME}:int8" if EMBEDDING_BACKEND == "onnx-int8" else EMBEDDING_MODEL_NAME
 
-VECTOR_STORAGE_PATH = "./chroma_db"
 
+def _load_embedding_model():
+    if EMBEDDING_BACKEND in ("onnx", "onnx-int8"):
+        from onnx_embeddings import OnnxMiniLMEmbeddings
+        return OnnxMiniLMEmbeddings(quantized=EMBEDDING_BACKEND == "onnx-int8", batch_size=EMBED_BATCH_SIZE)
+    if EMBEDDING_BACKEND != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {EMBEDDING_BACKEND}")
 
-def ingest_file(file_path: str, bot_id: str, sql_query: str = None):
+    # Importing langchain_huggingface pulls in torch/sentence-transformers
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        encode_kwargs={"batch_size": EMBED_BATCH_SIZE}
+    )
+
+
+# One model per process, loaded on first use rather than at import
+embeddings = LazyEmbeddings(_load_embedding_model)
+
+
+def get_embeddings():
+    """Returns the loaded embedding model, loading it if needed."""
+    return embeddings.get_model()
+
+
+# Chunks already embedded with this model (by any bot) are never re-embedded
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_ID)
+
+# Questions go through an LRU so repeats skip the model; use this for every
+# query-side embedding (retrieval, answer cache, debug_bot)
+query_embeddings = CachedQueryEmbeddings(embeddings)
+
+# Chunk vectors for every bot; chroma (default) or numpy, see vector_store.py
+vector_store = create_vector_store()
+RAG_CHAIN_CACHE_SIZE = int(os.getenv("RAG_CHAIN_CACHE_SIZE", "64"))
+
+# Retrieval: chunks passed to the LLM (overridable per bot), and whether dense
+# results are fused with the BM25 index using reciprocal rank fusion
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+RAG_MAX_K = 20
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1") != "0"
+RAG_FETCH_K = int(os.getenv("RAG_FETCH_K", "20"))       # candidates per retriever before fusion
+RRF_K = 60
+
+# Query embedding and the vector/BM25 search are CPU-bound; async callers run
+# them here so the event loop only ever waits on the Gemini call
+RAG_QUERY_WORKERS = int(os.getenv("RAG_QUERY_WORKERS", "4"))
+_query_executor = ThreadPoolExecutor(max_workers=RAG_QUERY_WORKERS, thread_name_prefix="rag-query")
+
+# Per-bot BM25 index over the same chunks, stored next to the Chroma data
+lexical_index = LexicalIndex()
+
+# Answers to near-identical questions, per bot; cleared when a bot re-ingests
+answer_cache = SemanticAnswerCache()
+
+RAG_PROMPT = ChatPromptTemplate.from_template("""
+        You are a helpful AI assistant. Use the following context to answer the user's question.
+        If the answer is not in the context, politely say you don't know.
+        
+        Context:
+        {context}
+        
+        Question: {input}
+        """)
+
+# bot_id -> (api_key, answer cache generation, retrieval_chain). Building the
+# chain may backfill the BM25 index, so steady-state questions should never
+# rebuild it. The generation is shared by every process, so a change made
+# through any of them (new chunks, a new k) rebuilds the chain in all of them.
+_chain_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_chain_cache_lock = threading.Lock()
+_chain_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+def _clean_metadata(metadata: dict, bot_id: str) -> dict:
+    # Vector stores only take scalar metadata values (Chroma rejects empty dicts)
+    clean = {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+    clean["bot_id"] = bot_id
+    return clean
+
+
+def embed_and_store(
+    bot_id: str,
+    splits: List[Document],
+    ids: List[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """
+    Embeds chunks in fixed-size batches and writes each batch to the vector
+    store as soon as it's ready, so only one batch of vectors is held in
+    memory. Chunks are sorted by length first so each batch pads to a similar
+    sequence length. progress_callback(done, total) is called after each batch.
+    """
+    ordered = sorted(zip(ids, splits), key=lambda item: len(item[1].page_content))
+    total = len(ordered)
+
+    for start in range(0, total, batch_size):
+        batch = ordered[start:start + batch_size]
+        chunk_ids = [chunk_id for chunk_id, _ in batch]
+        texts = [doc.page_content for _, doc in batch]
+        metadatas = [_clean_metadata(doc.metadata, bot_id) for _, doc in batch]
+        vector_store.upsert(
+            bot_id,
+            chunk_ids,
+            embedding_cache.embed_documents(texts, embeddings.embed_documents),
+            texts,
+            metadatas
+        )
+        lexical_index.add(bot_id, chunk_ids, texts, metadatas)
+        if progress_callback:
+            progress_callback(min(start + batch_size, total), total)
+
+    return total
+
+
+def make_source_id(source_name: str) -> str:
+    """Stable id for a knowledge source (original filename or URL)."""
+    return hashlib.sha256(source_name.encode("utf-8")).hexdigest()[:16]
+
+
+def make_chunk_id(source_id: str, content_hash: str) -> str:
+    """"<source_id>:<content_hash>", plus ":int8" for int8 vectors."""
+    chunk_id = f"{source_id}:{content_hash}"
+    if EMBEDDING_ID != EMBEDDING_MODEL_NAME:
+        chunk_id += EMBEDDING_ID[len(EMBEDDING_MODEL_NAME):]
+    return chunk_id
+
+
+def _embedding_id(metadata: dict) -> str:
+    # Chunks stored before the field existed were all embedded in fp32
+    return metadata.get("embedding_model", EMBEDDING_MODEL_NAME)
+
+
+def sync_source_chunks(
+    bot_id: str,
+    source_name: str,
+    splits: Iterable[Document],
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+) -> dict:
+    """
+    Makes the bot's stored chunks for one source match `splits`. Each chunk id
+    is "<source_id>:<content_hash>" (see make_chunk_id), so unchanged chunks
+    are skipped, new ones are embedded and added, and chunks that vanished
+    from the source or were embedded by another EMBEDDING_BACKEND are
+    deleted. Returns a report of what changed.
+
+    `splits` may be a lazy iterator (streamed CSV): it is consumed in windows,
+    each window embedded and handed to the vector store before the next is
+    read, so memory stays flat apart from the set of seen chunk ids (and the
+    numpy backend's bounded write batch). If the stream fails partway,
+    the windows already stored stay and nothing is removed (the unread rest
+    of the source can't be told apart from stale chunks); the SourceError
+    raised says how far it got, and a clean re-run finishes the sync.
+    """
+    source_id = make_source_id(source_name)
+    total = len(splits) if isinstance(splits, list) else None
+
+    seen = set()
+    loader_sources = set()
+    added = 0
+
+    def flush(window: dict):
+        nonlocal added
+        existing = vector_store.existing_ids(bot_id, list(window))
+        new_ids = [chunk_id for chunk_id in window if chunk_id not in existing]
+        if new_ids:
+            embed_and_store(bot_id, [window[chunk_id] for chunk_id in new_ids], new_ids)
+            added += len(new_ids)
+        if progress_callback:
+            progress_callback(len(seen), total)
+
+    # Windows span several embedding batches so length-sorting still pays off
+    window = {}
+    try:
+        # One vector store write for the whole source (numpy rewrites per write)
+        with vector_store.batch(bot_id):
+            for doc in splits:
+                content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:32]
+                chunk_id = make_chunk_id(source_id, content_hash)
+                if chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
+                doc.metadata.update({
+                    "source_id": source_id, "source_name": source_name,
+                    "content_hash": content_hash, "embedding_model": EMBEDDING_ID
+                })
+                if isinstance(doc.metadata.get("source"), str):
+                    loader_sources.add(doc.metadata["source"])
+                window[chunk_id] = doc
+                if len(window) >= EMBED_BATCH_SIZE * SYNC_WINDOW_BATCHES:
+                    flush(window)
+                    window = {}
+            if window:
+                flush(window)
+    except Exception as e:
+        if not seen:
+            raise
+        if added:
+            invalidate_bot_cache(bot_id)
+        raise SourceError(
+            f"{e} (partial ingest: read {len(seen)} chunks, stored {added} new ones; "
+            f"chunks from the previous version were kept and will be cleaned up on the next successful run)"
+        ) from e
+
+    # Everything new is stored; now drop what vanished from the source, plus
+    # chunks stored before source ids existed (they carry only the loader's "source").
+    # Uploads used to be saved as temp_<original filename>; they now go to random
+    # scratch paths, so match the old name too.
+    if not source_name.startswith(("http://", "https://")):
+        loader_sources.update({f"temp_{source_name}", f"temp_{os.path.basename(source_name)}"})
+    to_remove = set(vector_store.find(bot_id, source_id=source_id)) - seen
+    for loader_source in loader_sources:
+        found = vector_store.find(bot_id, source=loader_source)
+        to_remove.update(chunk_id for chunk_id, metadata in found.items() if not metadata.get("source_id"))
+    if to_remove:
+        vector_store.delete(bot_id, list(to_remove))
+        lexical_index.delete(bot_id, list(to_remove))
+
+    return {
+        "source": source_name,
+        "source_id": source_id,
+        "chunks": len(seen),
+        "added": added,
+        "removed": len(to_remove),
+        "unchanged": len(seen) - added,
+    }
+
+
+def unchanged_source_report(bot_id: str, source_name: str) -> dict:
+    """
+    Change report for a source that is known not to have changed since it was
+    stored. Reports no chunks if any were embedded by another EMBEDDING_BACKEND,
+    so the caller syncs the source again.
+    """
+    source_id = make_source_id(source_name)
+    found = vector_store.find(bot_id, source_id=source_id)
+    stored = 0 if any(_embedding_id(m) != EMBEDDING_ID for m in found.values()) else len(found)
+    return {"source": source_name, "source_id": source_id, "chunks": stored, "added": 0, "removed": 0, "unchanged": stored}
+
+
+def store_source(
+    bot_id: str,
+    source_name: str,
+    splits: Iterable[Document],
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+) -> dict:
+    """
+    Embeds and stores already-split (or streamed) chunks for one source and returns the
+    change report. This is the embedding half of ingestion; it runs in the
+    API process, which holds the only copy of the embedding model.
+    """
+    report = sync_source_chunks(bot_id, source_name, splits, progress_callback=progress_callback)
+    if report["added"] or report["removed"]:
+        invalidate_bot_cache(bot_id)
+
+    logger.info(
+        f"Successfully ingested {report['chunks']} chunks "
+        f"({report['added']} added, {report['removed']} removed, {report['unchanged']} unchanged)."
+    )
+    return report
+
+
+def ingest_file(file_path: str, bot_id: str, sql_query: str = None, progress_callback: Optional[Callable[[int, int], None]] = None, source_name: str = None):
     """ 
-    Reads PDF / CSV / SQL / URL, splits it and stores vectors in ChromaDB
-    under a collection name 'bot_id'.
-    Returns (success: bool, result: any).
+    Reads PDF / CSV / SQL / URL, splits it and stores the bot's vectors in
+    the vector store.
+    source_name identifies the source across re-ingestions (original filename
+    or URL; defaults to file_path) so only changed chunks are re-embedded.
+    progress_callback(processed, total) is called as batches are stored;
+    total is None for streamed sources.
+    Returns (success: bool, result: any) - on success a change report.
     """
     try:
         logger.info(f"Ingesting file: {file_path} for bot_id: {bot_id}")
+        if is_streamable(file_path):
+            splits = iter_csv_chunks(file_path)
+        else:
+            splits = load_and_split(file_path, sql_query)
+        return True, store_source(bot_id, source_name or file_path, splits, progress_callback=progress_callback)
 
-        # -------- Loader Selection --------
-        if file_path.startswith("https://") or file_path.startswith("http://"):
-            loader = WebBaseLoader(f"https://r.jina.ai/{file_path}")
+    except SourceError as e:
+        return False, str(e)
+    except Exception as e:
+        logger.error(f"Error ingesting file: {e}")
+        return False, str(e)
 
-        elif file_path.lower().endswith(".pdf"):
-            loader = PyMuPDFLoader(file_path)
 
-        elif file_path.lower().endswith(".csv"):
-            loader = CSVLoader(
-                file_path=file_path,
-                encoding="utf-8",
-                csv_args={"delimiter": ","}
-            )
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses dense (vector store) and lexical (BM25) results with reciprocal rank
+    fusion: each chunk scores sum(1 / (RRF_K + rank)) over the lists it
+    appears in, and the top k are returned. With hybrid=False it is a plain
+    dense top-k search.
+    """
 
-        # elif file_path.startswith(("sqlite:///", "mysql", "postgresql")):
-        #     if not sql_query:
-        #         return False, "SQL query is required for SQL ingestion."
+    bot_id: str
+    k: int = RAG_TOP_K
+    fetch_k: int = RAG_FETCH_K
+    hybrid: bool = True
 
-        #     db = SQLDatabase.from_uri(file_path)
-        #     loader = SQLDatabaseLoader(db=db, query=sql_query)
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.retrieve(query, query_embeddings.embed_query(query))
 
-        else:
-            return False, "Unsupported file type or database URI."
+    def retrieve(self, query: str, query_vector: List[float]) -> List[Document]:
+        """Retrieval for a query whose embedding the caller already has."""
+        if not self.hybrid:
+            return vector_store.search(self.bot_id, query_vector, self.k)
+
+        dense = vector_store.search(self.bot_id, query_vector, self.fetch_k)
+        lexical = [
+            Document(page_content=text, metadata=metadata)
+            for _, text, metadata in lexical_index.search(self.bot_id, query, self.fetch_k)
+        ]
 
-        # -------- Load Documents --------
-        docs = loader.load()
+        scores, docs = {}, {}
+        for results in (dense, lexical):
+            for rank, doc in enumerate(results):
+                key = doc.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+                docs.setdefault(key, doc)
 
-        if not docs:
-            logger.warning("No documents found.")
-            return False, "No documents found."
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [docs[key] for key in ranked[:self.k]]
 
-        # -------- Split Text --------
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+
+def reembed_bot(bot_id: str, batch_size: int = EMBED_BATCH_SIZE) -> int:
+    """
+    Re-embeds a bot's chunks that were embedded by another EMBEDDING_BACKEND,
+    from their stored text, so its vectors are all comparable again without
+    re-ingesting the sources. Returns how many chunks were re-embedded.
+    """
+    stale = []
+    for ids, texts, metadatas in vector_store.iter_chunks(bot_id):
+        stale.extend(
+            (chunk_id, text, metadata) for chunk_id, text, metadata in zip(ids, texts, metadatas)
+            if _embedding_id(metadata) != EMBEDDING_ID
         )
 
-        splits = text_splitter.split_documents(docs)
-        splits = [doc for doc in splits if len(doc.page_content.strip()) > 10] 
+    with vector_store.batch(bot_id):
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            old_ids = [chunk_id for chunk_id, _, _ in batch]
+            # Chunks from before source ids existed keep their uuid ids
+            new_ids = [
+                make_chunk_id(m["source_id"], m["content_hash"]) if m.get("source_id") and m.get("content_hash") else chunk_id
+                for chunk_id, _, m in batch
+            ]
+            texts = [text for _, text, _ in batch]
+            metadatas = [{**metadata, "embedding_model": EMBEDDING_ID} for _, _, metadata in batch]
+            vector_store.upsert(bot_id, new_ids, embedding_cache.embed_documents(texts, embeddings.embed_documents), texts, metadatas)
+            lexical_index.add(bot_id, new_ids, texts, metadatas)
+            renamed = [old for old, new in zip(old_ids, new_ids) if old != new]
+            if renamed:
+                vector_store.delete(bot_id, renamed)
+                lexical_index.delete(bot_id, renamed)
 
-        if not splits:
-            logger.warning("No significant text chunks found (PDF might be image-only).")
-            return False, "No readable text found."
+    if stale:
+        invalidate_bot_cache(bot_id)
+    return len(stale)
 
-        # -------- Store Vectors --------
-        Chroma.from_documents(
-            documents=splits,
-            embedding=embeddings,
-            persist_directory=VECTOR_STORAGE_PATH,
-            collection_name=bot_id
-        )
 
-        logger.info(f"Successfully ingested {len(splits)} chunks.")
-        return True, len(splits)
+def _backfill_lexical_index(bot_id: str, page_size: int = 1000):
+    """
+    Copies every stored chunk into the bot's BM25 index, once per bot (and
+    again after its index is dropped). Needed for bots ingested before lexical
+    indexing existed, even once a later ingest has created the table with
+    only its own chunks. add() replaces existing ids, so re-adding is harmless.
+    """
+    total = 0
+    for ids, texts, metadatas in vector_store.iter_chunks(bot_id, page_size):
+        lexical_index.add(bot_id, ids, texts, metadatas)
+        total += len(ids)
+    lexical_index.record_backfill(bot_id)
+    if total:
+        logger.info(f"Built lexical index for bot {bot_id} ({total} chunks)")
 
-    except Exception as e:
-        logger.error(f"Error ingesting file: {e}")
-        return False, str(e)
+
+def get_retrieval_k(bot_id: str) -> int:
+    return lexical_index.get_k(bot_id) or RAG_TOP_K
+
+
+def set_retrieval_k(bot_id: str, k: Optional[int]):
+    """Sets how many chunks a bot's answers draw on (None restores RAG_TOP_K)."""
+    if k is not None and not 1 <= k <= RAG_MAX_K:
+        raise ValueError(f"k must be between 1 and {RAG_MAX_K}")
+    lexical_index.set_k(bot_id, k)
+    invalidate_bot_cache(bot_id)
+
+
+def _build_retrieval_chain(bot_id: str, api_key: str):
+    k = get_retrieval_k(bot_id)
+    if RAG_HYBRID and not lexical_index.is_backfilled(bot_id):
+        _backfill_lexical_index(bot_id)
+    retriever = HybridRetriever(bot_id=bot_id, k=k, fetch_k=max(RAG_FETCH_K, k), hybrid=RAG_HYBRID)
+
+    llm = get_chat_model(
+        api_key=api_key,
+        model="gemini-2.5-flash",
+        temperature=0.7
+    )
+
+    # Retrieval runs separately (see get_answer) so the question is embedded
+    # once for both the answer cache and the vector search
+    return retriever, create_stuff_documents_chain(llm, RAG_PROMPT)
+
+
+def get_retrieval_chain(bot_id: str, api_key: str, generation: Optional[int] = None):
+    """
+    Returns the cached (retriever, document_chain) pair for a bot, building
+    it on first use or once the bot's answer cache generation has moved on.
+    Pass the generation if the caller already read it.
+    """
+    if generation is None:
+        generation = answer_cache.generation(bot_id)
+    with _chain_cache_lock:
+        entry = _chain_cache.get(bot_id)
+        if entry and entry[0] == api_key and entry[1] == generation:
+            _chain_cache.move_to_end(bot_id)
+            _chain_cache_stats["hits"] += 1
+            return entry[2]
+        _chain_cache_stats["misses"] += 1
+
+    retrieval_chain = _build_retrieval_chain(bot_id, api_key)
+
+    with _chain_cache_lock:
+        _chain_cache[bot_id] = (api_key, generation, retrieval_chain)
+        _chain_cache.move_to_end(bot_id)
+        while len(_chain_cache) > RAG_CHAIN_CACHE_SIZE:
+            _chain_cache.popitem(last=False)
+            _chain_cache_stats["evictions"] += 1
+
+    return retrieval_chain
+
+
+def invalidate_bot_cache(bot_id: str):
+    """
+    Drops cached retrieval state and answers for a bot. Called whenever its
+    vectors or retrieval settings change.
+    """
+    with _chain_cache_lock:
+        if _chain_cache.pop(bot_id, None) is not None:
+            _chain_cache_stats["invalidations"] += 1
+    answer_cache.invalidate(bot_id)
+
+
+def get_rag_cache_stats():
+    with _chain_cache_lock:
+        return {**_chain_cache_stats, "size": len(_chain_cache), "max_size": RAG_CHAIN_CACHE_SIZE}
 
 
 def get_answer(bot_id: str, question: str, api_key: str):
@@ -96,52 +491,103 @@ def get_answer(bot_id: str, question: str, api_key: str):
     Returns the answer to the question using RAG.
     """
     try:
-        vectorstore = Chroma(
-            persist_directory=VECTOR_STORAGE_PATH,
-            collection_name=bot_id,
-            embedding_function=embeddings
-        )
+        # Taken before retrieval so an answer built on since-replaced chunks isn't cached
+        generation = answer_cache.generation(bot_id)
+        query_vector = query_embeddings.embed_query(question)
+        cached = answer_cache.get(bot_id, question, query_vector, generation)
+        if cached is not None:
+            return cached
 
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+        retriever, document_chain = get_retrieval_chain(bot_id, api_key, generation)
+        context = retriever.retrieve(question, query_vector)
+        answer = document_chain.invoke({"input": question, "context": context})
+        if answer.strip():
+            answer_cache.put(bot_id, question, query_vector, answer, generation)
+        return answer
 
-        llm = ChatGoogleGenerativeAI(
-            google_api_key=api_key,
-            model="gemini-2.5-flash",
-            temperature=0.7
-        )
+    except Exception as e:
+        logger.error(f"Error getting answer: {e}")
+        return f"I encountered an error retrieving the answer: {str(e)}"
 
-        prompt = ChatPromptTemplate.from_template("""
-        You are a helpful AI assistant. Use the following context to answer the user's question.
-        If the answer is not in the context, politely say you don't know.
-        
-        Context:
-        {context}
-        
-        Question: {input}
-        """)
 
-        document_chain = create_stuff_documents_chain(llm, prompt)
-        retrieval_chain = create_retrieval_chain(retriever, document_chain)
+async def _run_query_step(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_query_executor, fn, *args)
+
+
+async def _aprepare(bot_id: str, question: str, api_key: str):
+    """
+    Embeds the question and checks the answer cache; on a miss also retrieves
+    context. Returns (query_vector, generation, cached_answer, document_chain,
+    context); generation is the answer cache's, taken before retrieval.
+    """
+    generation = await _run_query_step(answer_cache.generation, bot_id)
+    query_vector = await _run_query_step(query_embeddings.embed_query, question)
+    cached = answer_cache.get(bot_id, question, query_vector, generation)
+    if cached is not None:
+        return query_vector, generation, cached, None, None
+
+    retriever, document_chain = await _run_query_step(get_retrieval_chain, bot_id, api_key, generation)
+    context = await _run_query_step(retriever.retrieve, question, query_vector)
+    return query_vector, generation, None, document_chain, context
+
+
+async def aget_answer(bot_id: str, question: str, api_key: str):
+    """
+    Async get_answer: embedding and retrieval run on the query executor and
+    the LLM call is awaited, so the event loop is never blocked.
+    """
+    try:
+        query_vector, generation, cached, document_chain, context = await _aprepare(bot_id, question, api_key)
+        if cached is not None:
+            return cached
 
-        response = retrieval_chain.invoke({"input": question})
-        return response["answer"]
+        answer = await document_chain.ainvoke({"input": question, "context": context})
+        if answer.strip():
+            answer_cache.put(bot_id, question, query_vector, answer, generation)
+        return answer
 
     except Exception as e:
         logger.error(f"Error getting answer: {e}")
         return f"I encountered an error retrieving the answer: {str(e)}"
 
 
+async def astream_answer(bot_id: str, question: str, api_key: str):
+    """
+    Streams the RAG answer as text chunks while Gemini generates it.
+    A cached answer is yielded as a single chunk.
+    """
+    try:
+        query_vector, generation, cached, document_chain, context = await _aprepare(bot_id, question, api_key)
+        if cached is not None:
+            yield cached
+            return
+
+        answer = ""
+        async for chunk in document_chain.astream({"input": question, "context": context}):
+            if chunk:
+                answer += chunk
+                yield chunk
+        if answer.strip():
+            answer_cache.put(bot_id, question, query_vector, answer, generation)
+
+    except Exception as e:
+        logger.error(f"Error streaming answer: {e}")
+        yield f"I encountered an error retrieving the answer: {str(e)}"
+
+
+def shutdown_query_executor():
+    _query_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def delete_bot_data(bot_id: str):
     """
-    Deletes the vector store collection for the bot.
+    Deletes the vector store data for the bot.
     """
     try:
         logger.info(f"Deleting vector data for bot: {bot_id}")
-        Chroma(
-            persist_directory=VECTOR_STORAGE_PATH,
-            collection_name=bot_id,
-            embedding_function=embeddings
-        ).delete_collection()
+        invalidate_bot_cache(bot_id)
+        vector_store.drop_bot(bot_id)
+        lexical_index.drop_bot(bot_id)
         return True
     except Exception as e:
         logger.error(f"Error deleting bot data: {e}")
@@ -0,0 +1,32 @@
+"""
+Re-embeds stored chunks with the current EMBEDDING_BACKEND.
+
+Usage (from the backend folder, with the API stopped):
+    EMBEDDING_BACKEND=onnx-int8 python reembed_vectors.py BOT_ID [BOT_ID ...]
+
+Run it after switching EMBEDDING_BACKEND to or from onnx-int8. Vectors from
+the two can't be compared, and a source is otherwise only re-embedded when it
+is next ingested. Chunks are re-embedded from their stored text (sources are
+not reloaded); chunks already embedded by the current backend are skipped, so
+the command can be re-run after an interruption.
+"""
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument("bot_ids", nargs="+", help="bots to re-embed")
+args = parser.parse_args()
+
+import rag
+
+
+def main():
+    total = 0
+    for bot_id in args.bot_ids:
+        count = rag.reembed_bot(bot_id)
+        total += count
+        print(f"✅ {bot_id}: re-embedded {count} chunks")
+    print(f"Re-embedded {total} chunks for {len(args.bot_ids)} bots with {rag.EMBEDDING_ID}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import time
+from typing import Any, Dict, List, Tuple
+
+# Imported first thing in main.py, so this is (almost) when the app began loading
+_started = time.perf_counter()
+_last = _started
+_phases: List[Tuple[str, float]] = []
+
+
+def mark(phase: str):
+    """Records how long the app spent since the previous mark."""
+    global _last
+    now = time.perf_counter()
+    _phases.append((phase, round(now - _last, 3)))
+    _last = now
+
+
+def report() -> Dict[str, Any]:
+    return {
+        "phases": dict(_phases),
+        "total_seconds": round(_last - _started, 3),
+    }
+
+
+def format_report() -> str:
+    parts = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in _phases)
+    return f"⏱️ Startup took {_last - _started:.2f}s ({parts})"
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Every local store rag.py and ingest_queue.py open at import goes to a
+# scratch directory, and vectors use the numpy backend so no Chroma is needed
+_DATA_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+for name, filename in {
+    "VECTOR_STORAGE_PATH": "chroma_db",
+    "NUMPY_VECTOR_PATH": "vectors_npy",
+    "LEXICAL_INDEX_PATH": "lexical.sqlite3",
+    "EMBEDDING_CACHE_PATH": "embedding_cache.sqlite3",
+    "INGEST_QUEUE_PATH": "ingest_jobs.sqlite3",
+    "WEB_FETCH_CACHE_PATH": "web_fetch.sqlite3",
+}.items():
+    os.environ[name] = os.path.join(_DATA_DIR, filename)
+os.environ["VECTOR_BACKEND"] = "numpy"
+
+# Allow running from the backend root or from inside tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeEmbeddings:
+    """Deterministic 16-d vectors from a hash of the text, instead of MiniLM."""
+
+    def embed_documents(self, texts):
+        return [[float(b) - 127.5 for b in hashlib.sha256(text.encode("utf-8")).digest()[:16]] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    import rag
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(rag, "embeddings", fake)
+    return fake
+
+
+@pytest.fixture
+def bot_id():
+    return f"bot-{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,47 @@
+import pytest
+
+from answer_cache import SemanticAnswerCache, literal_tokens
+
+
+@pytest.fixture
+def caches(tmp_path):
+    """Two caches sharing one generations table, like two API processes."""
+    path = str(tmp_path / "generations.sqlite3")
+    return SemanticAnswerCache(generations_path=path), SemanticAnswerCache(generations_path=path)
+
+
+def test_hit_needs_similar_vector_and_same_codes(caches):
+    cache, _ = caches
+    generation = cache.generation("bot")
+    cache.put("bot", "What does SKU-1234 cost?", [1.0, 0.0], "$10", generation)
+
+    assert cache.get("bot", "What does SKU-1234 cost", [0.99, 0.01], generation) == "$10"
+    assert cache.get("bot", "What does SKU-1235 cost?", [1.0, 0.0], generation) is None
+    assert cache.get("bot", "What does SKU-1234 cost?", [0.0, 1.0], generation) is None
+
+
+def test_literal_tokens_are_normalized():
+    assert literal_tokens("Order AB-12 in XL") == literal_tokens("order ab_12 in XL") == {"ab12", "xl"}
+    assert literal_tokens("How do refunds work?") == frozenset()
+
+
+def test_invalidate_retires_answers_in_every_process(caches):
+    a, b = caches
+    a.put("bot", "hours?", [1.0, 0.0], "9 to 5", a.generation("bot"))
+    a.put("other", "hours?", [1.0, 0.0], "always", a.generation("other"))
+
+    b.invalidate("bot")
+
+    assert a.get("bot", "hours?", [1.0, 0.0], a.generation("bot")) is None
+    assert a.get("other", "hours?", [1.0, 0.0], a.generation("other")) == "always"
+    assert a.get_stats()["stale_drops"] == 1
+
+
+def test_put_after_invalidate_is_dropped(caches):
+    a, b = caches
+    generation = a.generation("bot")   # taken before retrieval
+    b.invalidate("bot")                # knowledge changes while the LLM answers
+    a.put("bot", "hours?", [1.0, 0.0], "stale", generation)
+
+    assert a.get("bot", "hours?", [1.0, 0.0], a.generation("bot")) is None
+    assert a.get_stats()["size"] == 0
@@ -0,0 +1,78 @@
+import socket
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec
+
+import auth
+
+SECRET = "legacy-project-secret-" + "x" * 48
+EC_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+class FakeJWKSClient:
+    def __init__(self, public_key):
+        self.public_key = public_key
+
+    def get_signing_key_from_jwt(self, token):
+        return SimpleNamespace(key=self.public_key)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.calls = []
+        self.auth = self
+
+    def get_user(self, token):
+        self.calls.append(token)
+        return SimpleNamespace(user=SimpleNamespace(id="remote-user"))
+
+
+def make_token(key, algorithm, sub="user-1", **headers):
+    claims = {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 600}
+    return jwt.encode(claims, key, algorithm=algorithm, headers=headers or None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(auth, "_users", OrderedDict())
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "_jwks_client", FakeJWKSClient(EC_KEY.public_key()))
+
+
+def test_shared_secret_and_jwks_tokens_verify_locally():
+    supabase = FakeSupabase()
+
+    legacy = auth.verify_token(make_token(SECRET, "HS256", sub="legacy"), supabase)
+    modern = auth.verify_token(make_token(EC_KEY, "ES256", sub="modern", kid="k1"), supabase)
+
+    assert (legacy.user.id, modern.user.id) == ("legacy", "modern")
+    assert supabase.calls == []
+
+
+def test_algorithm_is_not_taken_from_the_token_header():
+    # Signed with the shared secret but under an algorithm only the JWKS
+    # branch would see; the JWKS allowlist has no HMAC algorithms
+    token = make_token(SECRET, "HS512")
+
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        auth.verify_token(token, FakeSupabase())
+    assert auth.get_cached_user(token) is None
+
+
+def test_jwks_failure_falls_back_to_remote_verification(monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        closed_port = probe.getsockname()[1]
+    monkeypatch.setattr(auth, "_jwks_client", jwt.PyJWKClient(f"http://127.0.0.1:{closed_port}/jwks.json", timeout=1))
+    supabase = FakeSupabase()
+    token = make_token(EC_KEY, "ES256", kid="k1")
+
+    user = auth.verify_token(token, supabase)
+
+    assert user.user.id == "remote-user"
+    assert supabase.calls == [token]
+    assert auth.get_cached_user(token) is user
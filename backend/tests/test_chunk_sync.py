@@ -0,0 +1,71 @@
+import hashlib
+
+import pytest
+from langchain_core.documents import Document
+
+import rag
+from loaders import SourceError
+
+
+def splits(texts, source="/tmp/ingest-spool/upload-1a2b3c.txt"):
+    return [Document(page_content=text, metadata={"source": source}) for text in texts]
+
+
+def chunk_id(source_name, text):
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    return rag.make_chunk_id(rag.make_source_id(source_name), content_hash)
+
+
+def stored_texts(bot_id):
+    return sorted(text for _, texts, _ in rag.vector_store.iter_chunks(bot_id) for text in texts)
+
+
+def test_resync_reports_added_removed_and_unchanged(fake_embeddings, bot_id):
+    first = rag.sync_source_chunks(bot_id, "faq.txt", splits(["alpha", "beta", "gamma"]))
+    assert (first["chunks"], first["added"], first["removed"], first["unchanged"]) == (3, 3, 0, 0)
+
+    second = rag.sync_source_chunks(bot_id, "faq.txt", splits(["alpha", "gamma", "delta", "delta"]))
+    assert (second["chunks"], second["added"], second["removed"], second["unchanged"]) == (3, 1, 1, 2)
+
+    assert set(rag.vector_store.find(bot_id)) == {chunk_id("faq.txt", t) for t in ("alpha", "gamma", "delta")}
+
+
+def test_other_sources_are_left_alone(fake_embeddings, bot_id):
+    rag.sync_source_chunks(bot_id, "a.txt", splits(["one", "two"]))
+    rag.sync_source_chunks(bot_id, "b.txt", splits(["three"]))
+
+    report = rag.sync_source_chunks(bot_id, "a.txt", splits(["one"]))
+
+    assert report["removed"] == 1
+    assert stored_texts(bot_id) == ["one", "three"]
+
+
+def test_legacy_chunks_of_the_same_upload_are_removed(fake_embeddings, bot_id):
+    # Stored before chunk diffing: uuid ids and only the loader's "source",
+    # which was the temp_<filename> the upload was saved as
+    texts = ["old one", "old two", "unrelated"]
+    rag.vector_store.upsert(
+        bot_id, ["uuid-1", "uuid-2", "uuid-3"], fake_embeddings.embed_documents(texts), texts,
+        [{"source": "temp_faq.txt"}, {"source": "temp_faq.txt"}, {"source": "temp_other.txt"}]
+    )
+
+    report = rag.sync_source_chunks(bot_id, "faq.txt", splits(["new one"]))
+
+    assert (report["added"], report["removed"]) == (1, 2)
+    assert set(rag.vector_store.find(bot_id)) == {"uuid-3", chunk_id("faq.txt", "new one")}
+
+
+def test_failed_stream_keeps_what_was_stored(fake_embeddings, bot_id, monkeypatch):
+    monkeypatch.setattr(rag, "SYNC_WINDOW_BATCHES", 1)
+    monkeypatch.setattr(rag, "EMBED_BATCH_SIZE", 2)
+    rag.sync_source_chunks(bot_id, "big.csv", splits(["old"]))
+
+    def broken():
+        yield from splits(["r1", "r2", "r3"])
+        raise OSError("connection reset")
+
+    with pytest.raises(SourceError, match="partial ingest"):
+        rag.sync_source_chunks(bot_id, "big.csv", broken())
+
+    # The first full window was stored; nothing was removed
+    assert stored_texts(bot_id) == ["old", "r1", "r2"]
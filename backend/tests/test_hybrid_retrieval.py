@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+
+import rag
+from answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(rag, "get_chat_model", lambda **kwargs: FakeListChatModel(responses=["ok"]))
+
+
+def test_legacy_chunks_are_backfilled_after_a_new_ingest(fake_embeddings, bot_id):
+    # A bot ingested before BM25 existed: chunks in the vector store only
+    texts = ["Widget SKU-777 is blue", "Shipping takes two days", "Returns within 30 days"]
+    rag.vector_store.upsert(
+        bot_id, ["uuid-1", "uuid-2", "uuid-3"], fake_embeddings.embed_documents(texts), texts,
+        [{"source": "temp_legacy.csv", "bot_id": bot_id}] * 3
+    )
+    # A new source creates the bot's lexical table with only its own chunks
+    rag.store_source(bot_id, "new.txt", [Document(page_content="Gift cards never expire", metadata={})])
+    assert rag.lexical_index.has_bot(bot_id)
+
+    retriever, _ = rag.get_retrieval_chain(bot_id, "key")
+
+    assert [text for _, text, _ in rag.lexical_index.search(bot_id, "SKU-777", 3)] == ["Widget SKU-777 is blue"]
+    docs = retriever.retrieve("SKU-777", fake_embeddings.embed_query("unrelated"))
+    assert "Widget SKU-777 is blue" in [doc.page_content for doc in docs]
+
+
+def test_dropped_lexical_index_is_backfilled_again(fake_embeddings, bot_id):
+    rag.store_source(bot_id, "faq.txt", [Document(page_content="Order code AB-12 ships free", metadata={})])
+    rag.get_retrieval_chain(bot_id, "key")
+
+    rag.lexical_index.drop_bot(bot_id)    # e.g. by migrate_vector_layout.py
+    rag.store_source(bot_id, "more.txt", [Document(page_content="Store opens at nine", metadata={})])
+    rag.get_retrieval_chain(bot_id, "key")
+
+    assert rag.lexical_index.search(bot_id, "AB-12", 3)
+
+
+def test_k_changed_by_another_process_is_picked_up(fake_embeddings, bot_id):
+    rag.store_source(bot_id, "faq.txt", [Document(page_content=f"fact {i}", metadata={}) for i in range(8)])
+    retriever, _ = rag.get_retrieval_chain(bot_id, "key")
+    assert retriever.k == rag.RAG_TOP_K
+
+    # What set_retrieval_k does in another uvicorn worker: same SQLite files,
+    # its own in-process chain cache
+    rag.lexical_index.set_k(bot_id, 6)
+    SemanticAnswerCache(generations_path=os.environ["INGEST_QUEUE_PATH"]).invalidate(bot_id)
+
+    retriever, _ = rag.get_retrieval_chain(bot_id, "key")
+    assert retriever.k == 6
+    assert len(retriever.retrieve("fact", fake_embeddings.embed_query("fact"))) == 6
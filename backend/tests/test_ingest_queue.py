@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+import ingest_queue
+from ingest_queue import IngestQueue
+from loaders import SourceError
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_queue, "INGEST_RETRY_BACKOFF", 10.0)
+    queue = IngestQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1, max_attempts=2)
+    yield queue
+    queue.stop()
+
+
+@pytest.fixture
+def csv_upload(tmp_path):
+    path = tmp_path / "upload-1a2b.csv"
+    path.write_text("sku,price\nAB-1,10\nAB-2,12\n", encoding="utf-8")
+    return str(path)
+
+
+def run_next(queue):
+    """Claims and runs one due job in this thread, as a worker would."""
+    job = queue._claim_next()
+    assert job is not None
+    queue._run_job(job)
+
+
+def make_due(queue, job_id):
+    with queue._connect() as conn:
+        conn.execute("UPDATE ingest_jobs SET next_attempt_at = 0 WHERE id = ?", (job_id,))
+
+
+def only_job(queue, bot_id):
+    [job] = queue.get_bot_status(bot_id)["jobs"]
+    return job
+
+
+def test_job_succeeds_and_reports_the_source(queue, csv_upload, fake_embeddings, bot_id):
+    queue.enqueue(bot_id, None, [(csv_upload, "csv", "prices.csv")])
+
+    run_next(queue)
+
+    job = only_job(queue, bot_id)
+    assert (job["status"], job["attempts"], job["pending_sources"]) == ("succeeded", 1, [])
+    assert job["result"]["sources"]["prices.csv"]["added"] == 1
+
+
+def test_failed_source_is_retried_with_backoff_then_fails(queue, csv_upload, bot_id, monkeypatch):
+    def failing_store(*args, **kwargs):
+        raise SourceError("No documents found.")
+    monkeypatch.setattr(ingest_queue, "store_source", failing_store)
+    job_id = queue.enqueue(bot_id, None, [(csv_upload, "csv", "prices.csv")])
+
+    before = time.time()
+    run_next(queue)
+    job = only_job(queue, bot_id)
+    assert (job["status"], job["attempts"], job["pending_sources"]) == ("queued", 1, ["prices.csv"])
+    assert job["result"]["errors"] == {csv_upload: "No documents found."}
+    assert queue._claim_next() is None   # backing off
+    with queue._connect() as conn:
+        next_attempt_at = conn.execute("SELECT next_attempt_at FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    assert next_attempt_at >= before + 10.0
+
+    make_due(queue, job_id)
+    run_next(queue)
+    job = only_job(queue, bot_id)
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert job["error"] == "1 source(s) failed after 2 attempts"
+
+
+def test_retry_only_reruns_the_failed_source(queue, tmp_path, csv_upload, fake_embeddings, bot_id, monkeypatch):
+    broken = tmp_path / "broken.csv"
+    broken.write_text("", encoding="utf-8")
+    job_id = queue.enqueue(bot_id, None, [(csv_upload, "csv", "prices.csv"), (str(broken), "csv", "broken.csv")])
+
+    run_next(queue)
+    job = only_job(queue, bot_id)
+    assert (job["status"], job["pending_sources"]) == ("queued", ["broken.csv"])
+
+    broken.write_text("sku,price\nAB-3,7\n", encoding="utf-8")
+    make_due(queue, job_id)
+    run_next(queue)
+    job = only_job(queue, bot_id)
+    assert job["status"] == "succeeded"
+    assert set(job["result"]["sources"]) == {"prices.csv", "broken.csv"}
+
+
+def test_crashed_attempt_does_not_kill_the_worker(queue, csv_upload, bot_id, monkeypatch):
+    calls = []
+
+    def crash(job):
+        calls.append(job["id"])
+        raise RuntimeError("loader pool exploded")
+    monkeypatch.setattr(queue, "_run_job", crash)
+    first = queue.enqueue(bot_id, None, [(csv_upload, "csv", "prices.csv")])
+    second = queue.enqueue(bot_id, None, [(csv_upload, "csv", "prices.csv")])
+
+    queue.start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        jobs = queue.get_bot_status(bot_id)["jobs"]
+        if all(job["error"] for job in jobs):
+            break
+        time.sleep(0.05)
+
+    assert set(calls) == {first, second}
+    assert {job["status"] for job in jobs} == {"queued"}
+    assert all(job["error"] == "Ingest attempt crashed: loader pool exploded" for job in jobs)
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from embedding_cache import LazyEmbeddings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = (
+    "mcp", "langchain_mcp_adapters", "torch", "sentence_transformers", "langchain_huggingface",
+    "twilio", "googleapiclient", "pptx", "docx", "gspread", "pandas", "tavily",
+)
+
+
+def test_importing_the_app_modules_loads_no_heavy_dependency():
+    # A fresh interpreter, since this one may already have imported them
+    code = (
+        "import sys, rag, workflow_engine\n"
+        f"print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+        "print(rag.embeddings.loaded)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=os.environ.copy(),
+        capture_output=True, text=True, timeout=120
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split("\n")[:2] == ["[]", "False"]
+
+
+def test_model_is_built_once_under_concurrent_first_use():
+    builds = []
+
+    class Model:
+        def embed_documents(self, texts):
+            return [[1.0] for _ in texts]
+
+        def embed_query(self, text):
+            return [1.0]
+
+    def factory():
+        builds.append(1)
+        time.sleep(0.05)
+        return Model()
+
+    lazy = LazyEmbeddings(factory)
+    assert not lazy.loaded
+    threads = [threading.Thread(target=lazy.embed_query, args=("q",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert lazy.loaded and lazy.load_seconds is not None
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from uploads import UploadSizeLimitMiddleware, UploadSpool
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=4096)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        async with UploadSpool(scratch_dir=str(tmp_path), max_bytes=1024) as spool:
+            path = await spool.save(file, "CSV")
+            spool.commit()
+        return {"path": path}
+
+    return TestClient(app)
+
+
+def test_upload_is_spooled_to_a_unique_scratch_file(client, tmp_path):
+    first = client.post("/upload", files={"file": ("same.csv", b"a,b\n1,2\n")}).json()["path"]
+    second = client.post("/upload", files={"file": ("same.csv", b"a,b\n3,4\n")}).json()["path"]
+
+    assert first != second
+    assert os.path.dirname(first) == str(tmp_path) and first.endswith(".csv")
+
+
+def test_oversized_file_is_rejected_and_removed(client, tmp_path):
+    response = client.post("/upload", files={"file": ("big.csv", b"x" * 2048)})
+
+    assert response.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_oversized_request_is_rejected_on_content_length(client, tmp_path):
+    response = client.post("/upload", files={"file": ("huge.csv", b"x" * 8192)})
+
+    assert response.status_code == 413
+    assert "request limit" in response.json()["detail"]
+    assert os.listdir(tmp_path) == []
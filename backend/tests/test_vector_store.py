@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+import pytest
+
+from vector_store import NumpyVectorStore
+
+
+def vectors(count, seed):
+    return np.random.default_rng(seed).standard_normal((count, 8)).tolist()
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """Two stores on one root, like two API processes sharing a disk."""
+    return NumpyVectorStore(str(tmp_path)), NumpyVectorStore(str(tmp_path))
+
+
+def test_upsert_is_visible_to_another_instance(stores):
+    a, b = stores
+    a.upsert("bot", ["x", "y"], vectors(2, 1), ["text x", "text y"], [{"n": 1}, {"n": 2}])
+
+    assert b.count("bot") == 2
+    assert b.existing_ids("bot", ["x", "z"]) == {"x"}
+    [doc] = b.search("bot", vectors(2, 1)[1], 1)
+    assert (doc.id, doc.page_content, doc.metadata) == ("y", "text y", {"n": 2})
+
+
+def test_cached_bot_is_reloaded_after_another_instance_writes(stores):
+    a, b = stores
+    a.upsert("bot", ["x"], vectors(1, 1), ["old"], [{}])
+    assert b.search("bot", vectors(1, 1)[0], 1)[0].page_content == "old"
+
+    a.upsert("bot", ["x", "y"], vectors(2, 2), ["new", "other"], [{}, {}])
+    a.delete("bot", ["y"])
+
+    assert [doc.page_content for doc in b.search("bot", vectors(1, 2)[0], 5)] == ["new"]
+    assert b.get_stats()["reloads"] >= 1
+
+
+def test_writes_from_both_instances_are_kept(stores):
+    a, b = stores
+    a.upsert("bot", ["x"], vectors(1, 1), ["x"], [{}])
+    assert b.count("bot") == 1
+    b.upsert("bot", ["y"], vectors(1, 2), ["y"], [{}])
+    a.upsert("bot", ["z"], vectors(1, 3), ["z"], [{}])
+
+    assert set(b.find("bot")) == {"x", "y", "z"}
+
+
+def test_drop_bot_is_seen_by_another_instance(stores):
+    a, b = stores
+    a.upsert("bot", ["x"], vectors(1, 1), ["x"], [{}])
+    assert b.count("bot") == 1
+
+    a.drop_bot("bot")
+
+    assert b.count("bot") == 0
+    assert b.search("bot", vectors(1, 1)[0], 3) == []
+
+
+def test_batch_writes_once_on_exit(stores):
+    a, b = stores
+    with a.batch("bot"):
+        for start in range(0, 200, 64):
+            rows = range(start, min(start + 64, 200))
+            a.upsert("bot", [f"c{n}" for n in rows], vectors(len(rows), start), ["t"] * len(rows), [{}] * len(rows))
+        a.delete("bot", ["c0"])
+        assert b.count("bot") == 0
+
+    assert b.count("bot") == 199
+    assert a.get_stats()["writes"] == 1
+
+
+def test_batch_writes_early_past_max_chunks(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), batch_max_chunks=100)
+    with store.batch("bot"):
+        for start in range(0, 250, 50):
+            store.upsert("bot", [f"c{n}" for n in range(start, start + 50)], vectors(50, start), ["t"] * 50, [{}] * 50)
+
+    assert store.count("bot") == 250
+    assert store.get_stats()["writes"] == 3
+
+
+def test_slow_load_does_not_block_other_bots(stores):
+    a, b = stores
+    a.upsert("big", ["x"], vectors(1, 1), ["big"], [{}])
+    a.upsert("small", ["y"], vectors(1, 2), ["small"], [{}])
+    reading, release = threading.Event(), threading.Event()
+    read = b._read
+    reads = []
+
+    def slow_read(bot_id, **kwargs):
+        reads.append(bot_id)
+        if bot_id == "big":
+            reading.set()
+            release.wait(5)
+        return read(bot_id, **kwargs)
+    b._read = slow_read
+
+    loaders = [threading.Thread(target=b.count, args=("big",)) for _ in range(2)]
+    for loader in loaders:
+        loader.start()
+    assert reading.wait(5)
+    counted = []
+    lookup = threading.Thread(target=lambda: counted.append(b.count("small")))
+    lookup.start()
+    lookup.join(1)
+    release.set()
+    assert counted == [1]   # answered while "big" was still loading
+    for loader in loaders:
+        loader.join(5)
+
+    assert reads.count("big") == 1
+    assert b.get_stats()["loads"] == 2
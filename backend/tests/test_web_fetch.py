@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ingest_queue
+import web_fetch
+from ingest_queue import IngestQueue
+from web_fetch import WebFetcher
+
+
+class StandInServer:
+    """
+    Local HTTP server whose responses come from `handler(request) -> (status,
+    headers, body)`; a Content-Length of None sends the body unannounced and
+    closes the connection. Records every request and the peak number in
+    flight per Host header.
+    """
+
+    def __init__(self):
+        self.handler = lambda request: (200, {}, b"hello")
+        self.requests = []
+        self.in_flight = defaultdict(int)
+        self.peak = defaultdict(int)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                host = self.headers["Host"].split(":")[0]
+                with server._lock:
+                    server.requests.append((self.path, dict(self.headers)))
+                    server.in_flight[host] += 1
+                    server.peak[host] = max(server.peak[host], server.in_flight[host])
+                try:
+                    status, headers, body = server.handler(self)
+                    headers = {"Content-Length": str(len(body)), **headers}
+                    self.send_response(status)
+                    if headers["Content-Length"] is None:
+                        del headers["Content-Length"]
+                        self.close_connection = True
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass   # the client gave up (timeout, size cap)
+                finally:
+                    with server._lock:
+                        server.in_flight[host] -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def url(self, path, host="127.0.0.1"):
+        return f"http://{host}:{self.port}{path}"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(web_fetch, "WEB_FETCH_READER", "")
+    monkeypatch.setattr(web_fetch, "WEB_FETCH_TIMEOUT", 0.5)
+    delays = []
+
+    def quick_retry_delay(response, attempt):
+        delays.append(WebFetcher._retry_delay(response, attempt))
+        return 0.01
+    fetcher = WebFetcher(cache_path=str(tmp_path / "web.sqlite3"))
+    fetcher._retry_delay = quick_retry_delay
+    fetcher.delays = delays
+    yield fetcher
+    fetcher.close()
+
+
+def test_unchanged_page_is_not_downloaded_or_embedded_again(server, fetcher, fake_embeddings, bot_id, tmp_path, monkeypatch):
+    page = b"Our returns policy allows refunds within thirty days of purchase."
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        return 200, {"ETag": '"v1"', "Content-Type": "text/plain; charset=utf-8"}, page
+    server.handler = handler
+    monkeypatch.setattr(ingest_queue, "web_fetcher", fetcher)
+    embedded = []
+    monkeypatch.setattr(fake_embeddings, "embed_documents", lambda texts, original=fake_embeddings.embed_documents: (
+        embedded.extend(texts) or original(texts)
+    ))
+    queue = IngestQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1)
+    url = server.url("/returns")
+
+    queue.enqueue(bot_id, None, [(url, "URL", url)])
+    queue._run_job(queue._claim_next())
+    assert len(embedded) == 1
+
+    queue.enqueue(bot_id, None, [(url, "URL", url)])
+    queue._run_job(queue._claim_next())
+
+    assert server.requests[-1][1]["If-None-Match"] == '"v1"'
+    assert len(embedded) == 1
+    latest = queue.get_bot_status(bot_id)["jobs"][0]
+    assert latest["status"] == "succeeded"
+    assert latest["result"]["sources"][url] == {
+        "source": url, "source_id": latest["result"]["sources"][url]["source_id"],
+        "chunks": 1, "added": 0, "removed": 0, "unchanged": 1,
+    }
+    assert fetcher.get_stats()["not_modified"] == 1
+
+
+def test_validators_are_only_sent_for_pages_the_bot_remembered(server, fetcher):
+    server.handler = lambda request: (200, {"ETag": '"abc"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}, b"page")
+    url = server.url("/page")
+
+    first = fetcher.fetch_many([url], bot_id="bot")[url]
+    fetcher.remember("bot", first)
+    fetcher.fetch_many([url], bot_id="bot")
+    fetcher.fetch_many([url], bot_id="other")
+
+    sent = [headers for _, headers in server.requests]
+    assert "If-None-Match" not in sent[0]
+    assert (sent[1]["If-None-Match"], sent[1]["If-Modified-Since"]) == ('"abc"', "Wed, 01 Jan 2025 00:00:00 GMT")
+    assert "If-None-Match" not in sent[2]
+
+
+def test_concurrency_is_capped_per_target_host(server, fetcher, monkeypatch):
+    monkeypatch.setattr(web_fetch, "WEB_FETCH_PER_HOST", 2)
+
+    def slow(request):
+        time.sleep(0.1)
+        return 200, {}, b"page"
+    server.handler = slow
+    urls = [server.url(f"/{i}", host) for host in ("127.0.0.1", "localhost") for i in range(6)]
+
+    results = fetcher.fetch_many(urls)
+
+    assert {result.status for result in results.values()} == {"ok"}
+    assert dict(server.peak) == {"127.0.0.1": 2, "localhost": 2}
+
+
+def test_oversized_responses_are_rejected(server, fetcher, monkeypatch):
+    monkeypatch.setattr(web_fetch, "WEB_FETCH_MAX_BYTES", 1000)
+    responses = {
+        "/declared": (200, {}, b"x" * 2000),
+        "/unannounced": (200, {"Content-Length": None}, b"x" * 2000),
+        "/small": (200, {"Content-Length": None}, b"x" * 500),
+    }
+    server.handler = lambda request: responses[request.path]
+    urls = {path: server.url(path) for path in responses}
+
+    results = fetcher.fetch_many(list(urls.values()))
+
+    for path in ("/declared", "/unannounced"):
+        assert results[urls[path]].status == "error"
+        assert "larger than" in results[urls[path]].error
+    assert results[urls["/small"]].text == "x" * 500
+    assert len(server.requests) == 3   # a size error is not retried
+
+
+def test_server_errors_are_retried_with_backoff(server, fetcher, monkeypatch):
+    monkeypatch.setattr(web_fetch, "WEB_FETCH_RETRIES", 3)
+    statuses = iter([503, 502, 200])
+    server.handler = lambda request: (next(statuses), {}, b"finally")
+
+    result = fetcher.fetch_many([server.url("/flaky")])[server.url("/flaky")]
+
+    assert (result.status, result.text) == ("ok", "finally")
+    assert len(server.requests) == 3
+    assert fetcher.delays == [0.5, 1.0]
+    assert fetcher.get_stats()["retries"] == 2
+
+
+def test_client_errors_are_not_retried(server, fetcher):
+    server.handler = lambda request: (404, {}, b"missing")
+
+    result = fetcher.fetch_many([server.url("/gone")])[server.url("/gone")]
+
+    assert (result.status, result.error) == ("error", "HTTP 404")
+    assert len(server.requests) == 1
+
+
+def test_timeouts_are_retried_then_reported(server, fetcher, monkeypatch):
+    monkeypatch.setattr(web_fetch, "WEB_FETCH_RETRIES", 1)
+
+    def hang(request):
+        time.sleep(1.0)
+        return 200, {}, b"too late"
+    server.handler = hang
+
+    result = fetcher.fetch_many([server.url("/slow")])[server.url("/slow")]
+
+    assert result.status == "error"
+    assert "Timeout" in result.error
+    assert len(server.requests) == 2
+
+
+def test_retry_after_is_honoured():
+    class Response:
+        headers = {"Retry-After": "7"}
+
+    assert WebFetcher._retry_delay(Response(), 0) == 7.0
+    assert WebFetcher._retry_delay(None, 2) == 2.0
@@ -0,0 +1,76 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+import workflow_engine
+from chat_service import ChatService
+
+
+class FakeGraph:
+    """Stands in for a compiled graph: astream yields `steps`, sleeping `delay` before each."""
+
+    def __init__(self, steps, delay=0.0):
+        self.steps = steps
+        self.delay = delay
+
+    async def astream(self, state, stream_mode=None):
+        for step in self.steps:
+            await asyncio.sleep(self.delay)
+            yield step
+
+
+def use_graph(monkeypatch, graph):
+    monkeypatch.setattr(workflow_engine, "_prepare_workflow_run", lambda *args: (graph, {}))
+
+
+async def consume(events, pause=0.0):
+    received = []
+    async for event in events:
+        received.append(event)
+        await asyncio.sleep(pause)
+    return received
+
+
+def test_slow_consumer_does_not_count_against_the_timeout(monkeypatch):
+    monkeypatch.setattr(workflow_engine, "WORKFLOW_TIMEOUT", 0.2)
+    use_graph(monkeypatch, FakeGraph([
+        ("updates", {"agent": {}}),
+        ("updates", {"tools": {}}),
+        ("values", {"messages": [AIMessage(content="all done")]}),
+    ]))
+
+    events = asyncio.run(consume(workflow_engine.stream_workflow([], [], "hi"), pause=0.15))
+
+    assert events == [
+        {"type": "node", "node": "agent"},
+        {"type": "node", "node": "tools"},
+        {"type": "done", "answer": "all done"},
+    ]
+
+
+def test_slow_graph_times_out_with_a_done_event(monkeypatch):
+    monkeypatch.setattr(workflow_engine, "WORKFLOW_TIMEOUT", 0.2)
+    use_graph(monkeypatch, FakeGraph([("updates", {"agent": {}})] * 5, delay=0.08))
+
+    events = asyncio.run(consume(workflow_engine.stream_workflow([], [], "hi")))
+
+    assert events[:2] == [{"type": "node", "node": "agent"}] * 2
+    assert events[-1] == {"type": "done", "answer": "Error: Workflow timed out after 3 minutes."}
+
+
+def test_workflow_load_failure_still_ends_the_stream(monkeypatch):
+    service = ChatService(client=None)
+
+    async def broken(workflow_id):
+        raise ConnectionError("database unreachable")
+    logged = []
+
+    async def log_messages(bot_id, question, answer):
+        logged.append(answer)
+    monkeypatch.setattr(service, "_get_workflow", broken)
+    monkeypatch.setattr(service, "log_messages", log_messages)
+
+    events = asyncio.run(consume(service._stream("bot", "hi", "api", "wf-1", "key")))
+
+    assert events == [{"type": "done", "answer": "Error: Could not load workflow: database unreachable"}]
+    assert logged == [events[0]["answer"]]
@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+import tempfile
+from typing import Iterable, List
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SCRATCH_DIR = os.getenv("UPLOAD_SCRATCH_DIR", "./upload_scratch")
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "50"))
+# Whole multipart request, checked on Content-Length before the body is read
+MAX_UPLOAD_REQUEST_MB = float(os.getenv("MAX_UPLOAD_REQUEST_MB", "200"))
+UPLOAD_READ_SIZE = 1024 * 1024
+# Scratch files older than this that no ingest job references are swept on startup
+UPLOAD_ORPHAN_AGE = float(os.getenv("UPLOAD_ORPHAN_AGE", "3600"))
+
+_EXTENSIONS = {"PDF": ".pdf", "CSV": ".csv"}
+
+
+class UploadSpool:
+    """
+    Streams uploads into uniquely named files in UPLOAD_SCRATCH_DIR, enforcing
+    MAX_UPLOAD_MB per file. Files belong to the spool until commit() hands
+    them to the ingest queue; if the request fails first, they are deleted.
+
+        async with UploadSpool() as spool:
+            path = await spool.save(file, "PDF")
+            ingest_queue.enqueue(...)
+            spool.commit()
+    """
+
+    def __init__(self, scratch_dir: str = UPLOAD_SCRATCH_DIR, max_bytes: int = int(MAX_UPLOAD_MB * 1024 * 1024)):
+        self.scratch_dir = scratch_dir
+        self.max_bytes = max_bytes
+        self.paths: List[str] = []
+        self._committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self._committed:
+            remove_files(self.paths)
+        return False
+
+    async def save(self, upload: UploadFile, file_type: str) -> str:
+        # The extension picks the loader, so it comes from the declared type, not the client's filename
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="upload_", suffix=_EXTENSIONS[file_type], dir=self.scratch_dir)
+        self.paths.append(path)
+
+        written = 0
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(UPLOAD_READ_SIZE):
+                written += len(chunk)
+                if written > self.max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"{upload.filename} exceeds the {MAX_UPLOAD_MB:g} MB upload limit"
+                    )
+                out.write(chunk)
+        return path
+
+    def commit(self):
+        self._committed = True
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects multipart requests whose Content-Length is over max_bytes with a
+    413 before anything is read. Starlette buffers the whole form before the
+    endpoint runs, so UploadSpool's per-file limit alone caps neither memory
+    nor disk. Bodies sent without Content-Length (chunked) still get only the
+    per-file check.
+    """
+
+    def __init__(self, app, max_bytes: int = int(MAX_UPLOAD_REQUEST_MB * 1024 * 1024)):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            length = headers.get(b"content-length", b"")
+            if (headers.get(b"content-type", b"").startswith(b"multipart/form-data")
+                    and length.isdigit() and int(length) > self.max_bytes):
+                response = JSONResponse(
+                    {"detail": f"Upload exceeds the {MAX_UPLOAD_REQUEST_MB:g} MB request limit"}, status_code=413
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+def remove_files(paths: Iterable[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove upload {path}: {e}")
+
+
+def sweep_scratch_dir(in_use: Iterable[str], scratch_dir: str = UPLOAD_SCRATCH_DIR, max_age: float = UPLOAD_ORPHAN_AGE) -> int:
+    """Deletes scratch files no ingest job references (left by crashes mid-request)."""
+    if not os.path.isdir(scratch_dir):
+        return 0
+    keep = {os.path.abspath(path) for path in in_use}
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(scratch_dir):
+        if entry.is_file() and os.path.abspath(entry.path) not in keep and entry.stat().st_mtime < cutoff:
+            remove_files([entry.path])
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} orphaned uploads from {scratch_dir}")
+    return removed
@@ -0,0 +1,573 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# "chroma": persistent Chroma (HNSW). "numpy": one memory-mapped float32
+# matrix per bot with exact search; best when bots are small (up to a few
+# thousand chunks), where it opens instantly and needs no index.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+VECTOR_STORAGE_PATH = os.getenv("VECTOR_STORAGE_PATH", "./chroma_db")
+# "per_bot": one Chroma collection (and HNSW index) per bot.
+# "sharded": bots are packed into VECTOR_SHARDS collections by a hash of the
+# bot id and every read is filtered on the bot_id metadata field. Switch
+# existing data with migrate_vector_layout.py.
+VECTOR_LAYOUT = os.getenv("VECTOR_LAYOUT", "per_bot")
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "64"))
+SHARD_PREFIX = "bots_shard_"
+
+NUMPY_VECTOR_PATH = os.getenv("NUMPY_VECTOR_PATH", "./vectors_npy")
+NUMPY_OPEN_BOTS = int(os.getenv("NUMPY_OPEN_BOTS", "256"))    # bots kept mapped in memory
+# Chunks a batch() holds before writing early, so a huge streamed source
+# doesn't keep all its vectors in memory
+NUMPY_BATCH_MAX_CHUNKS = int(os.getenv("NUMPY_BATCH_MAX_CHUNKS", "8192"))
+
+Chunks = Tuple[List[str], List[str], List[Dict[str, Any]]]   # ids, texts, metadatas
+
+
+class VectorStore(ABC):
+    """
+    Per-bot chunk storage and nearest-neighbour search. rag.py only talks to
+    this interface, so the backend is chosen per deployment (VECTOR_BACKEND).
+    Vectors are the normalised MiniLM embeddings; ids are unique per bot.
+    """
+
+    @abstractmethod
+    def upsert(self, bot_id: str, ids: List[str], vectors: List[List[float]], texts: List[str], metadatas: List[Dict[str, Any]]):
+        ...
+
+    @contextmanager
+    def batch(self, bot_id: str):
+        """
+        Groups the calling thread's writes to one bot. Backends that rewrite
+        files per write (numpy) apply them together when the block exits, so
+        reads inside it don't see them yet; others write straight through.
+        """
+        yield
+
+    @abstractmethod
+    def existing_ids(self, bot_id: str, ids: List[str]) -> Set[str]:
+        """The subset of `ids` already stored for the bot."""
+
+    @abstractmethod
+    def find(self, bot_id: str, **conditions) -> Dict[str, Dict[str, Any]]:
+        """Chunk id -> metadata for the bot's chunks whose metadata equals all conditions."""
+
+    @abstractmethod
+    def iter_chunks(self, bot_id: str, page_size: int = 1000) -> Iterator[Chunks]:
+        ...
+
+    @abstractmethod
+    def count(self, bot_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, bot_id: str, ids: List[str]):
+        ...
+
+    @abstractmethod
+    def drop_bot(self, bot_id: str):
+        ...
+
+    @abstractmethod
+    def search(self, bot_id: str, vector: List[float], k: int) -> List[Document]:
+        """The k chunks closest to `vector`, best first."""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        ...
+
+
+# One persistent Chroma client per process, shared by ingestion and retrieval
+_chroma_client = None
+_chroma_client_lock = threading.Lock()
+
+
+def get_chroma_client():
+    global _chroma_client
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            import chromadb
+            _chroma_client = chromadb.PersistentClient(path=VECTOR_STORAGE_PATH)
+        return _chroma_client
+
+
+def bot_collection_name(bot_id: str, layout: str = None) -> str:
+    if (layout or VECTOR_LAYOUT) == "sharded":
+        shard = int(hashlib.sha1(bot_id.encode("utf-8")).hexdigest(), 16) % VECTOR_SHARDS
+        return f"{SHARD_PREFIX}{shard:03d}"
+    return bot_id
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Chroma in either layout. In the sharded layout bots share collections,
+    so stored ids carry a "<bot_id>:" prefix and every read filters on the
+    bot_id metadata field; callers always see their own unprefixed ids.
+    """
+
+    def __init__(self, layout: str = VECTOR_LAYOUT):
+        self.layout = layout
+        self.sharded = layout == "sharded"
+        self._stats = {"searches": 0}
+
+    def _collection(self, bot_id: str, create: bool = True):
+        name = bot_collection_name(bot_id, self.layout)
+        if create:
+            return get_chroma_client().get_or_create_collection(name=name, embedding_function=None)
+        try:
+            return get_chroma_client().get_collection(name=name)
+        except Exception:
+            return None
+
+    def _where(self, bot_id: str, **conditions) -> Optional[dict]:
+        clauses = [{key: value} for key, value in conditions.items()]
+        if self.sharded:
+            clauses.insert(0, {"bot_id": bot_id})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def _key(self, bot_id: str, chunk_id: str) -> str:
+        return f"{bot_id}:{chunk_id}" if self.sharded else chunk_id
+
+    def _unkey(self, bot_id: str, key: str) -> str:
+        prefix = f"{bot_id}:"
+        return key[len(prefix):] if self.sharded and key.startswith(prefix) else key
+
+    def upsert(self, bot_id, ids, vectors, texts, metadatas):
+        self._collection(bot_id).upsert(
+            ids=[self._key(bot_id, i) for i in ids],
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[{**m, "bot_id": bot_id} for m in metadatas]
+        )
+
+    def existing_ids(self, bot_id, ids):
+        collection = self._collection(bot_id, create=False)
+        if collection is None:
+            return set()
+        found = collection.get(ids=[self._key(bot_id, i) for i in ids], include=[])["ids"]
+        return {self._unkey(bot_id, key) for key in found}
+
+    def find(self, bot_id, **conditions):
+        collection = self._collection(bot_id, create=False)
+        if collection is None:
+            return {}
+        found = collection.get(where=self._where(bot_id, **conditions), include=["metadatas"])
+        return {self._unkey(bot_id, key): metadata or {} for key, metadata in zip(found["ids"], found["metadatas"])}
+
+    def iter_chunks(self, bot_id, page_size=1000):
+        collection = self._collection(bot_id, create=False)
+        if collection is None:
+            return
+        offset = 0
+        while True:
+            page = collection.get(where=self._where(bot_id), include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield [self._unkey(bot_id, key) for key in page["ids"]], page["documents"], [m or {} for m in page["metadatas"]]
+            offset += len(page["ids"])
+
+    def count(self, bot_id):
+        collection = self._collection(bot_id, create=False)
+        if collection is None:
+            return 0
+        if not self.sharded:
+            return collection.count()
+        return len(collection.get(where=self._where(bot_id), include=[])["ids"])
+
+    def delete(self, bot_id, ids):
+        collection = self._collection(bot_id, create=False)
+        if collection is not None and ids:
+            collection.delete(ids=[self._key(bot_id, i) for i in ids])
+
+    def drop_bot(self, bot_id):
+        collection = self._collection(bot_id, create=False)
+        if collection is None:
+            return
+        if self.sharded:
+            collection.delete(where=self._where(bot_id))
+        else:
+            get_chroma_client().delete_collection(name=collection.name)
+
+    def search(self, bot_id, vector, k):
+        collection = self._collection(bot_id, create=False)
+        if collection is None:
+            return []
+        self._stats["searches"] += 1
+        result = collection.query(
+            query_embeddings=[vector], n_results=k, where=self._where(bot_id),
+            include=["documents", "metadatas"]
+        )
+        return [
+            Document(id=self._unkey(bot_id, key), page_content=text, metadata=metadata or {})
+            for key, text, metadata in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])
+        ]
+
+    def get_stats(self):
+        return {"backend": "chroma", "layout": self.layout, **self._stats}
+
+
+class _MappedBot:
+    """One bot's chunks: vectors memory-mapped, ids/texts/metadata in RAM."""
+
+    def __init__(self, vectors: np.ndarray, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], signature: tuple = None):
+        self.vectors = vectors
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        # stat of the manifest it was read from; a different one means another process wrote
+        self.signature = signature
+
+
+def _signature(stat: os.stat_result) -> tuple:
+    # Manifests are swapped in with os.replace, so every write gets a new inode
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path` shared by every process on the host."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search store for small bots. Each bot gets a directory holding a
+    float32 matrix of unit vectors (.npy, memory-mapped on read) and a JSON
+    manifest with ids, texts and metadata. A search is one matrix-vector
+    product plus argpartition, so a few thousand chunks answer in well under
+    a millisecond with nothing to build or warm up.
+
+    Every write rewrites the bot's files: new matrix first, then the manifest
+    that points at it, swapped in atomically. It does so under a per-bot lock
+    file, so several API processes and ingest workers can share one root
+    without losing each other's writes. Readers take no lock. Each lookup
+    re-stats the manifest and reloads a bot that another process changed.
+    Inside batch() writes are collected and applied in one rewrite when it
+    exits (or every batch_max_chunks chunks), so ingesting a source costs one
+    rewrite rather than one per embedding batch. Even so, each source rewrites the whole bot; deployments
+    whose bots run to hundreds of thousands of chunks should use Chroma.
+    """
+
+    def __init__(self, root: str = NUMPY_VECTOR_PATH, max_open: int = NUMPY_OPEN_BOTS, batch_max_chunks: int = NUMPY_BATCH_MAX_CHUNKS):
+        self.root = root
+        self.max_open = max_open
+        self.batch_max_chunks = batch_max_chunks
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._open: "OrderedDict[str, _MappedBot]" = OrderedDict()
+        # (bot_id, thread id) -> [depth, pending operations, pending chunks] for batch()
+        self._pending: Dict[Tuple[str, int], list] = {}
+        self._write_locks: Dict[str, threading.Lock] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats = {"searches": 0, "loads": 0, "reloads": 0, "hits": 0, "writes": 0, "evictions": 0}
+
+    def _dir(self, bot_id: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(bot_id.encode("utf-8")).hexdigest()[:24])
+
+    def _cached_locked(self, bot_id: str, signature: tuple) -> Optional[_MappedBot]:
+        bot = self._open.get(bot_id)
+        if bot is None or bot.signature != signature:
+            return None
+        self._open.move_to_end(bot_id)
+        self._stats["hits"] += 1
+        return bot
+
+    def _load(self, bot_id: str) -> Optional[_MappedBot]:
+        """
+        Returns the bot's current chunks. Parsing the manifest and mapping the
+        matrix happen outside the store-wide lock, under a per-bot one, so a
+        large bot loading never stalls lookups of the others.
+        """
+        manifest_path = os.path.join(self._dir(bot_id), "manifest.json")
+        try:
+            signature = _signature(os.stat(manifest_path))
+        except FileNotFoundError:
+            with self._lock:
+                self._open.pop(bot_id, None)
+            return None
+        with self._lock:
+            bot = self._cached_locked(bot_id, signature)
+            if bot is not None:
+                return bot
+            load_lock = self._load_locks.setdefault(bot_id, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # Another thread may have loaded it while this one waited
+                bot = self._cached_locked(bot_id, signature)
+                if bot is not None:
+                    return bot
+            bot = self._read(bot_id)
+            with self._lock:
+                if bot is None:
+                    self._open.pop(bot_id, None)
+                    return None
+                self._stats["reloads" if bot_id in self._open else "loads"] += 1
+                self._open[bot_id] = bot
+                self._open.move_to_end(bot_id)
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+                    self._stats["evictions"] += 1
+                return bot
+
+    def _read(self, bot_id: str, attempts: int = 3) -> Optional[_MappedBot]:
+        directory = self._dir(bot_id)
+        for attempt in range(attempts):
+            try:
+                with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+                    signature = _signature(os.fstat(f.fileno()))
+                    manifest = json.load(f)
+                vectors = np.load(os.path.join(directory, manifest["vectors"]), mmap_mode="r")
+            except FileNotFoundError:
+                # A writer replaced the manifest and removed its matrix after we opened it
+                if attempt == attempts - 1:
+                    raise
+                continue
+            return _MappedBot(vectors, manifest["ids"], manifest["texts"], manifest["metadatas"], signature)
+        return None
+
+    @contextmanager
+    def _bot_write_lock(self, bot_id: str):
+        with self._lock:
+            thread_lock = self._write_locks.setdefault(bot_id, threading.Lock())
+        with thread_lock, _file_lock(self._dir(bot_id) + ".lock"):
+            yield
+
+    @contextmanager
+    def batch(self, bot_id):
+        key = (bot_id, threading.get_ident())
+        with self._lock:
+            entry = self._pending.setdefault(key, [0, [], 0])
+            entry[0] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                entry[0] -= 1
+                done = entry[0] == 0
+                if done:
+                    self._pending.pop(key, None)
+            if done and entry[1]:
+                self._apply(bot_id, entry[1])
+
+    def _submit(self, bot_id: str, operation: tuple):
+        with self._lock:
+            entry = self._pending.get((bot_id, threading.get_ident()))
+            if entry is None:
+                operations = [operation]
+            else:
+                entry[1].append(operation)
+                entry[2] += len(operation[1])
+                if entry[2] < self.batch_max_chunks:
+                    return
+                operations, entry[1], entry[2] = entry[1], [], 0
+        self._apply(bot_id, operations)
+
+    def _apply(self, bot_id: str, operations: list):
+        """Applies upserts and deletes to the bot's current files in one rewrite."""
+        with self._bot_write_lock(bot_id):
+            bot = self._load(bot_id)
+            ids = list(bot.ids) if bot else []
+            texts = list(bot.texts) if bot else []
+            metadatas = list(bot.metadatas) if bot else []
+            rows = dict(bot.rows) if bot else {}
+            stored = len(ids)
+            replaced, appended, doomed = {}, [], set()
+
+            for operation in operations:
+                if operation[0] == "delete":
+                    for chunk_id in operation[1]:
+                        row = rows.pop(chunk_id, None)
+                        if row is not None:
+                            doomed.add(row)
+                    continue
+                _, new_ids, vectors, new_texts, new_metadatas = operation
+                for i, chunk_id in enumerate(new_ids):
+                    row = rows.get(chunk_id)
+                    if row is None:
+                        rows[chunk_id] = len(ids)
+                        ids.append(chunk_id)
+                        texts.append(new_texts[i])
+                        metadatas.append(new_metadatas[i])
+                        appended.append(vectors[i])
+                        continue
+                    if row < stored:
+                        replaced[row] = vectors[i]
+                    else:
+                        appended[row - stored] = vectors[i]
+                    texts[row] = new_texts[i]
+                    metadatas[row] = new_metadatas[i]
+
+            if not (replaced or appended or doomed):
+                return
+            matrix = np.array(bot.vectors) if bot else np.empty((0, len(appended[0])), dtype=np.float32)
+            if appended:
+                matrix = np.concatenate([matrix, np.stack(appended)])
+            for row, vector in replaced.items():
+                matrix[row] = vector
+            if doomed:
+                keep = [row for row in range(len(ids)) if row not in doomed]
+                matrix = matrix[keep]
+                ids, texts, metadatas = [ids[r] for r in keep], [texts[r] for r in keep], [metadatas[r] for r in keep]
+            self._write(bot_id, matrix, ids, texts, metadatas)
+
+    def _write(self, bot_id: str, vectors: np.ndarray, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        directory = self._dir(bot_id)
+        with self._lock:
+            self._open.pop(bot_id, None)
+        if not ids:
+            self._remove_dir(directory)
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, "manifest.json")
+        version = 0
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                version = json.load(f)["version"]
+        vectors_file = f"vectors-{version + 1}.npy"
+
+        np.save(os.path.join(directory, vectors_file), np.ascontiguousarray(vectors, dtype=np.float32))
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"bot_id": bot_id, "version": version + 1, "vectors": vectors_file, "ids": ids, "texts": texts, "metadatas": metadatas}, f)
+        os.replace(tmp_path, manifest_path)
+        self._remove_stale_vectors(directory, keep=vectors_file)
+        with self._lock:
+            self._stats["writes"] += 1
+
+    @staticmethod
+    def _remove_stale_vectors(directory: str, keep: Optional[str] = None):
+        # Readers that still map an old matrix keep it alive on POSIX until they
+        # let go. Windows refuses to remove a mapped file, so those are left
+        # for a later write to sweep up.
+        for name in os.listdir(directory):
+            if name.startswith("vectors-") and name != keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    @classmethod
+    def _remove_dir(cls, directory: str):
+        if not os.path.isdir(directory):
+            return
+        # The manifest goes first: without it the bot reads as empty
+        for name in ("manifest.json", "manifest.json.tmp"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        cls._remove_stale_vectors(directory)
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+    def upsert(self, bot_id, ids, vectors, texts, metadatas):
+        if not ids:
+            return
+        new = np.array(vectors, dtype=np.float32)
+        new /= np.clip(np.linalg.norm(new, axis=1, keepdims=True), 1e-12, None)
+        self._submit(bot_id, ("upsert", list(ids), new, list(texts), list(metadatas)))
+
+    def existing_ids(self, bot_id, ids):
+        bot = self._load(bot_id)
+        return {i for i in ids if i in bot.rows} if bot else set()
+
+    def find(self, bot_id, **conditions):
+        bot = self._load(bot_id)
+        if bot is None:
+            return {}
+        return {
+            chunk_id: metadata for chunk_id, metadata in zip(bot.ids, bot.metadatas)
+            if all(metadata.get(key) == value for key, value in conditions.items())
+        }
+
+    def iter_chunks(self, bot_id, page_size=1000):
+        bot = self._load(bot_id)
+        if bot is None:
+            return
+        for start in range(0, len(bot.ids), page_size):
+            end = start + page_size
+            yield bot.ids[start:end], bot.texts[start:end], bot.metadatas[start:end]
+
+    def count(self, bot_id):
+        bot = self._load(bot_id)
+        return len(bot.ids) if bot else 0
+
+    def delete(self, bot_id, ids):
+        if ids:
+            self._submit(bot_id, ("delete", list(ids)))
+
+    def drop_bot(self, bot_id):
+        with self._lock:
+            self._pending.pop((bot_id, threading.get_ident()), None)
+        with self._bot_write_lock(bot_id):
+            with self._lock:
+                self._open.pop(bot_id, None)
+            self._remove_dir(self._dir(bot_id))
+
+    def search(self, bot_id, vector, k):
+        bot = self._load(bot_id)
+        with self._lock:
+            self._stats["searches"] += 1
+        if bot is None or not bot.ids or k <= 0:
+            return []
+
+        query = np.array(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = bot.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            Document(id=bot.ids[row], page_content=bot.texts[row], metadata=dict(bot.metadatas[row]))
+            for row in top
+        ]
+
+    def get_stats(self):
+        with self._lock:
+            return {"backend": "numpy", **self._stats, "open_bots": len(self._open), "max_open": self.max_open}
+
+
+def create_vector_store(backend: str = VECTOR_BACKEND) -> VectorStore:
+    if backend == "chroma":
+        return ChromaVectorStore()
+    if backend == "numpy":
+        return NumpyVectorStore()
+    raise ValueError(f"Unknown VECTOR_BACKEND {backend!r} (expected 'chroma' or 'numpy')")
@@ -0,0 +1,242 @@
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pages are fetched through the Jina reader, which returns clean text for any
+# URL. Set WEB_FETCH_READER="" to fetch pages directly.
+WEB_FETCH_READER = os.getenv("WEB_FETCH_READER", "https://r.jina.ai/")
+WEB_FETCH_TIMEOUT = float(os.getenv("WEB_FETCH_TIMEOUT", "30"))
+WEB_FETCH_RETRIES = int(os.getenv("WEB_FETCH_RETRIES", "3"))
+WEB_FETCH_PER_HOST = int(os.getenv("WEB_FETCH_PER_HOST", "4"))
+WEB_FETCH_MAX_CONNECTIONS = int(os.getenv("WEB_FETCH_MAX_CONNECTIONS", "32"))
+WEB_FETCH_MAX_MB = float(os.getenv("WEB_FETCH_MAX_MB", "10"))
+WEB_FETCH_MAX_BYTES = int(WEB_FETCH_MAX_MB * 1024 * 1024)
+WEB_FETCH_CACHE_PATH = os.getenv("WEB_FETCH_CACHE_PATH", "./web_fetch_cache.sqlite3")
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class FetchResult:
+    url: str                        # the page that was asked for
+    fetch_url: str                  # what was actually requested (reader URL)
+    status: str                     # "ok" | "not_modified" | "error"
+    text: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    error: Optional[str] = None
+
+
+class WebFetcher:
+    """
+    Fetches web sources concurrently on one pooled httpx.AsyncClient. The
+    client lives on a dedicated event-loop thread so the (threaded) ingest
+    workers can call fetch_many() synchronously without touching the API's
+    event loop.
+
+    Concurrency is capped per target host (not per reader host, which every
+    request goes through), response bodies are capped at WEB_FETCH_MAX_MB,
+    transient failures are retried with
+    backoff, and ETag / Last-Modified validators are remembered per
+    (bot, URL) so a re-ingest sends a conditional GET and skips pages the
+    server reports as unchanged.
+    """
+
+    def __init__(self, cache_path: str = WEB_FETCH_CACHE_PATH):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._start_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS validators ("
+            " bot_id TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+            " updated_at REAL NOT NULL, PRIMARY KEY (bot_id, url))"
+        )
+        self._conn.commit()
+        self._stats = {"fetched": 0, "not_modified": 0, "errors": 0, "retries": 0}
+
+    # --- Event loop thread ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="web-fetch-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Only called on the fetch loop, so no locking needed
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(WEB_FETCH_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(max_connections=WEB_FETCH_MAX_CONNECTIONS, max_keepalive_connections=WEB_FETCH_MAX_CONNECTIONS),
+                follow_redirects=True
+            )
+        return self._client
+
+    def close(self):
+        with self._start_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout=10)
+            self._client = None
+        self._host_limits.clear()
+        loop.call_soon_threadsafe(loop.stop)
+
+    # --- Validators ---
+
+    def _get_validators(self, bot_id: str, url: str) -> Dict[str, str]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM validators WHERE bot_id = ? AND url = ?", (bot_id, url)
+            ).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def remember(self, bot_id: str, result: FetchResult):
+        """Stores a page's validators. Call only once its chunks are safely stored."""
+        if not (result.etag or result.last_modified):
+            return
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validators (bot_id, url, etag, last_modified, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (bot_id, result.url, result.etag, result.last_modified, time.time())
+            )
+            self._conn.commit()
+
+    def forget_bot(self, bot_id: str):
+        with self._db_lock:
+            self._conn.execute("DELETE FROM validators WHERE bot_id = ?", (bot_id,))
+            self._conn.commit()
+
+    # --- Fetching ---
+
+    def fetch_many(self, urls: List[str], bot_id: Optional[str] = None, conditional: bool = True) -> Dict[str, FetchResult]:
+        """
+        Fetches all URLs concurrently and returns {url: FetchResult}. With a
+        bot_id and conditional=True, previously seen pages are requested
+        conditionally and may come back as "not_modified" with no text.
+        """
+        if not urls:
+            return {}
+        validators = {
+            url: self._get_validators(bot_id, url) if bot_id and conditional else {}
+            for url in urls
+        }
+        future = asyncio.run_coroutine_threadsafe(self._fetch_all(validators), self._ensure_loop())
+        return future.result()
+
+    def fetch_text(self, url: str) -> str:
+        """Unconditionally fetches one page and returns its text. Raises on failure."""
+        result = self.fetch_many([url])[url]
+        if result.status != "ok":
+            raise RuntimeError(result.error or f"Could not fetch {url}")
+        return result.text
+
+    async def _fetch_all(self, validators: Dict[str, Dict[str, str]]) -> Dict[str, FetchResult]:
+        results = await asyncio.gather(*(self._fetch(url, headers) for url, headers in validators.items()))
+        return {result.url: result for result in results}
+
+    async def _fetch(self, url: str, headers: Dict[str, str]) -> FetchResult:
+        fetch_url = f"{WEB_FETCH_READER}{url}" if WEB_FETCH_READER else url
+        try:
+            result, error = await self._fetch_with_retries(url, fetch_url, headers)
+        except Exception as e:
+            # Malformed URLs and the like: report them, never fail the whole batch
+            result, error = None, f"{type(e).__name__}: {e}"
+        if result is not None:
+            return result
+
+        self._stats["errors"] += 1
+        logger.warning(f"Failed to fetch {url}: {error}")
+        return FetchResult(url, fetch_url, "error", error=error)
+
+    async def _fetch_with_retries(self, url: str, fetch_url: str, headers: Dict[str, str]):
+        host = urlsplit(url).netloc.lower()
+        if not host:
+            return None, "URL has no host"
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(WEB_FETCH_PER_HOST))
+        client = self._get_client()
+
+        error = None
+        for attempt in range(WEB_FETCH_RETRIES + 1):
+            if attempt:
+                self._stats["retries"] += 1
+            response = None
+            async with limit:
+                try:
+                    async with client.stream("GET", fetch_url, headers=headers) as response:
+                        if response.status_code == 304:
+                            self._stats["not_modified"] += 1
+                            return FetchResult(url, fetch_url, "not_modified"), None
+                        if response.is_success:
+                            body = await self._read_capped(response)
+                            if body is None:
+                                return None, f"Response larger than {WEB_FETCH_MAX_MB:g} MB"
+                            self._stats["fetched"] += 1
+                            return FetchResult(
+                                url, fetch_url, "ok",
+                                text=body.decode(response.encoding or "utf-8", errors="replace"),
+                                etag=response.headers.get("ETag"),
+                                last_modified=response.headers.get("Last-Modified")
+                            ), None
+                except httpx.TransportError as e:
+                    response, error = None, f"{type(e).__name__}: {e}"
+
+            if response is not None:
+                error = f"HTTP {response.status_code}"
+                if response.status_code not in _RETRY_STATUSES:
+                    break
+
+            if attempt < WEB_FETCH_RETRIES:
+                await asyncio.sleep(self._retry_delay(response, attempt))
+        return None, error
+
+    @staticmethod
+    async def _read_capped(response: httpx.Response) -> Optional[bytes]:
+        """The response body, or None once it exceeds WEB_FETCH_MAX_BYTES."""
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > WEB_FETCH_MAX_BYTES:
+            return None
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > WEB_FETCH_MAX_BYTES:
+                return None
+        return bytes(body)
+
+    @staticmethod
+    def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+        return 0.5 * (2 ** attempt)
+
+    def get_stats(self):
+        with self._db_lock:
+            remembered = self._conn.execute("SELECT COUNT(*) FROM validators").fetchone()[0]
+        return {**self._stats, "hosts": len(self._host_limits), "remembered_pages": remembered}
+
+
+web_fetcher = WebFetcher()
@@ -5,22 +5,17 @@ import datetime
 import asyncio
 import nest_asyncio
 import shutil
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import TypedDict, List, Dict, Any, Annotated
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-import supabase
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
-from docx import Document as DocxDocument # NEW IMPORT
-
-from pptx import Presentation
-from googleapiclient.discovery import build
-
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-import gspread
+# Integration SDKs (twilio, docx, pptx, pandas, Google APIs, Tavily) are
+# imported inside the nodes that use them, so importing this module - and
+# starting the API - doesn't pay for all of them up front.
 
 # Apply nested asyncio to allow MCP client to run inside FastAPI
 nest_asyncio.apply()
@@ -28,17 +23,13 @@ nest_asyncio.apply()
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from llm_clients import get_chat_model
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, AIMessageChunk
 
 # --- MCP IMPORTS ---
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import logger, stdio_client
-from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp_pool import mcp_pool
 
 
-import pandas as pd
 import ast
 import json
 import io
@@ -52,33 +43,31 @@ class AgentState(TypedDict):
     attachment_path: str  # Path to a file attachment (e.g., from doc_writer)
 
 # --- 2. DEFINE GLOBAL TOOLS ---
-tavily_tool = TavilySearchResults(max_results=3)
+_tavily_tool = None
+
+
+def get_tavily_tool():
+    """Shared Tavily search tool, created on first use."""
+    global _tavily_tool
+    if _tavily_tool is None:
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        _tavily_tool = TavilySearchResults(max_results=3)
+    return _tavily_tool
 
 # --- 3. HELPER: MCP TOOL LOADER ---
 async def get_mcp_tools(command: str, args: List[str]):
     """
-    Connects to a local MCP server via Stdio and returns LangChain tools.
+    Returns LangChain tools for a local stdio MCP server. Servers are kept
+    alive in a process-wide pool, so only the first call per (command, args)
+    pays for spawning the server and loading its tool schemas.
     """
     if sys.platform == "win32":
         if command in ["npx", "npm", "npx.cmd", "npm.cmd"]:
             args = ["/c", command] + args
             command = "cmd"
 
-    print(f"🔌 Connecting to MCP Server: {command} {args}")
-    
-    server_params = StdioServerParameters(
-        command=command, 
-        args=args, 
-        env=os.environ.copy()
-    )
-    
     try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools = await load_mcp_tools(session)
-                print(f"✅ Loaded {len(tools)} MCP tools: {[t.name for t in tools]}")
-                return tools
+        return await mcp_pool.get_tools(command, args)
     except Exception as e:
         print(f"❌ MCP Connection Failed: {e}")
         return []
@@ -89,16 +78,10 @@ def get_llm_node(system_instruction: str, user_template: str, bind_tools: bool =
     async def llm_node_func(state: AgentState):
         print(">>> AGENT NODE: entered")
         messages = state['messages']
-        llm = ChatGoogleGenerativeAI(
-            google_api_key=os.getenv("GEMINI_API_KEY"), 
-            model="gemini-2.5-flash",
-            temperature=0,
-            timeout=60,
-        )
         
         all_tools = []
         if bind_tools:
-            all_tools.append(tavily_tool)
+            all_tools.append(get_tavily_tool())
             
         if mcp_config and mcp_config.get('command'):
             cmd = mcp_config['command']
@@ -108,8 +91,9 @@ def get_llm_node(system_instruction: str, user_template: str, bind_tools: bool =
             all_tools.extend(mcp_tools)
             
         if all_tools:
-            print(f">>> AGENT NODE: binding {len(all_tools)} tools")
-            llm = llm.bind_tools(all_tools)
+            print(f">>> AGENT NODE: using model bound to {len(all_tools)} tools")
+        # Shared client per (model, temperature, timeout, tool set)
+        llm = get_chat_model(model="gemini-2.5-flash", temperature=0, timeout=60, tools=all_tools)
             
         today = datetime.datetime.now().strftime("%B %d, %Y")
         final_system_msg = (
@@ -188,6 +172,8 @@ def get_email_node(receiver_email: str):
 
 def get_whatsapp_node(receiver_phone: str):
     def whatsapp_node_func(state: AgentState):
+        from twilio.rest import Client
+        from twilio.base.exceptions import TwilioRestException
         sid = os.getenv("TWILIO_ACCOUNT_SID")
         token = os.getenv("TWILIO_AUTH_TOKEN")
         from_number = os.getenv("TWILIO_FROM_NUMBER")
@@ -361,6 +347,7 @@ def get_doc_writer_node(filename: str):
     Parses markdown-style LLM output into properly formatted Word elements.
     """
     def doc_writer_node_func(state: AgentState):
+        from docx import Document as DocxDocument
         print(">>> DOC WRITER NODE: entered")
         final_filename = filename if filename and filename.strip() else "agent_output.docx"
         if not final_filename.endswith(".docx"):
@@ -413,6 +400,7 @@ def get_excel_writer_node(filename: str):
     """
     def excel_writer_node_func(state: AgentState):
         from datetime import datetime
+        import pandas as pd
         print(">>> EXCEL WRITER NODE: entered")
         
         base_name = filename if filename and filename.strip() else "spreadsheet"
@@ -503,6 +491,9 @@ def get_excel_writer_node(filename: str):
 def get_google_sheets_node(spreadsheet_id: str, sheet_name: str):
     """Appends content from the agent to a Google Sheet."""
     def google_sheets_node_func(state: AgentState):
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        import gspread
         print(f">>> GOOGLE SHEETS NODE: entered, sheet={sheet_name}")
         
         try:
@@ -572,6 +563,7 @@ def get_google_sheets_node(spreadsheet_id: str, sheet_name: str):
 def get_ppt_writer_node(filename: str):
     """Writes content to a PowerPoint presentation file."""
     def ppt_writer_node_func(state: AgentState):
+        from pptx import Presentation
         print(">>> PPT WRITER NODE: entered")
         final_filename = filename if filename and filename.strip() else "presentation.pptx"
         if not final_filename.endswith(".pptx"):
@@ -622,6 +614,9 @@ def get_ppt_writer_node(filename: str):
 def get_google_slides_node(presentation_title: str):
     """Creates a new Google Slides presentation with formatted slides containing title and body content."""
     def google_slides_node_func(state: AgentState):
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        from googleapiclient.discovery import build
         print(">>> GOOGLE SLIDES NODE: entered")
         
         try:
@@ -847,17 +842,148 @@ def get_google_slides_node(presentation_title: str):
     
     return google_slides_node_func
 
-# --- 5. GRAPH BUILDER ---
+# --- 5. COMPILED GRAPH CACHE ---
+# Compiled graphs are immutable and safe to share between requests, so a bot
+# whose linked workflow hasn't changed can skip graph construction entirely.
+
+WORKFLOW_CACHE_SIZE = int(os.getenv("WORKFLOW_CACHE_SIZE", "128"))
+
+_workflow_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_workflow_cache_lock = threading.Lock()
+_workflow_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+def workflow_content_hash(nodes_config: List[Dict], edges_config: List[Dict]) -> str:
+    """Stable hash of a workflow's nodes/edges, used to detect edits."""
+    payload = json.dumps({"nodes": nodes_config, "edges": edges_config}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_compiled_workflow(workflow_id: str, nodes_config: List[Dict], edges_config: List[Dict]):
+    """
+    Returns (graph_app, input_override) for a stored workflow, building and
+    caching it on a miss. Entries are keyed by workflow id + content hash, so
+    an edited workflow never reuses a stale graph even without invalidation.
+    """
+    content_hash = workflow_content_hash(nodes_config, edges_config)
+
+    with _workflow_cache_lock:
+        entry = _workflow_cache.get(workflow_id)
+        if entry and entry[0] == content_hash:
+            _workflow_cache.move_to_end(workflow_id)
+            _workflow_cache_stats["hits"] += 1
+            return entry[1], entry[2]
+        _workflow_cache_stats["misses"] += 1
+
+    graph_app, input_override = _build_workflow_graph(nodes_config, edges_config)
+
+    with _workflow_cache_lock:
+        _workflow_cache[workflow_id] = (content_hash, graph_app, input_override)
+        _workflow_cache.move_to_end(workflow_id)
+        while len(_workflow_cache) > WORKFLOW_CACHE_SIZE:
+            _workflow_cache.popitem(last=False)
+            _workflow_cache_stats["evictions"] += 1
+
+    return graph_app, input_override
+
+
+def invalidate_workflow_cache(workflow_id: str = None):
+    """Drops the cached graph for one workflow, or every graph if no id is given."""
+    with _workflow_cache_lock:
+        if workflow_id is None:
+            _workflow_cache_stats["invalidations"] += len(_workflow_cache)
+            _workflow_cache.clear()
+        elif _workflow_cache.pop(workflow_id, None) is not None:
+            _workflow_cache_stats["invalidations"] += 1
+
+
+def get_workflow_cache_stats() -> Dict[str, Any]:
+    with _workflow_cache_lock:
+        return {**_workflow_cache_stats, "size": len(_workflow_cache), "max_size": WORKFLOW_CACHE_SIZE}
+
+# --- 6. GRAPH VALIDATION ---
+
+def index_workflow_nodes(nodes_config: List[Dict]):
+    """
+    Single pass over the node list. Returns (nodes_by_id, type_by_id, ids_by_type)
+    so the builder can classify every edge with O(1) lookups.
+    """
+    nodes_by_id = {}
+    type_by_id = {}
+    ids_by_type = {}
+    for node in nodes_config:
+        node_id = node['id']
+        backend_type = node.get('data', {}).get('backendType')
+        nodes_by_id[node_id] = node
+        type_by_id[node_id] = backend_type
+        ids_by_type.setdefault(backend_type, []).append(node_id)
+    return nodes_by_id, type_by_id, ids_by_type
+
 
-async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Dict], request_initial_input: str, user_id: str = None):
+def validate_workflow(nodes_config: List[Dict], edges_config: List[Dict], index=None) -> Dict[str, Any]:
+    """
+    Reports structural problems in a workflow without raising:
+      - dangling_edges: edges whose source or target node doesn't exist
+      - unreachable_nodes: nodes that can't be reached from the input node
+      - multiple_input_nodes: every input node id, when there is more than one
+      - missing_input_node: True when there is no input node to start from
+    """
+    nodes_by_id, _, ids_by_type = index or index_workflow_nodes(nodes_config)
+
+    dangling_edges = []
+    adjacency = {}
+    for edge in edges_config:
+        src, tgt = edge.get('source'), edge.get('target')
+        if src not in nodes_by_id or tgt not in nodes_by_id:
+            dangling_edges.append({"id": edge.get('id'), "source": src, "target": tgt})
+            continue
+        adjacency.setdefault(src, []).append(tgt)
+
+    input_ids = ids_by_type.get('input', [])
+    unreachable_nodes = []
+    if input_ids:
+        seen = set(input_ids)
+        stack = list(input_ids)
+        while stack:
+            for nxt in adjacency.get(stack.pop(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        unreachable_nodes = [node_id for node_id in nodes_by_id if node_id not in seen]
+
+    return {
+        "valid": not dangling_edges and not unreachable_nodes and len(input_ids) == 1,
+        "dangling_edges": dangling_edges,
+        "unreachable_nodes": unreachable_nodes,
+        "multiple_input_nodes": input_ids if len(input_ids) > 1 else [],
+        "missing_input_node": not input_ids,
+    }
+
+# --- 7. GRAPH BUILDER ---
+
+def _build_workflow_graph(nodes_config: List[Dict], edges_config: List[Dict]):
+    """Builds and compiles the LangGraph app. Returns (graph_app, input_override)."""
     print(f"Building workflow with {len(nodes_config)} nodes")
 
     workflow = StateGraph(AgentState)
-    
-    has_native_tools = any(n.get('data', {}).get('backendType') in ['tool', 'search'] for n in nodes_config)
+
+    index = index_workflow_nodes(nodes_config)
+    nodes_by_id, type_by_id, ids_by_type = index
+
+    report = validate_workflow(nodes_config, edges_config, index=index)
+    if report["dangling_edges"]:
+        print(f"⚠️  Filtered out {len(report['dangling_edges'])} invalid edges")
+    if report["unreachable_nodes"]:
+        print(f"⚠️  Unreachable nodes (never executed): {report['unreachable_nodes']}")
+    if report["missing_input_node"]:
+        print("⚠️  No input node, the workflow has no entry point")
+    if report["multiple_input_nodes"]:
+        print(f"⚠️  Multiple input nodes {report['multiple_input_nodes']}, using {report['multiple_input_nodes'][0]} as entry point")
+
+    has_native_tools = bool(ids_by_type.get('tool') or ids_by_type.get('search'))
     
     mcp_config = None
-    mcp_node = next((n for n in nodes_config if n.get('data', {}).get('backendType') == 'mcp'), None)
+    mcp_node = nodes_by_id[ids_by_type['mcp'][0]] if ids_by_type.get('mcp') else None
     if mcp_node:
         raw_cmd = mcp_node['data'].get('serverCommand', '')
         if raw_cmd:
@@ -884,7 +1010,7 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
             workflow.add_node(node_id, get_llm_node(sys_instr, user_tmpl, bind_tools=has_native_tools, mcp_config=mcp_config))
             
         elif backend_type == 'tool' or backend_type == 'search':
-            workflow.add_node(node_id, ToolNode([tavily_tool]))
+            workflow.add_node(node_id, ToolNode([get_tavily_tool()]))
             
         elif backend_type == 'mcp':
             workflow.add_node(node_id, lambda state: {})
@@ -925,19 +1051,12 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
             print(f"⚠️  Unknown node type '{backend_type}' for node {node_id}. Adding passthrough node.")
             workflow.add_node(node_id, lambda state: {})
     
-    # Get all valid node IDs
-    valid_node_ids = {node['id'] for node in nodes_config}
-    print(f">>> Valid node IDs: {valid_node_ids}")
-    
     # Filter edges to only include those with valid source and target nodes
     edges_config_filtered = [
         edge for edge in edges_config
-        if edge.get('source') in valid_node_ids and edge.get('target') in valid_node_ids
+        if edge.get('source') in nodes_by_id and edge.get('target') in nodes_by_id
     ]
     
-    if len(edges_config_filtered) < len(edges_config):
-        print(f"⚠️  Filtered out {len(edges_config) - len(edges_config_filtered)} invalid edges")
-    
     # 2. Add Edges — with proper ReAct loop for Agent ↔ Tool cycling
     #    Before: Agent → Tool → DocWriter  (tool's raw JSON goes straight to doc writer)
     #    After:  Agent ↔ Tool (loop), then Agent → DocWriter when done with tools
@@ -949,10 +1068,8 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
     for edge in edges_config_filtered:
         src = edge['source']
         tgt = edge['target']
-        src_node = next((n for n in nodes_config if n['id'] == src), None)
-        tgt_node = next((n for n in nodes_config if n['id'] == tgt), None)
-        src_type = src_node.get('data', {}).get('backendType') if src_node else None
-        tgt_type = tgt_node.get('data', {}).get('backendType') if tgt_node else None
+        src_type = type_by_id[src]
+        tgt_type = type_by_id[tgt]
 
         if src_type == 'agent' and tgt_type in ('tool', 'search', 'mcp'):
             agent_to_tool[src] = tgt
@@ -965,10 +1082,8 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
     for edge in edges_config_filtered:
         source = edge['source']
         target = edge['target']
-        source_node = next((n for n in nodes_config if n['id'] == source), None)
-        target_node = next((n for n in nodes_config if n['id'] == target), None)
-        source_type = source_node.get('data', {}).get('backendType') if source_node else None
-        target_type = target_node.get('data', {}).get('backendType') if target_node else None
+        source_type = type_by_id[source]
+        target_type = type_by_id[target]
 
         if source_type == 'agent' and target_type in ('tool', 'search', 'mcp'):
             # --- ReAct pattern: Agent ↔ Tool, then Agent → next node ---
@@ -994,23 +1109,57 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
             workflow.add_edge(source, target)
             
     # 3. Entry Point & Run
-    start_node = next((n['id'] for n in nodes_config if n.get('data', {}).get('backendType') == 'input'), None)
+    start_node = ids_by_type['input'][0] if ids_by_type.get('input') else None
     if start_node: workflow.set_entry_point(start_node)
     
-    graph_app = workflow.compile()
+    return workflow.compile(), input_override
+
+
+WORKFLOW_TIMEOUT = 180  # 3 minute timeout
+
+
+def _prepare_workflow_run(nodes_config: List[Dict], edges_config: List[Dict], request_initial_input: str, user_id: str = None, workflow_id: str = None):
+    # Saved workflows go through the compiled-graph cache; ad-hoc runs from the
+    # builder (no workflow_id) are rebuilt every time.
+    if workflow_id:
+        graph_app, input_override = get_compiled_workflow(workflow_id, nodes_config, edges_config)
+    else:
+        graph_app, input_override = _build_workflow_graph(nodes_config, edges_config)
+
     # User's chat message takes priority; input node prompt is a fallback for test runs
     final_input = request_initial_input if request_initial_input.strip() else input_override
 
     print(f">>> WORKFLOW: starting execution with input: {final_input[:100]}...")
 
+    initial_state = {
+        "messages": [HumanMessage(content=final_input)],
+        "metadata": {"user_id": user_id} if user_id else {},
+        "attachment_path": ""
+    }
+    return graph_app, initial_state
+
+
+def _message_text(message) -> str:
+    """Plain text of a message whose content may be a list of Gemini content blocks."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
+
+
+async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Dict], request_initial_input: str, user_id: str = None, workflow_id: str = None):
+    graph_app, initial_state = _prepare_workflow_run(nodes_config, edges_config, request_initial_input, user_id, workflow_id)
+
     try:
         final_state = await asyncio.wait_for(
-            graph_app.ainvoke({
-                "messages": [HumanMessage(content=final_input)],
-                "metadata": {"user_id": user_id} if user_id else {},
-                "attachment_path": ""
-            }),
-            timeout=180  # 3 minute timeout
+            graph_app.ainvoke(initial_state),
+            timeout=WORKFLOW_TIMEOUT
         )
         print(f">>> WORKFLOW: execution completed successfully")
         return {
@@ -1018,7 +1167,7 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
             "full_history": [m.content for m in final_state["messages"]]
         }
     except asyncio.TimeoutError:
-        print(f">>> WORKFLOW: TIMED OUT after 180s")
+        print(f">>> WORKFLOW: TIMED OUT after {WORKFLOW_TIMEOUT}s")
         return {
             "result": "Error: Workflow timed out after 3 minutes.",
             "full_history": []
@@ -1028,4 +1177,55 @@ async def build_and_run_workflow(nodes_config: List[Dict], edges_config: List[Di
         return {
             "result": f"Error: {str(e)}",
             "full_history": []
-        }
\ No newline at end of file
+        }
+
+
+async def stream_workflow(nodes_config: List[Dict], edges_config: List[Dict], request_initial_input: str, user_id: str = None, workflow_id: str = None):
+    """
+    Runs the workflow like build_and_run_workflow, yielding events as it goes:
+      {"type": "node", "node": id}                      a node finished
+      {"type": "token", "node": id, "content": text}    LLM tokens from agent nodes
+      {"type": "done", "answer": text}                  final message (always last)
+    """
+    final_state = None
+    stream = None
+    try:
+        graph_app, initial_state = _prepare_workflow_run(nodes_config, edges_config, request_initial_input, user_id, workflow_id)
+        stream = graph_app.astream(initial_state, stream_mode=["updates", "messages", "values"])
+        # The timeout budget is spent only while waiting on the graph: events
+        # are yielded outside it, so a slow client is never cancelled mid-send
+        loop = asyncio.get_running_loop()
+        remaining = WORKFLOW_TIMEOUT
+        while True:
+            started = loop.time()
+            try:
+                mode, chunk = await asyncio.wait_for(anext(stream), max(remaining, 0))
+            except StopAsyncIteration:
+                break
+            remaining -= loop.time() - started
+            if mode == "messages":
+                message, meta = chunk
+                text = _message_text(message)
+                if text and isinstance(message, AIMessageChunk):
+                    yield {"type": "token", "node": meta.get("langgraph_node"), "content": text}
+            elif mode == "updates":
+                for node_id in chunk:
+                    if not node_id.startswith("__"):
+                        yield {"type": "node", "node": node_id}
+            else:
+                final_state = chunk
+    except TimeoutError:
+        print(f">>> WORKFLOW: TIMED OUT after {WORKFLOW_TIMEOUT}s")
+        yield {"type": "done", "answer": "Error: Workflow timed out after 3 minutes."}
+        return
+    except Exception as e:
+        print(f"Workflow execution failed: {e}")
+        yield {"type": "done", "answer": f"Error: {str(e)}"}
+        return
+    finally:
+        if stream is not None:
+            await stream.aclose()
+
+    print(">>> WORKFLOW: execution completed successfully")
+    answer = _message_text(final_state["messages"][-1]) if final_state and final_state.get("messages") else ""
+    yield {"type": "done", "answer": answer}
@@ -2,6 +2,7 @@
   const SCRIPT_TAG = document.currentScript;
   const BOT_ID = SCRIPT_TAG.getAttribute('data-bot-id');
   const API_URL = SCRIPT_TAG.getAttribute('data-api-url') || 'http://localhost:8000/chat';
+  const STREAM_URL = API_URL.replace(/\/+$/, '') + '/stream';
   const THEME = SCRIPT_TAG.getAttribute('data-theme') || 'dark'; // 'dark' or 'light'
   const ACCENT = SCRIPT_TAG.getAttribute('data-accent') || '#6366f1';
   const TITLE = SCRIPT_TAG.getAttribute('data-title') || 'AI Assistant';
@@ -450,6 +451,30 @@
     msgDiv.textContent = text;
     messagesEl.appendChild(msgDiv);
     messagesEl.scrollTop = messagesEl.scrollHeight;
+    return msgDiv;
+  }
+
+  // Reads `data: {...}` SSE frames, calling onEvent for each; resolves with the final answer.
+  async function readStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const frames = buffer.split('\n\n');
+      buffer = frames.pop() || '';
+      for (const frame of frames) {
+        const data = frame.split('\n').filter(l => l.startsWith('data: ')).map(l => l.slice(6)).join('\n');
+        if (!data) continue;
+        const event = JSON.parse(data);
+        if (event.type === 'done') answer = event.answer || '';
+        onEvent(event);
+      }
+    }
+    return answer;
   }
 
   async function sendMessage() {
@@ -464,18 +489,45 @@
     typingEl.classList.add('bcw-active');
     messagesEl.scrollTop = messagesEl.scrollHeight;
 
+    let botMsg = null;
+    let streamed = '';
+    function showBotText(value) {
+      typingEl.classList.remove('bcw-active');
+      if (!botMsg) botMsg = addMessage(value, false);
+      botMsg.textContent = value;
+      messagesEl.scrollTop = messagesEl.scrollHeight;
+    }
+
     try {
-      const response = await fetch(API_URL, {
+      const response = await fetch(STREAM_URL, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ bot_id: BOT_ID, question: text })
       });
 
-      const data = await response.json();
-      addMessage(data.answer || "Sorry, I didn't get that.", false);
+      const contentType = response.headers.get('content-type') || '';
+      if (response.ok && response.body && contentType.includes('text/event-stream')) {
+        const answer = await readStream(response, (event) => {
+          if (event.type === 'token' && event.content) {
+            streamed += event.content;
+            showBotText(streamed);
+          }
+        });
+        showBotText(answer || streamed || "Sorry, I didn't get that.");
+      } else {
+        // Servers without streaming support: fall back to the plain endpoint
+        const fallback = await fetch(API_URL, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ bot_id: BOT_ID, question: text })
+        });
+        const data = await fallback.json();
+        showBotText(data.answer || "Sorry, I didn't get that.");
+      }
     } catch (err) {
       console.error('BotCraft Widget Error:', err);
-      addMessage("Couldn't connect to the server. Please try again.", false);
+      if (botMsg) showBotText(streamed + "\n\nResponse interrupted. Please try again.");
+      else addMessage("Couldn't connect to the server. Please try again.", false);
     } finally {
       typingEl.classList.remove('bcw-active');
       sendBtn.disabled = false;
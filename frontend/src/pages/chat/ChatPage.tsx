@@ -20,6 +20,8 @@ export const ChatPage = () => {
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
+    const [isStreaming, setIsStreaming] = useState(false);
+    const [streamStatus, setStreamStatus] = useState('');
     const [isFetchingHistory, setIsFetchingHistory] = useState(true);
     const [botName, setBotName] = useState('AI Assistant');
     const [botWorkflowId, setBotWorkflowId] = useState<string | null>(null);
@@ -84,14 +86,38 @@ export const ChatPage = () => {
         setInput('');
         setIsLoading(true);
 
+        // The bot bubble is added on the first token and updated in place after that
+        let hasBotMsg = false;
+        let streamed = '';
+        const showBotText = (content: string) => {
+            const replace = hasBotMsg;
+            hasBotMsg = true;
+            setIsStreaming(true);
+            setMessages(prev => replace
+                ? [...prev.slice(0, -1), { role: 'bot', content }]
+                : [...prev, { role: 'bot', content }]);
+        };
+
         try {
-            const data = await api.sendMessage(botId, trimmed);
-            const botMsg: Message = { role: 'bot', content: data.answer || 'No response received.' };
-            setMessages(prev => [...prev, botMsg]);
+            const answer = await api.streamMessage(botId, trimmed, (event) => {
+                if (event.type === 'token' && event.content) {
+                    streamed += event.content;
+                    showBotText(streamed);
+                } else if (event.type === 'node' && event.node) {
+                    setStreamStatus(`Running ${event.node}...`);
+                }
+            });
+            showBotText(answer || streamed || 'No response received.');
         } catch (err) {
-            setMessages(prev => [...prev, { role: 'bot', content: '⚠️ Failed to get a response. Please try again.' }]);
+            if (hasBotMsg) {
+                showBotText(streamed + '\n\n⚠️ Response interrupted. Please try again.');
+            } else {
+                setMessages(prev => [...prev, { role: 'bot', content: '⚠️ Failed to get a response. Please try again.' }]);
+            }
         } finally {
             setIsLoading(false);
+            setIsStreaming(false);
+            setStreamStatus('');
             inputRef.current?.focus();
         }
     };
@@ -293,7 +319,7 @@ export const ChatPage = () => {
                     )}
 
                     {/* Typing Indicator */}
-                    {isLoading && (
+                    {isLoading && !isStreaming && (
                         <motion.div
                             initial={{ opacity: 0, y: 10 }}
                             animate={{ opacity: 1, y: 0 }}
@@ -307,6 +333,7 @@ export const ChatPage = () => {
                                     <div className="w-2 h-2 rounded-full bg-slate-400 animate-bounce" style={{ animationDelay: '0ms' }} />
                                     <div className="w-2 h-2 rounded-full bg-slate-400 animate-bounce" style={{ animationDelay: '150ms' }} />
                                     <div className="w-2 h-2 rounded-full bg-slate-400 animate-bounce" style={{ animationDelay: '300ms' }} />
+                                    {streamStatus && <span className="ml-2 text-xs text-slate-400">{streamStatus}</span>}
                                 </div>
                             </div>
                         </motion.div>
@@ -15,6 +15,8 @@ export const PublicChat = () => {
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
+    const [isStreaming, setIsStreaming] = useState(false);
+    const [streamStatus, setStreamStatus] = useState('');
     const [botName, setBotName] = useState('AI Assistant');
     const [botId, setBotId] = useState<string | null>(null);
     const [notFound, setNotFound] = useState(false);
@@ -51,13 +53,38 @@ export const PublicChat = () => {
         setInput('');
         setIsLoading(true);
 
+        // The bot bubble is added on the first token and updated in place after that
+        let hasBotMsg = false;
+        let streamed = '';
+        const showBotText = (content: string) => {
+            const replace = hasBotMsg;
+            hasBotMsg = true;
+            setIsStreaming(true);
+            setMessages(prev => replace
+                ? [...prev.slice(0, -1), { role: 'bot', content }]
+                : [...prev, { role: 'bot', content }]);
+        };
+
         try {
-            const data = await api.sendPublicMessage(shareId, trimmed);
-            setMessages(prev => [...prev, { role: 'bot', content: data.answer || 'No response.' }]);
+            const answer = await api.streamPublicMessage(shareId, trimmed, (event) => {
+                if (event.type === 'token' && event.content) {
+                    streamed += event.content;
+                    showBotText(streamed);
+                } else if (event.type === 'node' && event.node) {
+                    setStreamStatus(`Running ${event.node}...`);
+                }
+            });
+            showBotText(answer || streamed || 'No response.');
         } catch {
-            setMessages(prev => [...prev, { role: 'bot', content: '⚠️ Something went wrong. Please try again.' }]);
+            if (hasBotMsg) {
+                showBotText(streamed + '\n\n⚠️ Response interrupted. Please try again.');
+            } else {
+                setMessages(prev => [...prev, { role: 'bot', content: '⚠️ Something went wrong. Please try again.' }]);
+            }
         } finally {
             setIsLoading(false);
+            setIsStreaming(false);
+            setStreamStatus('');
             inputRef.current?.focus();
         }
     };
@@ -143,7 +170,7 @@ export const PublicChat = () => {
                         </AnimatePresence>
                     )}
 
-                    {isLoading && (
+                    {isLoading && !isStreaming && (
                         <motion.div initial={{ opacity: 0, y: 10 }} animate={{ opacity: 1, y: 0 }} className="flex gap-3">
                             <div className="w-8 h-8 rounded-lg bg-gradient-to-br from-indigo-500 to-purple-600 flex items-center justify-center flex-shrink-0 mt-1 shadow-md">
                                 <Bot className="w-4 h-4 text-white" />
@@ -153,6 +180,7 @@ export const PublicChat = () => {
                                     <div className="w-2 h-2 rounded-full bg-slate-400 animate-bounce" style={{ animationDelay: '0ms' }} />
                                     <div className="w-2 h-2 rounded-full bg-slate-400 animate-bounce" style={{ animationDelay: '150ms' }} />
                                     <div className="w-2 h-2 rounded-full bg-slate-400 animate-bounce" style={{ animationDelay: '300ms' }} />
+                                    {streamStatus && <span className="ml-2 text-xs text-slate-400">{streamStatus}</span>}
                                 </div>
                             </div>
                         </motion.div>
@@ -164,6 +164,54 @@ export const sendMessage = async (botId: string, question: string) => {
     return response.json();
 };
 
+// --- Streaming Chat (Server-Sent Events) ---
+
+export interface ChatStreamEvent {
+    type: 'token' | 'node' | 'done';
+    content?: string;   // token text
+    node?: string;      // workflow node id
+    answer?: string;    // full answer, sent once with 'done'
+}
+
+// Reads `data: {...}` frames from an SSE response and returns the final answer.
+const readChatStream = async (response: Response, onEvent: (event: ChatStreamEvent) => void) => {
+    const reader = response.body!.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop() || '';
+        for (const frame of frames) {
+            const data = frame.split('\n').filter(line => line.startsWith('data: ')).map(line => line.slice(6)).join('\n');
+            if (!data) continue;
+            const event: ChatStreamEvent = JSON.parse(data);
+            if (event.type === 'done') answer = event.answer || '';
+            onEvent(event);
+        }
+    }
+    return answer;
+};
+
+export const streamMessage = async (botId: string, question: string, onEvent: (event: ChatStreamEvent) => void) => {
+    const token = await getAuthToken();
+    const response = await fetch(`${API_URL}/chat/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({ bot_id: botId, question }),
+    });
+    if (!response.ok || !response.body) throw new Error('Failed to send message');
+    return readChatStream(response, onEvent);
+};
+
 export const getMessages = async (botId: string) => {
     const token = await getAuthToken();
     const response = await fetch(`${API_URL}/bots/${botId}/messages`, {
@@ -215,6 +263,16 @@ export const sendPublicMessage = async (shareId: string, question: string) => {
     return response.json();
 };
 
+export const streamPublicMessage = async (shareId: string, question: string, onEvent: (event: ChatStreamEvent) => void) => {
+    const response = await fetch(`${API_URL}/public/chat/${shareId}/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question }),
+    });
+    if (!response.ok || !response.body) throw new Error('Failed to send message');
+    return readChatStream(response, onEvent);
+};
+
 export const connectWhatsApp = async (botId: string, phoneId: string, accessToken: string) => {
     const token = await getAuthToken();
     const formData = new FormData();
@@ -256,11 +314,13 @@ export const api = {
     updateWorkflow,
     linkWorkflowToBot,
     sendMessage,
+    streamMessage,
     getMessages,
     clearMessages,
     toggleShare,
     getPublicBot,
     sendPublicMessage,
+    streamPublicMessage,
     connectWhatsApp,
     connectTelegram
 };
\ No newline at end of file